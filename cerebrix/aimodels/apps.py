@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AimodelsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'aimodels'
+
+    def ready(self):
+        import aimodels.signals
@@ -0,0 +1,38 @@
+from typing import Any, Callable
+
+from django.conf import settings
+
+from common.utils.instance_cache import InstanceCache
+
+# Per-process cache of the LangChain clients built from LanguageModels and EmbeddingModels
+model_client_cache = InstanceCache(max_size=settings.MODEL_CLIENT_CACHE_MAX_SIZE)
+
+
+def get_model_client(instance, kind: str, factory: Callable[[], Any], **kwargs):
+    """
+    Return the LangChain client of `kind` for the given model instance, building it with `factory`
+    only if it's not cached yet.
+
+    Clients are keyed by `(model, pk, updated_at)` plus the extra kwargs used to build them,
+    so a saved change to the model produces a new client. Unsaved instances are never cached.
+    """
+    if instance.pk is None:
+        return factory()
+    key = (
+        instance._meta.label_lower,
+        instance.pk,
+        instance.updated_at,
+        kind,
+        repr(sorted(kwargs.items())),
+    )
+    return model_client_cache.get_or_create(key, factory)
+
+
+def invalidate_model_clients(instance) -> int:
+    """
+    Remove all the cached clients of the given model instance.
+    """
+    label = instance._meta.label_lower
+    return model_client_cache.invalidate(
+        lambda key: key[0] == label and key[1] == instance.pk
+    )
@@ -0,0 +1,280 @@
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import List, Optional
+
+import xxhash
+from django.conf import settings
+from langchain_core.embeddings import Embeddings
+from redis.exceptions import RedisError
+
+from common.utils.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+def encode_vector(vector: List[float]) -> bytes:
+    """Encode a vector as float32 bytes"""
+    return array("f", vector).tobytes()
+
+
+def decode_vector(data: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+class BaseEmbeddingStore:
+    """
+    Base class of the stores used by the embedding cache.
+    Stores map a key to a float32 encoded vector and evict the least recently used
+    vectors when their total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        raise NotImplementedError()
+
+    def set_many(self, items: dict[str, bytes]):
+        raise NotImplementedError()
+
+
+class RedisEmbeddingStore(BaseEmbeddingStore):
+    """
+    Embedding store shared by all the workers.
+
+    Redis also holds the Celery broker so its eviction policy can't be used: the keys are tracked
+    in a sorted set by last access time, together with their total size, and the oldest ones are
+    removed when the size exceeds `max_bytes`.
+    """
+
+    prefix = "embedding"
+
+    def __init__(self, max_bytes: int, evict_batch_size: int = 500):
+        super().__init__(max_bytes)
+        self.evict_batch_size = evict_batch_size
+        self.lru_key = f"{self.prefix}:lru"
+        self.size_key = f"{self.prefix}:bytes"
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        redis_client = get_redis_client()
+        values = redis_client.mget([f"{self.prefix}:{key}" for key in keys])
+        hits = {f"{self.prefix}:{key}": time.time() for key, value in zip(keys, values) if value is not None}
+        if hits:
+            redis_client.zadd(self.lru_key, hits)
+        return values
+
+    def set_many(self, items: dict[str, bytes]):
+        redis_client = get_redis_client()
+        now = time.time()
+        pipeline = redis_client.pipeline(transaction=False)
+        for key, value in items.items():
+            # the vector of a key never changes: the keys already set, e.g. by a concurrent miss, are kept
+            pipeline.set(f"{self.prefix}:{key}", value, nx=True)
+            pipeline.zadd(self.lru_key, {f"{self.prefix}:{key}": now})
+        created = pipeline.execute()[::2]
+        # only the new keys are counted, so the size matches the stored vectors
+        added = sum(len(value) for value, is_new in zip(items.values(), created) if is_new)
+        if added and redis_client.incrby(self.size_key, added) > self.max_bytes:
+            self._evict(redis_client)
+
+    def _evict(self, redis_client):
+        # remove the least recently used vectors until the store is under 90% of its max size
+        while int(redis_client.get(self.size_key) or 0) > self.max_bytes * 0.9:
+            keys = [key for key, _ in redis_client.zpopmin(self.lru_key, self.evict_batch_size)]
+            if not keys:
+                redis_client.set(self.size_key, 0)
+                return
+            pipeline = redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipeline.strlen(key)
+            freed = sum(pipeline.execute())
+            redis_client.delete(*keys)
+            redis_client.decrby(self.size_key, freed)
+
+
+class DiskEmbeddingStore(BaseEmbeddingStore):
+    """
+    Embedding store saved on the local disk in a SQLite database, shared by the processes of a host.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        super().__init__(max_bytes)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS embeddings_accessed_at ON embeddings (accessed_at);
+            -- total size of the vectors, kept up to date by triggers to avoid scanning the table
+            CREATE TABLE IF NOT EXISTS embeddings_size (id INTEGER PRIMARY KEY CHECK (id = 1), total INTEGER NOT NULL);
+            INSERT OR IGNORE INTO embeddings_size (id, total) VALUES (1, 0);
+            CREATE TRIGGER IF NOT EXISTS embeddings_insert AFTER INSERT ON embeddings BEGIN
+                UPDATE embeddings_size SET total = total + NEW.size WHERE id = 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS embeddings_update AFTER UPDATE OF size ON embeddings BEGIN
+                UPDATE embeddings_size SET total = total - OLD.size + NEW.size WHERE id = 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS embeddings_delete AFTER DELETE ON embeddings BEGIN
+                UPDATE embeddings_size SET total = total - OLD.size WHERE id = 1;
+            END;
+            """
+        )
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # sqlite connections can't be shared between threads
+        if not hasattr(self._local, "connection"):
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return self._local.connection
+
+    def _execute(self, query: str, params=()):
+        return self.connection.execute(query, params)
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        values = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            values.update(
+                self._execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+            )
+        if values:
+            now = time.time()
+            self.connection.executemany(
+                "UPDATE embeddings SET accessed_at = ? WHERE key = ?",
+                [(now, key) for key in values],
+            )
+        return [values.get(key) for key in keys]
+
+    def set_many(self, items: dict[str, bytes]):
+        now = time.time()
+        self.connection.executemany(
+            "INSERT INTO embeddings (key, vector, size, accessed_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET vector = excluded.vector, size = excluded.size, "
+            "accessed_at = excluded.accessed_at",
+            [(key, value, len(value), now) for key, value in items.items()],
+        )
+        if self._size() > self.max_bytes:
+            self._evict()
+
+    def _size(self) -> int:
+        return self._execute("SELECT total FROM embeddings_size WHERE id = 1").fetchone()[0]
+
+    def _evict(self, batch_size: int = 1000):
+        # remove the least recently used vectors until the store is under 90% of its max size
+        while (to_free := self._size() - self.max_bytes * 0.9) > 0:
+            rows = self._execute(
+                "SELECT key, size FROM embeddings ORDER BY accessed_at LIMIT ?", (batch_size,)
+            ).fetchall()
+            if not rows:
+                return
+            keys = []
+            for key, size in rows:
+                keys.append((key,))
+                to_free -= size
+                if to_free <= 0:
+                    break
+            self.connection.executemany("DELETE FROM embeddings WHERE key = ?", keys)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps a LangChain Embeddings instance with a persistent cache of the computed vectors.
+
+    Vectors are keyed by the embedding model identity and the XXH64 hash of the text, so the same chunk
+    embedded again (re-ingestions, the same model used by different stores, repeated queries) doesn't
+    hit the provider. Query and document embeddings are cached separately since some providers embed them
+    differently. If the store is not available, the provider is called directly.
+
+    Args:
+        embeddings: The LangChain Embeddings used for the texts not in cache.
+        namespace: The identity of the embedding model.
+        store: The store where the vectors are saved.
+    """
+
+    def __init__(self, embeddings: Embeddings, namespace: str, store: BaseEmbeddingStore):
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, kind: str, text: str) -> str:
+        return f"{self.namespace}:{kind}:{xxhash.xxh64(text.encode()).hexdigest()}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        if not texts:
+            return []
+        keys = [self.make_key("document", text) for text in texts]
+        vectors = self._get_many(keys)
+
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            # the same text may appear more than once, embed it only once
+            unique_texts = list(dict.fromkeys(texts[index] for index in missing))
+            computed = dict(zip(unique_texts, self.embeddings.embed_documents(unique_texts)))
+            for index in missing:
+                vectors[index] = computed[texts[index]]
+            self._set_many(
+                {self.make_key("document", text): vector for text, vector in computed.items()}
+            )
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self.make_key("query", text)
+        vector = self._get_many([key])[0]
+        if vector is not None:
+            self.hits += 1
+            return vector
+        self.misses += 1
+        vector = self.embeddings.embed_query(text)
+        self._set_many({key: vector})
+        return vector
+
+    def _get_many(self, keys: List[str]) -> list:
+        try:
+            values = self.store.get_many(keys)
+        except (RedisError, sqlite3.Error) as e:
+            logger.warning(f"Unable to read embeddings from cache: {e}")
+            return [None] * len(keys)
+        return [decode_vector(value) if value is not None else None for value in values]
+
+    def _set_many(self, vectors: dict[str, List[float]]):
+        try:
+            self.store.set_many({key: encode_vector(vector) for key, vector in vectors.items()})
+        except (RedisError, sqlite3.Error) as e:
+            logger.warning(f"Unable to store embeddings in cache: {e}")
+
+
+_embedding_store = None
+
+
+def get_embedding_store() -> Optional[BaseEmbeddingStore]:
+    """
+    Return the embedding store configured in `settings.EMBEDDING_CACHE`, None if the cache is disabled.
+    """
+    global _embedding_store
+    if _embedding_store is None:
+        config = settings.EMBEDDING_CACHE
+        max_bytes = config["max_size_mb"] * 1024 * 1024
+        if config["backend"] == "redis":
+            _embedding_store = RedisEmbeddingStore(max_bytes)
+        elif config["backend"] == "disk":
+            _embedding_store = DiskEmbeddingStore(config["path"], max_bytes)
+    return _embedding_store
@@ -0,0 +1,193 @@
+import logging
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import List
+
+from django.conf import settings
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Check if the error is a rate limit (HTTP 429) error raised by a provider client.
+    """
+    # tenacity wraps the last error in a RetryError
+    last_attempt = getattr(error, "last_attempt", None)
+    if last_attempt is not None and last_attempt.exception() is not None:
+        error = last_attempt.exception()
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code == 429
+
+
+class EmbeddingExecutor(Embeddings):
+    """
+    Wraps a LangChain Embeddings instance to embed documents in concurrent batches.
+
+    Up to `max_in_flight` batches are sent to the provider at the same time. The batch size
+    adapts to the provider: it grows while the batches are faster than `target_latency`, it shrinks
+    when they are slower and it's halved when the provider answers with a rate limit error,
+    in which case the batch is retried after an exponential backoff.
+    The embeddings are always returned in the same order of the input texts.
+
+    Args:
+        embeddings: The LangChain Embeddings used to embed each batch.
+        max_in_flight: The maximum number of batches sent concurrently.
+        batch_size: The initial number of texts per batch.
+        min_batch_size: The lower bound of the batch size.
+        max_batch_size: The upper bound of the batch size.
+        target_latency: The latency, in seconds, the batches should stay under.
+        max_retries: The maximum number of retries of a batch after a rate limit error.
+        model_code: The code of the EmbeddingModel, if provided the calls to the provider are
+            recorded in the usage ledger.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_in_flight: int = 4,
+        batch_size: int = 32,
+        min_batch_size: int = 1,
+        max_batch_size: int = 256,
+        target_latency: float = 2.0,
+        max_retries: int = 5,
+        model_code: str = None,
+    ):
+        self.embeddings = embeddings
+        self.model_code = model_code
+        self.max_in_flight = max(1, max_in_flight)
+        self.min_batch_size = max(1, min_batch_size)
+        self.max_batch_size = max(self.min_batch_size, max_batch_size)
+        self.batch_size = min(max(batch_size, self.min_batch_size), self.max_batch_size)
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+
+    @classmethod
+    def from_settings(cls, embeddings: Embeddings, **kwargs) -> "EmbeddingExecutor":
+        return cls(embeddings, **{**settings.EMBEDDING_EXECUTOR, **kwargs})
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        if not texts:
+            return []
+        if len(texts) <= self.batch_size:
+            vectors, requests = self._embed_with_retries(texts)
+            self._record_usage(len(texts), requests=requests)
+            return vectors
+
+        results = [None] * len(texts)
+        requests = 0
+        # ranges [start, end) to retry after a rate limit error, with the number of attempts
+        retries = deque()
+        cursor = 0
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            try:
+                while cursor < len(texts) or retries or in_flight:
+                    while len(in_flight) < self.max_in_flight and (retries or cursor < len(texts)):
+                        if retries:
+                            start, end, attempts = retries.popleft()
+                        else:
+                            start, end, attempts = cursor, min(cursor + self.batch_size, len(texts)), 0
+                            cursor = end
+                        future = pool.submit(self._timed_embed, texts[start:end])
+                        requests += 1
+                        in_flight[future] = (start, end, attempts)
+
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        start, end, attempts = in_flight.pop(future)
+                        try:
+                            vectors, latency = future.result()
+                        except Exception as e:
+                            if not is_rate_limit_error(e) or attempts >= self.max_retries:
+                                raise
+                            self._on_rate_limit()
+                            self._backoff(attempts)
+                            # retry the batch split by the new batch size
+                            for split in range(start, end, self.batch_size):
+                                retries.append((split, min(split + self.batch_size, end), attempts + 1))
+                            continue
+
+                        if len(vectors) != end - start:
+                            raise ValueError(
+                                f"Expected {end - start} embeddings, the provider returned {len(vectors)}"
+                            )
+                        results[start:end] = vectors
+                        self._on_success(latency)
+            except Exception:
+                for future in in_flight:
+                    future.cancel()
+                raise
+
+        self._record_usage(len(texts), requests=requests)
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.embeddings.embed_query(text)
+        self._record_usage(1, requests=1)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = await self.embeddings.aembed_query(text)
+        self._record_usage(1, requests=1)
+        return vector
+
+    def _record_usage(self, items: int, requests: int):
+        # recorded here, in the calling thread, where the user set with `usage_user` is available
+        if self.model_code:
+            from usage.ledger import record_usage
+            from usage.types import UsageKind
+
+            record_usage(None, UsageKind.EMBEDDING, self.model_code, items=items, requests=requests)
+
+    def _timed_embed(self, texts: List[str]):
+        start = time.perf_counter()
+        vectors = self.embeddings.embed_documents(texts)
+        return vectors, time.perf_counter() - start
+
+    def _embed_with_retries(self, texts: List[str], attempts: int = 0) -> tuple[List[List[float]], int]:
+        """
+        Embed the texts in a single batch, sequentially. After a rate limit error the texts are
+        retried split by the reduced batch size. Return the embeddings and the number of requests.
+        """
+        try:
+            vectors, latency = self._timed_embed(texts)
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempts >= self.max_retries:
+                raise
+            self._on_rate_limit()
+            self._backoff(attempts)
+            batch_size = self.batch_size
+            vectors, requests = [], 1
+            for start in range(0, len(texts), batch_size):
+                split_vectors, split_requests = self._embed_with_retries(
+                    texts[start : start + batch_size], attempts + 1
+                )
+                vectors.extend(split_vectors)
+                requests += split_requests
+            return vectors, requests
+        if len(vectors) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, the provider returned {len(vectors)}")
+        self._on_success(latency)
+        return vectors, 1
+
+    def _on_success(self, latency: float):
+        if latency < self.target_latency:
+            # additive increase while the provider keeps up
+            self.batch_size = min(self.max_batch_size, self.batch_size + max(1, self.batch_size // 4))
+        else:
+            self.batch_size = max(self.min_batch_size, int(self.batch_size * 0.75))
+
+    def _on_rate_limit(self):
+        self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+        logger.warning(f"Embedding provider rate limited, batch size reduced to {self.batch_size}")
+
+    def _backoff(self, attempts: int):
+        time.sleep(min(30, 2**attempts) * random.uniform(0.5, 1.0))
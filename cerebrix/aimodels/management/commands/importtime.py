@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules that are imported lazily and are worth tracking besides the Django startup
+DEFAULT_MODULES = [
+    "threads.services",
+    "vector_stores.utils.document_loaders",
+    "vector_stores.utils.db_clients",
+]
+
+SCRIPT = """
+import importlib, json, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+for module in {modules!r}:
+    importlib.import_module(module)
+sys.stdout.write(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the import cost, per top-level package, of the Django startup and of the given modules. "
+        "Each measure runs in a fresh interpreter with `python -X importtime`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "modules",
+            nargs="*",
+            help="Modules to import after django.setup(). Defaults to the main Cerebrix entry points.",
+        )
+        parser.add_argument(
+            "--top", type=int, default=20, help="Number of packages to print for each measure."
+        )
+        parser.add_argument(
+            "--fail-above",
+            type=float,
+            default=None,
+            help="Exit with an error if a measure takes more than this number of seconds.",
+        )
+
+    def handle(self, *args, **options):
+        modules = options["modules"] or DEFAULT_MODULES
+        measures = [("django.setup()", [])] + [(module, [module]) for module in modules]
+
+        baseline = None
+        failed = []
+        for name, imported in measures:
+            result, costs = self.profile(imported)
+            seconds = result["seconds"]
+            extra = "" if baseline is None else f" (+{seconds - baseline:.3f}s over django.setup())"
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"{name}: {seconds:.3f}s, max RSS {result['max_rss_kb'] / 1024:.1f} MB{extra}"
+                )
+            )
+            for package, microseconds in sorted(costs.items(), key=lambda item: -item[1])[: options["top"]]:
+                self.stdout.write(f"  {microseconds / 1000:10.1f} ms  {package}")
+            if baseline is None:
+                baseline = seconds
+            if options["fail_above"] is not None and seconds > options["fail_above"]:
+                failed.append(name)
+
+        if failed:
+            raise CommandError(
+                f"Import time above {options['fail_above']}s for: {', '.join(failed)}"
+            )
+
+    def profile(self, modules: list[str]):
+        """
+        Import the modules in a new interpreter and return its result together with the
+        import time, in microseconds, spent in each top-level package.
+        """
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "cerebrix.settings")}
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", SCRIPT.format(modules=modules)],
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=settings.BASE_DIR,
+        )
+        if process.returncode != 0:
+            raise CommandError(f"Unable to import {modules}:\n{process.stderr[-2000:]}")
+
+        costs = defaultdict(int)
+        for line in process.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            if not line.startswith("import time:") or "imported package" in line:
+                continue
+            self_time, _, package = line[len("import time:"):].split("|")
+            costs[package.strip().split(".")[0]] += int(self_time)
+        return json.loads(process.stdout.strip().splitlines()[-1]), costs
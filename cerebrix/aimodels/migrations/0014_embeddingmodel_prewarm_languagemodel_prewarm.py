@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aimodels', '0013_alter_embeddingmodel_type_alter_languagemodel_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='embeddingmodel',
+            name='prewarm',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='languagemodel',
+            name='prewarm',
+            field=models.BooleanField(default=False),
+        ),
+    ]
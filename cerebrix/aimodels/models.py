@@ -1,11 +1,7 @@
 from django.db import models
-from django.conf import settings
 from encrypted_json_fields.fields import EncryptedJSONField
 import logging
 
-from transformers import AutoTokenizer
-import tiktoken
-
 logger = logging.getLogger(__name__)
 
 from .types import (
@@ -15,8 +11,15 @@ from .types import (
     EmbeddingModelTypes,
     EMBEDDING_MODEL_TYPE_TO_EMBEDDING_MODEL,
 )
+from .tokenizers import tokenizer_registry
+from .token_cache import token_count_cache
+from .clients import get_model_client
+from .embeddings import EmbeddingExecutor
+from .embedding_cache import CachedEmbeddings, get_embedding_store
 from common.models.mixins import TimestampUserModel
 from users.models import User
+from usage.ledger import record_response_usage
+from usage.types import UsageKind
 
 
 class LanguageModel(TimestampUserModel):
@@ -42,6 +45,9 @@ class LanguageModel(TimestampUserModel):
     # The tokenizer to use for this chat model. If None, it will use a non precise tokenizer (word count)
     tokenizer = models.CharField(max_length=500, blank=True, null=True)
 
+    # If True, the tokenizer and the LangChain client are loaded when a worker process starts
+    prewarm = models.BooleanField(default=False)
+
     def __str__(self):
         return self.name
 
@@ -49,15 +55,27 @@ class LanguageModel(TimestampUserModel):
         """
         Get the LangChain ChatModel instance for this ChatModel.
         It handles authentication and other configurations.
+        The instance is cached per process and reused until this model changes.
         """
-        return LLM_TYPE_TO_CHAT_MODEL[self.type](**self.config, **kwargs)
+        return get_model_client(
+            self,
+            "chat",
+            lambda: LLM_TYPE_TO_CHAT_MODEL[self.type](**self.config, **kwargs),
+            **kwargs,
+        )
 
     def get_model(self, **kwargs):
         """
         Get the LangChain LLM instance for this LanguageModel.
         It handles authentication and other configurations.
+        The instance is cached per process and reused until this model changes.
         """
-        return LLM_TYPE_TO_LLM[self.type](**self.config, **kwargs)
+        return get_model_client(
+            self,
+            "llm",
+            lambda: LLM_TYPE_TO_LLM[self.type](**self.config, **kwargs),
+            **kwargs,
+        )
 
     @property
     def model(self):
@@ -74,28 +92,51 @@ class LanguageModel(TimestampUserModel):
         of the usage of the chat model for each user.
         """
 
-        # TODO: Add usage tracking
-        return self.model.invoke(user, *args, **kwargs)
+        response = self.model.invoke(*args, **kwargs)
+        record_response_usage(user, UsageKind.CHAT, self.code, response)
+        return response
+
+    def get_tokenizer(self):
+        """
+        Get the tokenizer of this LanguageModel from the per-process tokenizer registry.
+        """
+        return tokenizer_registry.get(self.type, self.tokenizer)
 
     def _gpt_tokenizer(self, input: str):
         """
         Use the GPT tokenizer to count the number of tokens in the input string.
         """
-        return len(tiktoken.encoding_for_model(self.tokenizer).encode(input))
+        return len(self.get_tokenizer().encode(input))
 
     def _auto_tokenizer(self, input: str):
         """
         Use the AutoTokenizer to count the number of tokens in the input string.
         """
-        tokenizer = AutoTokenizer.from_pretrained(
-            self.tokenizer, token=settings.HUGGING_FACE_TOKEN
-        )
-        return len(tokenizer.encode(input))
+        return len(self.get_tokenizer().encode(input))
+
+    @property
+    def token_cache_identity(self) -> str:
+        """
+        Identity of the tokenizer used to key the cached token counts.
+        Without a tokenizer the count depends on the LangChain model, so the identity is the model itself.
+        """
+        if self.tokenizer:
+            return f"{self.type}:{self.tokenizer}"
+        return f"model:{self.pk}"
 
     def count_tokens(self, input: str):
         """
         Count the number of tokens in the input string for this chat model.
+        The count is read from the token count cache when available.
         """
+        identity = self.token_cache_identity
+        tokens = token_count_cache.get(identity, input)
+        if tokens is None:
+            tokens = self._count_tokens(input)
+            token_count_cache.set(identity, input, tokens)
+        return tokens
+
+    def _count_tokens(self, input: str):
         if not self.tokenizer:
             return self.model.get_num_tokens(input)
         return (
@@ -104,6 +145,51 @@ class LanguageModel(TimestampUserModel):
             else self._auto_tokenizer(input)
         )
 
+    def count_tokens_batch(self, texts: list[str]) -> list[int]:
+        """
+        Count the number of tokens of each string in `texts` for this chat model.
+
+        It uses the batch encoders of tiktoken and HuggingFace tokenizers, that encode
+        all the strings in a single call, instead of counting them one by one.
+        Only the strings missing from the token count cache are encoded.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        identity = self.token_cache_identity
+        counts = token_count_cache.get_many(identity, texts)
+        missing = [index for index, count in enumerate(counts) if count is None]
+        if missing:
+            missing_texts = [texts[index] for index in missing]
+            missing_counts = self._count_tokens_batch(missing_texts)
+            for index, count in zip(missing, missing_counts):
+                counts[index] = count
+            token_count_cache.set_many(identity, missing_texts, missing_counts)
+        return counts
+
+    def _count_tokens_batch(self, texts: list[str]) -> list[int]:
+        if not self.tokenizer:
+            model = self.model
+            return [model.get_num_tokens(text) for text in texts]
+
+        tokenizer = self.get_tokenizer()
+        if self.type == LLMTypes.OPENAI:
+            return [len(tokens) for tokens in tokenizer.encode_batch(texts)]
+        # fast tokenizers encode the whole batch in rust with `encode_batch`
+        return [len(ids) for ids in tokenizer(texts)["input_ids"]]
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            previous = LanguageModel.objects.filter(pk=self.pk).first()
+            # counts cached with the previous tokenizer are not valid anymore
+            if previous and (
+                previous.tokenizer != self.tokenizer
+                or previous.type != self.type
+                or (not previous.tokenizer and previous.config != self.config)
+            ):
+                token_count_cache.invalidate(previous.token_cache_identity)
+        super().save(*args, **kwargs)
+
 
 class EmbeddingModel(TimestampUserModel):
     """
@@ -123,6 +209,9 @@ class EmbeddingModel(TimestampUserModel):
     # The size of the embedding model. This is used to set the dimension of the vectors in the vector store.
     size = models.IntegerField(null=True, blank=True, default=None)
 
+    # If True, the LangChain client is built when a worker process starts
+    prewarm = models.BooleanField(default=False)
+
     def __str__(self):
         return self.name
 
@@ -133,10 +222,35 @@ class EmbeddingModel(TimestampUserModel):
     def get_model(self, **kwargs):
         """
         Get the LangChain EmbeddingModel instance for this EmbeddingModel.
+        Documents are embedded in concurrent, adaptive batches by the EmbeddingExecutor and
+        the computed vectors are kept in the embedding cache.
+        The instance is cached per process and reused until this model changes.
         """
-        return EMBEDDING_MODEL_TYPE_TO_EMBEDDING_MODEL[self.type](
-            **self.config, **kwargs
+        return get_model_client(
+            self,
+            "embedding",
+            lambda: self._build_model(**kwargs),
+            **kwargs,
+        )
+
+    @property
+    def cache_namespace(self) -> str:
+        """
+        Identity of the embedding model used to key its cached vectors.
+        """
+        return f"{self.code}:{self.type}:{(self.config or {}).get('model', '')}"
+
+    def _build_model(self, **kwargs):
+        model = EmbeddingExecutor.from_settings(
+            EMBEDDING_MODEL_TYPE_TO_EMBEDDING_MODEL[self.type](
+                **(self.config or {}), **kwargs
+            ),
+            model_code=self.code,
         )
+        store = get_embedding_store()
+        if store is None:
+            return model
+        return CachedEmbeddings(model, self.cache_namespace, store)
         
     def set_size(self):
         self.size = len(self.get_model().embed_query('test'))
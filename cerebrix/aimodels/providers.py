@@ -0,0 +1,59 @@
+"""
+Provider classes that need to be patched before being used by Cerebrix.
+
+This module imports the provider packages, so it must be imported only through the
+lazy registries defined in `aimodels.types`.
+"""
+#region TEMPORARY FIX FOR MISTRAL AI
+# Inside the @retry decorator, the wrong type is caught.
+# This is a temporary fix to ensure that the MistralAIEmbeddings class works as expected.
+import httpx
+from typing import List
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_fixed
+from langchain_mistralai import MistralAIEmbeddings as BaseMistralAIEmbeddings
+
+
+class MistralAIEmbeddings(BaseMistralAIEmbeddings):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of document texts.
+
+        Args:
+            texts: The list of texts to embed.
+
+        Returns:
+            List of embeddings, one for each text.
+        """
+        try:
+            batch_responses = []
+
+            # rate limit errors are not retried here, they are handled by the EmbeddingExecutor
+            # that reduces the batch size and backs off
+            @retry(
+                retry=retry_if_exception(
+                    lambda e: isinstance(e, httpx.HTTPStatusError)
+                    and e.response.status_code != 429
+                ),
+                wait=wait_fixed(self.wait_time),
+                stop=stop_after_attempt(self.max_retries),
+            )
+            def _embed_batch(batch: List[str]):
+                response = self.client.post(
+                    url="/embeddings",
+                    json=dict(
+                        model=self.model,
+                        input=batch,
+                    ),
+                )
+                response.raise_for_status()
+                return response
+
+            for batch in self._get_batches(texts):
+                batch_responses.append(_embed_batch(batch))
+            return [
+                list(map(float, embedding_obj["embedding"]))
+                for response in batch_responses
+                for embedding_obj in response.json()["data"]
+            ]
+        except Exception as e:
+            raise
+#endregion
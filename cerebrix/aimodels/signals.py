@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .clients import invalidate_model_clients
+from .models import LanguageModel, EmbeddingModel
+
+
+@receiver(post_save, sender=LanguageModel)
+@receiver(post_save, sender=EmbeddingModel)
+@receiver(post_delete, sender=LanguageModel)
+@receiver(post_delete, sender=EmbeddingModel)
+def invalidate_cached_clients(sender, instance, **kwargs):
+    """
+    Drop the cached LangChain clients of a model when it's saved or deleted.
+    """
+    invalidate_model_clients(instance)
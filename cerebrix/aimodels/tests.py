@@ -0,0 +1,62 @@
+from django.test import SimpleTestCase
+
+from langchain_core.embeddings import Embeddings
+
+from aimodels.embeddings import EmbeddingExecutor
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Embeds each text as [len(text)] and fails with a rate limit error on the first `rate_limits` calls.
+    """
+
+    def __init__(self, rate_limits: int = 0):
+        self.rate_limits = rate_limits
+        self.batches = []
+
+    def embed_documents(self, texts):
+        if self.rate_limits:
+            self.rate_limits -= 1
+            raise RateLimitError()
+        self.batches.append(len(texts))
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text))]
+
+
+class EmbeddingExecutorTests(SimpleTestCase):
+    def test_embeddings_keep_input_order(self):
+        texts = ["x" * i for i in range(1, 200)]
+        executor = EmbeddingExecutor(FakeEmbeddings(), max_in_flight=4, batch_size=8)
+
+        embeddings = executor.embed_documents(texts)
+
+        self.assertEqual(embeddings, [[float(len(text))] for text in texts])
+
+    def test_rate_limit_reduces_batch_size(self):
+        executor = EmbeddingExecutor(
+            FakeEmbeddings(rate_limits=1), max_in_flight=2, batch_size=16, max_retries=2
+        )
+        executor._backoff = lambda attempts: None
+
+        embeddings = executor.embed_documents(["a"] * 12)
+
+        self.assertEqual(len(embeddings), 12)
+        # the batch of 12 texts is retried split by the halved batch size
+        self.assertEqual(executor.embeddings.batches, [8, 4])
+
+    def test_rate_limit_splits_concurrent_batches(self):
+        executor = EmbeddingExecutor(
+            FakeEmbeddings(rate_limits=1), max_in_flight=1, batch_size=16, max_retries=2
+        )
+        executor._backoff = lambda attempts: None
+
+        embeddings = executor.embed_documents(["x" * i for i in range(1, 41)])
+
+        self.assertEqual(embeddings, [[float(i)] for i in range(1, 41)])
+        self.assertEqual(executor.embeddings.batches[:2], [8, 8])
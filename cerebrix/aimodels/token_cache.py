@@ -0,0 +1,115 @@
+import logging
+
+import xxhash
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from common.utils.lru import LRUCache
+from common.utils.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCountCache:
+    """
+    Two-tier cache of token counts: an in-process LRU cache in front of Redis.
+
+    Counts are content-addressed, the key is made of the tokenizer identity and the XXH64 hash
+    of the text, so the same text counted by different LanguageModels sharing a tokenizer
+    is counted only once across all the workers.
+    If Redis is not reachable, only the in-process cache is used.
+
+    Args:
+        max_size: The maximum number of counts kept in the in-process cache.
+        ttl: The time to live, in seconds, of the counts stored in Redis.
+    """
+
+    prefix = "token_count"
+
+    def __init__(self, max_size: int, ttl: int):
+        self.ttl = ttl
+        self._local = LRUCache(max_size=max_size)
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def make_key(self, identity: str, text: str) -> str:
+        return f"{self.prefix}:{identity}:{xxhash.xxh64(text.encode()).hexdigest()}"
+
+    def get(self, identity: str, text: str):
+        return self.get_many(identity, [text])[0]
+
+    def set(self, identity: str, text: str, count: int):
+        self.set_many(identity, [text], [count])
+
+    def get_many(self, identity: str, texts: list[str]) -> list:
+        """
+        Return the cached counts of `texts`, None for the texts that are not cached.
+        """
+        keys = [self.make_key(identity, text) for text in texts]
+        counts = [self._local.get(key) for key in keys]
+        missing = [index for index, count in enumerate(counts) if count is None]
+        self.local_hits += len(keys) - len(missing)
+        if not missing:
+            return counts
+
+        try:
+            values = get_redis_client().mget([keys[index] for index in missing])
+        except RedisError as e:
+            logger.warning(f"Unable to read token counts from redis: {e}")
+            values = [None] * len(missing)
+
+        for index, value in zip(missing, values):
+            if value is None:
+                self.misses += 1
+                continue
+            self.redis_hits += 1
+            counts[index] = int(value)
+            self._local.set(keys[index], counts[index])
+        return counts
+
+    def set_many(self, identity: str, texts: list[str], counts: list[int]):
+        keys = [self.make_key(identity, text) for text in texts]
+        for key, count in zip(keys, counts):
+            self._local.set(key, count)
+        try:
+            pipeline = get_redis_client().pipeline(transaction=False)
+            for key, count in zip(keys, counts):
+                pipeline.set(key, count, ex=self.ttl)
+            pipeline.execute()
+        except RedisError as e:
+            logger.warning(f"Unable to store token counts in redis: {e}")
+
+    def invalidate(self, identity: str) -> int:
+        """
+        Remove all the counts cached for the given tokenizer identity, both in this process and in Redis.
+        Other processes keep their in-process counts until evicted.
+        """
+        key_prefix = f"{self.prefix}:{identity}:"
+        removed = self._local.remove_if(lambda key: key.startswith(key_prefix))
+        try:
+            redis_client = get_redis_client()
+            keys = list(redis_client.scan_iter(match=f"{key_prefix}*", count=1000))
+            for start in range(0, len(keys), 1000):
+                removed += redis_client.delete(*keys[start : start + 1000])
+        except RedisError as e:
+            logger.warning(f"Unable to invalidate token counts in redis: {e}")
+        logger.debug(f"Invalidated {removed} token counts for {identity}")
+        return removed
+
+    def stats(self) -> dict:
+        total = self.local_hits + self.redis_hits + self.misses
+        hits = self.local_hits + self.redis_hits
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "local_size": len(self._local),
+        }
+
+
+token_count_cache = TokenCountCache(
+    max_size=settings.TOKEN_COUNT_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_COUNT_CACHE_TTL,
+)
@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from common.utils.lru import LRUCache
+from .types import LLMTypes
+
+logger = logging.getLogger(__name__)
+
+# Rough number of bytes kept in memory for each entry of a tokenizer vocabulary
+# (token string, id mapping and merges). Used only to estimate the memory of a tokenizer.
+BYTES_PER_VOCAB_ENTRY = 128
+
+
+def load_tokenizer(type: int, tokenizer: str):
+    """
+    Load the tokenizer `tokenizer` for a LanguageModel of the given type.
+
+    OpenAI models use tiktoken, all the other types use HuggingFace AutoTokenizer.
+    """
+    if type == LLMTypes.OPENAI:
+        import tiktoken
+
+        return tiktoken.encoding_for_model(tokenizer)
+
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(tokenizer, token=settings.HUGGING_FACE_TOKEN)
+
+
+def estimate_tokenizer_size(tokenizer) -> int:
+    """
+    Return an estimate, in bytes, of the memory used by a tokenizer based on its vocabulary size.
+    """
+    vocab_size = getattr(tokenizer, "n_vocab", None)
+    if vocab_size is None:
+        try:
+            vocab_size = len(tokenizer)
+        except TypeError:
+            vocab_size = 0
+    return vocab_size * BYTES_PER_VOCAB_ENTRY
+
+
+class TokenizerRegistry:
+    """
+    Per-process registry of the tokenizers used by the LanguageModels.
+
+    Tokenizers are keyed by `(type, tokenizer)` and kept in a LRU cache bounded both by the
+    number of tokenizers and by an estimate of their memory. Each tokenizer is loaded only once
+    even when many threads ask for it at the same time.
+
+    Args:
+        max_size: The maximum number of tokenizers kept in memory.
+        max_memory: The maximum estimated memory, in bytes, used by the kept tokenizers.
+    """
+
+    def __init__(self, max_size: int, max_memory: int = None):
+        self._cache = LRUCache(
+            max_size=max_size, max_weight=max_memory, weigh=estimate_tokenizer_size
+        )
+        self._lock = threading.Lock()
+        self._loading_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.load_failures = 0
+        self.load_time = 0.0
+
+    def get(self, type: int, tokenizer: str):
+        """
+        Return the tokenizer for the given type, loading it if it's not in the registry.
+        """
+        key = (int(type), tokenizer)
+        value = self._cache.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        with self._get_loading_lock(key):
+            # another thread may have loaded the tokenizer while waiting for the lock
+            value = self._cache.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            self.misses += 1
+            start = time.perf_counter()
+            try:
+                value = load_tokenizer(type, tokenizer)
+            except Exception:
+                self.load_failures += 1
+                raise
+            finally:
+                self.load_time += time.perf_counter() - start
+            logger.debug(
+                f"Loaded tokenizer {tokenizer} in {time.perf_counter() - start:.3f}s"
+            )
+            self._cache.set(key, value)
+
+        with self._lock:
+            self._loading_locks.pop(key, None)
+        return value
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        cache_stats = self._cache.stats()
+        total = self.hits + self.misses
+        return {
+            "size": cache_stats["size"],
+            "memory": cache_stats["weight"],
+            "evictions": cache_stats["evictions"],
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "load_failures": self.load_failures,
+            "load_time": self.load_time,
+        }
+
+    def _get_loading_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._loading_locks.setdefault(key, threading.Lock())
+
+
+tokenizer_registry = TokenizerRegistry(
+    max_size=settings.TOKENIZER_REGISTRY_MAX_SIZE,
+    max_memory=settings.TOKENIZER_REGISTRY_MAX_MEMORY_MB * 1024 * 1024,
+)
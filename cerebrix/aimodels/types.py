@@ -1,13 +1,44 @@
+import importlib
+import threading
+from collections.abc import Mapping
+
 from django.db import models
 
-from langchain_ollama import ChatOllama, OllamaLLM, OllamaEmbeddings
-from langchain_mistralai import MistralAIEmbeddings, ChatMistralAI
 
-embeddings = MistralAIEmbeddings(
-    model="mistral-embed",
-)
-# from langchain_openai import ChatOpenAI
-from langchain_core.language_models.fake_chat_models import FakeChatModel
+class LazyProviderRegistry(Mapping):
+    """
+    Mapping between a model type and the LangChain class that implements it.
+
+    Classes are declared as "module.path:ClassName" strings and imported only when a model of
+    that type is used for the first time, so provider packages are not loaded at startup.
+    """
+
+    def __init__(self, providers: dict):
+        self._providers = providers
+        self._classes = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, type):
+        if type in self._classes:
+            return self._classes[type]
+        path = self._providers[type]
+        with self._lock:
+            if type not in self._classes:
+                module_name, class_name = path.split(":")
+                self._classes[type] = getattr(
+                    importlib.import_module(module_name), class_name
+                )
+        return self._classes[type]
+
+    def __iter__(self):
+        return iter(self._providers)
+
+    def __len__(self):
+        return len(self._providers)
+
+    def is_loaded(self, type) -> bool:
+        return type in self._classes
+
 
 class LLMTypes(models.IntegerChoices):
     """
@@ -18,17 +49,17 @@ class LLMTypes(models.IntegerChoices):
     MISTRAL = 3, "Mistral"
     FAKE = 99, "Fake" # used for testing
 
-# mapping between the types and the corresponding LangChain ChatModetestl class
-LLM_TYPE_TO_CHAT_MODEL = {
-    # LLMTypes.OPENAI: ChatOpenAI,
-    LLMTypes.OLLAMA: ChatOllama,
-    LLMTypes.MISTRAL: ChatMistralAI,
-}
+# mapping between the types and the corresponding LangChain ChatModel class
+LLM_TYPE_TO_CHAT_MODEL = LazyProviderRegistry({
+    # LLMTypes.OPENAI: "langchain_openai:ChatOpenAI",
+    LLMTypes.OLLAMA: "langchain_ollama:ChatOllama",
+    LLMTypes.MISTRAL: "langchain_mistralai:ChatMistralAI",
+})
 
 # Mapping between the types and the corresponding LangChain LLM class
-LLM_TYPE_TO_LLM = {
-    LLMTypes.OLLAMA: OllamaLLM,
-}
+LLM_TYPE_TO_LLM = LazyProviderRegistry({
+    LLMTypes.OLLAMA: "langchain_ollama:OllamaLLM",
+})
 
 class EmbeddingModelTypes(models.IntegerChoices):
     """
@@ -40,54 +71,9 @@ class EmbeddingModelTypes(models.IntegerChoices):
     FAKE = 99, "Fake" # used for testing
 
 
-#region TEMPORARY FIX FOR MISTRAL AI
-# Inside the @retry decorator, the wrong type is caught.
-# This is a temporary fix to ensure that the MistralAIEmbeddings class works as expected.
-import httpx
-from typing import List
-from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_fixed
-class MistralAIEmbeddings(MistralAIEmbeddings):
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Embed a list of document texts.
-
-        Args:
-            texts: The list of texts to embed.
-
-        Returns:
-            List of embeddings, one for each text.
-        """
-        try:
-            batch_responses = []
-
-            @retry(
-                retry=retry_if_exception_type(httpx.HTTPStatusError),
-                wait=wait_fixed(self.wait_time),
-                stop=stop_after_attempt(self.max_retries),
-            )
-            def _embed_batch(batch: List[str]):
-                response = self.client.post(
-                    url="/embeddings",
-                    json=dict(
-                        model=self.model,
-                        input=batch,
-                    ),
-                )
-                response.raise_for_status()
-                return response
-
-            for batch in self._get_batches(texts):
-                batch_responses.append(_embed_batch(batch))
-            return [
-                list(map(float, embedding_obj["embedding"]))
-                for response in batch_responses
-                for embedding_obj in response.json()["data"]
-            ]
-        except Exception as e:
-            raise
-#endregion
 # mapping between the types and the corresponding LangChain EmbeddingModel class
-EMBEDDING_MODEL_TYPE_TO_EMBEDDING_MODEL = {
-    # EmbeddingModelTypes.OPENAI: OpenAIEmbeddings,
-    EmbeddingModelTypes.OLLAMA: OllamaEmbeddings,
-    EmbeddingModelTypes.MISTRAL: MistralAIEmbeddings,
-}
\ No newline at end of file
+EMBEDDING_MODEL_TYPE_TO_EMBEDDING_MODEL = LazyProviderRegistry({
+    # EmbeddingModelTypes.OPENAI: "langchain_openai:OpenAIEmbeddings",
+    EmbeddingModelTypes.OLLAMA: "langchain_ollama:OllamaEmbeddings",
+    EmbeddingModelTypes.MISTRAL: "aimodels.providers:MistralAIEmbeddings",
+})
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cerebrix.settings')
 
 application = get_asgi_application()
+
+from cerebrix.prewarm import prewarm  # noqa: E402 (Django must be set up first)
+
+prewarm()
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cerebrix.settings')
@@ -15,3 +16,12 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+
+@worker_process_init.connect
+def prewarm_worker_process(**kwargs):
+    from django.db import connections
+    from cerebrix.prewarm import prewarm
+
+    prewarm()
+    # connections opened while prewarming must not be shared with the tasks
+    connections.close_all()
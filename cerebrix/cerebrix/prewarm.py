@@ -0,0 +1,76 @@
+"""
+Warm up a new process before it serves its first request.
+
+Loading tokenizers, building LangChain clients and opening vector database connections is slow,
+without prewarming the first request handled by each new process pays for all of them.
+Only the LanguageModels, EmbeddingModels and VectorStoreBackends with `prewarm=True` are warmed up.
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def timed(label: str, timings: dict):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        logger.error(f"Prewarm of {label} failed: {e}")
+    finally:
+        timings[label] = time.perf_counter() - start
+        logger.debug(f"Prewarm of {label} took {timings[label]:.3f}s")
+
+
+def prewarm_language_models(timings: dict):
+    from aimodels.models import LanguageModel
+    from aimodels.tokenizers import tokenizer_registry
+
+    for language_model in LanguageModel.objects.filter(prewarm=True):
+        if language_model.tokenizer:
+            with timed(f"tokenizer {language_model.tokenizer}", timings):
+                tokenizer_registry.get(language_model.type, language_model.tokenizer)
+        with timed(f"language model {language_model.code}", timings):
+            language_model.get_chat_model()
+
+
+def prewarm_embedding_models(timings: dict):
+    from aimodels.models import EmbeddingModel
+
+    for embedding_model in EmbeddingModel.objects.filter(prewarm=True):
+        with timed(f"embedding model {embedding_model.code}", timings):
+            embedding_model.get_model()
+
+
+def prewarm_vector_store_backends(timings: dict):
+    from vector_stores.models import VectorStoreBackend
+
+    for backend in VectorStoreBackend.objects.filter(prewarm=True):
+        with timed(f"vector store backend {backend.name}", timings):
+            backend.db_client.warm_up()
+
+
+def prewarm() -> dict:
+    """
+    Warm up the current process and return the time, in seconds, spent on each item.
+    """
+    timings = {}
+    if not settings.PREWARM_ENABLED:
+        return timings
+
+    start = time.perf_counter()
+    with timed("language models", timings):
+        prewarm_language_models(timings)
+    with timed("embedding models", timings):
+        prewarm_embedding_models(timings)
+    with timed("vector store backends", timings):
+        prewarm_vector_store_backends(timings)
+    logger.info(
+        f"Process prewarmed in {time.perf_counter() - start:.3f}s: "
+        + ", ".join(f"{label} {seconds:.3f}s" for label, seconds in timings.items())
+    )
+    return timings
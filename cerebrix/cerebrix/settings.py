@@ -49,6 +49,7 @@ INSTALLED_APPS = [
     'aimodels',
     'threads',
     'vector_stores',
+    'usage',
 ]
 
 MIDDLEWARE = [
@@ -172,6 +173,54 @@ AUTH_USER_MODEL = 'users.User'
 EJF_ENCRYPTION_KEYS = get_env('FIELD_ENCRYPTION_KEY', '')
 HUGGING_FACE_TOKEN = get_env('HUGGING_FACE_TOKEN', '')
 
+# Tokenizer registry configuration (per process)
+TOKENIZER_REGISTRY_MAX_SIZE = int(get_env('TOKENIZER_REGISTRY_MAX_SIZE', 8))
+TOKENIZER_REGISTRY_MAX_MEMORY_MB = int(get_env('TOKENIZER_REGISTRY_MAX_MEMORY_MB', 512))
+
+# Token count cache configuration (in-process LRU in front of redis)
+TOKEN_COUNT_CACHE_MAX_SIZE = int(get_env('TOKEN_COUNT_CACHE_MAX_SIZE', 10000))
+TOKEN_COUNT_CACHE_TTL = int(get_env('TOKEN_COUNT_CACHE_TTL', 7 * 24 * 60 * 60))  # 7 days
+
+# Maximum number of LangChain clients (chat, llm, embedding) cached per process
+MODEL_CLIENT_CACHE_MAX_SIZE = int(get_env('MODEL_CLIENT_CACHE_MAX_SIZE', 64))
+
+# Embedding executor configuration: concurrent and adaptive batching of the documents to embed
+EMBEDDING_EXECUTOR = {
+    'max_in_flight': int(get_env('EMBEDDING_MAX_IN_FLIGHT', 4)),
+    'batch_size': int(get_env('EMBEDDING_BATCH_SIZE', 32)),
+    'min_batch_size': 1,
+    'max_batch_size': int(get_env('EMBEDDING_MAX_BATCH_SIZE', 256)),
+    'target_latency': float(get_env('EMBEDDING_TARGET_LATENCY', 2.0)),  # seconds
+    'max_retries': 5,
+}
+
+# Maximum number of vector database clients (one per backend configuration) pooled per process
+VECTOR_DB_CLIENT_POOL_MAX_SIZE = int(get_env('VECTOR_DB_CLIENT_POOL_MAX_SIZE', 16))
+
+# Persistent cache of the computed embeddings. Backend can be 'redis', 'disk' or 'none'
+EMBEDDING_CACHE = {
+    'backend': get_env('EMBEDDING_CACHE_BACKEND', 'redis'),
+    'max_size_mb': int(get_env('EMBEDDING_CACHE_MAX_SIZE_MB', 1024)),
+    # used only by the 'disk' backend
+    'path': get_env('EMBEDDING_CACHE_PATH', BASE_DIR / 'cache' / 'embeddings.sqlite3'),
+}
+
+# Warm up tokenizers, LangChain clients and vector database connections when a process starts
+PREWARM_ENABLED = get_env('PREWARM_ENABLED', 'true').lower() == 'true'
+
+# Cache of the retrieved documents, invalidated when the documents of a store change
+RETRIEVAL_CACHE_ENABLED = get_env('RETRIEVAL_CACHE_ENABLED', 'true').lower() == 'true'
+RETRIEVAL_CACHE_TTL = int(get_env('RETRIEVAL_CACHE_TTL', 60 * 60))  # 1 hour
+
+# Outbox of the operations on the vector databases, applied by a celery worker
+VECTOR_STORE_OUTBOX = {
+    'batch_size': int(get_env('VECTOR_STORE_OUTBOX_BATCH_SIZE', 100)),
+    'max_attempts': int(get_env('VECTOR_STORE_OUTBOX_MAX_ATTEMPTS', 10)),
+}
+
+# Code of the LanguageModel used to count the tokens of the chunks, if not set the chunks are not counted
+CHUNK_TOKEN_COUNT_MODEL = get_env('CHUNK_TOKEN_COUNT_MODEL', None)
+
 # REDIS Configuration
 REDIS_HOST = get_env('REDIS_HOST', 'localhost')
 REDIS_PORT = get_env('REDIS_PORT', 6379)
@@ -187,6 +236,21 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = get_env('CELERY_TASK_TIME_LIMIT', 30 * 60)  # 30 minutes
+CELERY_BEAT_SCHEDULE = {
+    'flush-usage-buffer': {
+        'task': 'usage.tasks.flush_usage_buffer',
+        'schedule': float(get_env('USAGE_FLUSH_INTERVAL', 60)),  # seconds
+    },
+    'reconcile-vector-stores': {
+        'task': 'vector_stores.tasks.reconcile_vector_stores',
+        'schedule': float(get_env('VECTOR_STORES_RECONCILE_INTERVAL', 24 * 60 * 60)),  # seconds
+    },
+    # retry the operations of the outbox that failed or were not processed after their commit
+    'process-vector-store-operations': {
+        'task': 'vector_stores.tasks.process_vector_store_operations',
+        'schedule': float(get_env('VECTOR_STORE_OUTBOX_INTERVAL', 60)),  # seconds
+    },
+}
 
 # Media files (user uploaded content)
 MEDIA_URL = 'media/'
@@ -223,6 +287,11 @@ LOGGING = {
         },
     },
     'loggers': { 
+        'cerebrix': {
+            'handlers': ['console', 'file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
         'threads': {
             'handlers': ['console', 'file'],
             'level': 'DEBUG',
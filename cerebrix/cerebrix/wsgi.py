@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cerebrix.settings')
 
 application = get_wsgi_application()
+
+from cerebrix.prewarm import prewarm  # noqa: E402 (Django must be set up first)
+
+prewarm()
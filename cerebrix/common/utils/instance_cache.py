@@ -0,0 +1,82 @@
+import logging
+import threading
+from typing import Any, Callable, Hashable
+
+from .lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class InstanceCache:
+    """
+    Thread-safe per-process cache of expensive objects (API clients, connections...).
+
+    Each object is built once by the factory passed to `get_or_create` and then reused until it's
+    evicted or invalidated. The number of built and reused objects is tracked to measure the cache
+    effectiveness.
+
+    Args:
+        max_size: The maximum number of objects kept in the cache.
+        on_evict: Optional function called with each object removed by `invalidate`, e.g. to close it.
+    """
+
+    def __init__(self, max_size: int = 64, on_evict: Callable[[Any], None] = None):
+        self._cache = LRUCache(max_size=max_size)
+        self._lock = threading.Lock()
+        self._creation_locks = {}
+        self.on_evict = on_evict
+        self.constructed = 0
+        self.reused = 0
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]):
+        instance = self._cache.get(key)
+        if instance is not None:
+            self.reused += 1
+            return instance
+
+        with self._get_creation_lock(key):
+            instance = self._cache.get(key)
+            if instance is not None:
+                self.reused += 1
+                return instance
+            instance = factory()
+            self.constructed += 1
+            self._cache.set(key, instance)
+
+        with self._lock:
+            self._creation_locks.pop(key, None)
+        return instance
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Remove all the objects whose key matches `predicate` and return how many were removed.
+        """
+        removed = []
+        for key in self._cache.keys():
+            if predicate(key):
+                instance = self._cache.pop(key)
+                if instance is not None:
+                    removed.append(instance)
+        if self.on_evict:
+            for instance in removed:
+                try:
+                    self.on_evict(instance)
+                except Exception as e:
+                    logger.warning(f"Error while releasing a cached instance: {e}")
+        return len(removed)
+
+    def clear(self) -> int:
+        return self.invalidate(lambda key: True)
+
+    def stats(self) -> dict:
+        total = self.constructed + self.reused
+        return {
+            "size": len(self._cache),
+            "constructed": self.constructed,
+            "reused": self.reused,
+            "reuse_rate": self.reused / total if total else 0.0,
+        }
+
+    def _get_creation_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._creation_locks.setdefault(key, threading.Lock())
@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by number of entries and, optionally, by total weight.
+
+    The weight of each entry is computed by `weigh` when the entry is stored, this allows
+    to bound the cache by an estimate of the memory used by its values.
+
+    Args:
+        max_size: The maximum number of entries in the cache.
+        max_weight: The maximum total weight of the entries in the cache. If None, only `max_size` is used.
+        weigh: A function returning the weight of a value. Defaults to 1 for every value.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 128,
+        max_weight: int = None,
+        weigh: Callable[[Any], int] = None,
+    ):
+        self.max_size = max_size
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda value: 1)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._weights = {}
+        self._weight = 0
+        self._lock = threading.RLock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            weight = self.weigh(value)
+            self._data[key] = value
+            self._weights[key] = weight
+            self._weight += weight
+            self._evict()
+
+    def pop(self, key: Hashable, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key]
+            self._remove(key)
+            return value
+
+    def remove_if(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Remove all the entries whose key matches `predicate` and return how many were removed.
+        """
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._weights.clear()
+            self._weight = 0
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._data.keys())
+
+    @property
+    def weight(self) -> int:
+        return self._weight
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "weight": self._weight,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def _remove(self, key: Hashable):
+        del self._data[key]
+        self._weight -= self._weights.pop(key)
+
+    def _evict(self):
+        # the most recently stored entry is never evicted, even if it alone exceeds max_weight
+        while len(self._data) > 1 and (
+            len(self._data) > self.max_size
+            or (self.max_weight is not None and self._weight > self.max_weight)
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.evictions += 1
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Exists, OuterRef
 import json
 
 from common.models.mixins import TimestampUserModel, TimestampModel
@@ -63,6 +64,71 @@ class RAGBackend(TimestampModel):
     def __str__(self):
         return f"{self.code}"
 
+    def get_vector_document_ids(self, thread: "Thread" = None) -> list[int] | None:
+        """
+        Return the ids of the VectorDocuments that can be used to answer in the thread.
+        None means that all the documents of the vector store can be used.
+        """
+        from vector_stores.models import VectorDocument
+
+        allowed = None
+        if self.vector_documents.exists():
+            allowed = set(self.vector_documents.values_list("id", flat=True))
+            if self.allow_upload_documents and thread and thread.user_id:
+                allowed.update(
+                    VectorDocument.objects.filter(
+                        store=self.vector_store, documents__user_id=thread.user_id
+                    ).values_list("id", flat=True)
+                )
+
+        if thread and thread.vector_documents.exists():
+            thread_documents = set(thread.vector_documents.values_list("id", flat=True))
+            allowed = thread_documents if allowed is None else thread_documents & allowed
+
+        return sorted(allowed) if allowed is not None else None
+
+    def get_vector_documents_queryset(self, thread: "Thread" = None):
+        """
+        Return the QuerySet of the VectorDocuments that can be used to answer in the thread,
+        the same of `get_vector_document_ids` built as a single query, without reading the ids.
+        """
+        from vector_stores.models import Document, VectorDocument
+
+        rag_documents = RAGBackend.vector_documents.through.objects.filter(ragbackend_id=self.pk)
+        allowed = ~Exists(rag_documents) | Exists(rag_documents.filter(vectordocument_id=OuterRef("pk")))
+        if self.allow_upload_documents and thread and thread.user_id:
+            allowed |= Exists(Document.objects.filter(user_id=thread.user_id, vector_documents=OuterRef("pk")))
+
+        queryset = VectorDocument.objects.filter(allowed, store=self.vector_store)
+        if thread:
+            thread_documents = Thread.vector_documents.through.objects.filter(thread_id=thread.pk)
+            queryset = queryset.filter(
+                ~Exists(thread_documents) | Exists(thread_documents.filter(vectordocument_id=OuterRef("pk")))
+            )
+        return queryset.values("id")
+
+    def get_retriever(self, thread: "Thread" = None, **kwargs):
+        """
+        Return the retriever of the vector store, restricted to the documents allowed in the thread.
+        The restriction is applied by the vector database as a filter on the `vector_document_id` payload.
+        Clients with SQL filters join the allowed documents in the search query instead: the results are not
+        cached since the cache key can't follow the changes of the allowed documents.
+        In multitenant stores the search is also scoped to the shared documents and the ones of the thread user.
+        """
+        from vector_stores.utils.tenants import get_search_tenants
+
+        if self.vector_store.multitenant:
+            kwargs.setdefault("tenant_ids", get_search_tenants(thread.user_id if thread else None))
+        client = self.vector_store.backend.db_client
+        if client.supports_sql_filters:
+            kwargs.setdefault("use_cache", False)
+            return client.get_retriever(
+                self.vector_store, vector_document_ids=self.get_vector_documents_queryset(thread), **kwargs
+            )
+        return client.get_retriever(
+            self.vector_store, vector_document_ids=self.get_vector_document_ids(thread), **kwargs
+        )
+
 
 class Thread(TimestampModel):
     """
@@ -16,6 +16,8 @@ from threads.exceptions import TokenLimitExceededError
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import BaseMessage
 from threads.utils import format_message_for_token_count
+from usage.ledger import record_response_usage, usage_user
+from usage.types import UsageKind
 
 logger = logging.getLogger("threads.services")
 
@@ -80,6 +82,11 @@ class ThreadService:
         return [], 0
 
     def send_message(self, message: str):
+        # the embeddings computed for the RAG are attributed to the thread user
+        with usage_user(self.thread.user):
+            return self._send_message(message)
+
+    def _send_message(self, message: str):
         # get last system message
         last_system_message = (
             self.thread.messages.filter(role=MessageRole.SYSTEM)
@@ -110,6 +117,9 @@ class ThreadService:
             resp = runnable.invoke(
                 {"input": message, "memory": memory}, max_tokens=tokens_to_send
             )
+            record_response_usage(
+                self.thread.user, UsageKind.CHAT, self.chat_model.code, resp
+            )
 
             ThreadMessage.objects.create(
                 thread=self.thread,
@@ -139,7 +149,7 @@ class ThreadService:
         if not self.thread.backend.rag_backend:
             return ('human', {input})
         
-        retriever = self.thread.backend.rag_backend.get_retriever()
+        retriever = self.thread.backend.rag_backend.get_retriever(self.thread)
         context = retriever.invoke(input)
         context_str = "\n".join([doc.page_content for doc in context])
         
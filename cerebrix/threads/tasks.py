@@ -1,7 +1,9 @@
 import logging
 from datetime import timedelta
+from itertools import groupby
 from time import sleep
 
+from celery import shared_task
 from langchain_core.prompts import ChatPromptTemplate
 from threads.models import Thread, ThreadMessage
 from threads.prompts import THREAD_SUMMARY_PROMPT
@@ -9,7 +11,9 @@ from threads.types import MessageRole
 
 from common.utils import get_input_tokens, get_output_tokens
 from common.utils.tasks import locked_task
-from threads.utils import format_message_for_token_count
+from threads.utils import format_message_for_token_count, count_messages_tokens
+from usage.ledger import record_response_usage
+from usage.types import UsageKind
 
 logger = logging.getLogger("threads.tasks")
 
@@ -86,6 +90,9 @@ def update_memory_summary(self, thread_id: int, thread_message_id: int):
             }
         )
         logger.debug(f"Summary: {resp}")
+        record_response_usage(
+            thread.user, UsageKind.SUMMARY, thread.backend.chat_model.code, resp
+        )
     except Exception as e:
         logger.error(f"Error summarizing thread: {e}")
         return
@@ -110,3 +117,61 @@ def update_memory_summary(self, thread_id: int, thread_message_id: int):
         ),
         role=MessageRole.SUMMARIZER,
     )
+
+
+def backfill_tokens(chat_model, messages) -> int:
+    """
+    Count, in a single batch, the content tokens of the given messages and store them.
+    Returns the number of updated messages.
+    """
+    messages = [message for message in messages if message.content]
+    if not messages:
+        return 0
+    for message, tokens in zip(messages, count_messages_tokens(chat_model, messages)):
+        message.content_tokens = tokens
+    # bulk_update doesn't call ThreadMessage.save so the tokens are not counted again
+    ThreadMessage.objects.bulk_update(messages, ["content_tokens"])
+    return len(messages)
+
+
+@shared_task
+def backfill_message_tokens(thread_id: int = None, batch_size: int = 1000):
+    """
+    Count the content tokens of all the messages that don't have them yet.
+
+    Messages are processed in chunks of `batch_size` and, inside each chunk, grouped by chat model
+    so that every group is counted with a single call to `LanguageModel.count_tokens_batch`.
+
+    Args:
+        thread_id (int): If provided, only the messages of this thread are updated
+        batch_size (int): Number of messages loaded and counted at once
+    """
+    qs = (
+        ThreadMessage.objects.filter(content_tokens=0, content__isnull=False)
+        .exclude(thread__backend__chat_model__isnull=True)
+        .select_related("thread__backend__chat_model")
+        .order_by("thread__backend__chat_model_id", "id")
+    )
+    if thread_id is not None:
+        qs = qs.filter(thread_id=thread_id)
+
+    updated = 0
+    chunk = []
+    for message in qs.iterator(chunk_size=batch_size):
+        chunk.append(message)
+        if len(chunk) >= batch_size:
+            updated += _backfill_chunk(chunk)
+            chunk = []
+    if chunk:
+        updated += _backfill_chunk(chunk)
+
+    logger.info(f"Backfilled content tokens of {updated} messages")
+    return updated
+
+
+def _backfill_chunk(messages: list) -> int:
+    updated = 0
+    for _, group in groupby(messages, key=lambda m: m.thread.backend.chat_model_id):
+        group = list(group)
+        updated += backfill_tokens(group[0].thread.backend.chat_model, group)
+    return updated
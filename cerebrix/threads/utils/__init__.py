@@ -1,3 +1,4 @@
+import json
 
 from  ..types import MessageRole
 
@@ -12,4 +13,17 @@ def format_message_for_token_count(message: str, type: MessageRole) -> str:
     elif type == MessageRole.SUMMARIZER or type == MessageRole.SYSTEM:
         return f"System: {message}"
     else:
-        return message
\ No newline at end of file
+        return message
+
+
+def count_messages_tokens(chat_model, messages) -> list[int]:
+    """
+    Count the tokens of many ThreadMessages at once using the batch tokenizer of the chat model.
+    """
+    texts = []
+    for message in messages:
+        value = message.content_value
+        if not isinstance(value, str):
+            value = json.dumps(value)
+        texts.append(format_message_for_token_count(value, message.role))
+    return chat_model.count_tokens_batch(texts)
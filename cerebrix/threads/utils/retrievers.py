@@ -4,7 +4,7 @@ from typing import Any, Optional
 from langchain_core.runnables import Runnable, RunnableConfig
 from langchain_core.documents import Document
 
-from cerebrix.threads.models import Thread
+from threads.models import Thread
 
 
 class BaseThreadRetriever(Runnable):
@@ -22,10 +22,5 @@ class VectorStoreThreadRetriever(BaseThreadRetriever):
     def invoke(
         self, input: str, config: Optional[RunnableConfig] = None, **kwargs: Any
     ) -> list[Document]:
-        pass
-        rag = self.thread.backend.vector_store.rag_backend
-        vector_store = rag.vector_store
-        
-        db_client = vector_store.get_db_client()
-        retriever = db_client.get_retriever(vector_store)
-        return retriever.invoke(input)
+        rag = self.thread.backend.rag_backend
+        return rag.get_retriever(self.thread).invoke(input, config=config, **kwargs)
@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import UsageRecord
+
+
+@admin.register(UsageRecord)
+class UsageRecordAdmin(admin.ModelAdmin):
+    list_display = ('day', 'user', 'kind', 'model_code', 'requests', 'input_tokens', 'output_tokens', 'items')
+    list_filter = ('kind', 'model_code', 'day')
+    search_fields = ('user__email', 'model_code')
@@ -0,0 +1,181 @@
+"""
+Usage ledger.
+
+Recording usage must not slow down the model calls, so `record_usage` only increments counters
+in a redis hash (a single round trip, no database write). The counters are periodically flushed
+by the `usage.tasks.flush_usage_buffer` task, that aggregates them per user, kind, model and day
+and upserts them in bulk in the UsageRecord table.
+"""
+import logging
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connection, transaction
+from django.utils import timezone
+from psycopg2.extras import execute_values
+from redis.exceptions import RedisError, ResponseError
+
+from common.utils.redis import get_redis_client
+from .models import UsageRecord
+from .types import UsageKind
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = "usage:buffer"
+FLUSHING_KEY_PREFIX = "usage:buffer:flushing:"
+FLUSH_LOCK_KEY = "usage:flush:lock"
+COUNTERS = ("requests", "input_tokens", "output_tokens", "items")
+
+# user the usage is attributed to when the caller can't pass it explicitly (e.g. embeddings)
+current_user_id: ContextVar = ContextVar("usage_current_user_id", default=None)
+
+
+@contextmanager
+def usage_user(user):
+    """
+    Attribute to `user` the usage recorded inside the block without an explicit user.
+    """
+    token = current_user_id.set(user.pk if user else None)
+    try:
+        yield
+    finally:
+        current_user_id.reset(token)
+
+
+def record_usage(
+    user,
+    kind: UsageKind,
+    model_code: str,
+    input_tokens: int = 0,
+    output_tokens: int = 0,
+    items: int = 0,
+    requests: int = 1,
+):
+    """
+    Add the usage of a model to the buffer. `user` can be a User, its id or None; if None,
+    the user set with `usage_user` is used.
+    """
+    user_id = getattr(user, "pk", user)
+    if user_id is None:
+        user_id = current_user_id.get()
+    field_prefix = "|".join(
+        [str(user_id or ""), str(kind), model_code, timezone.now().date().isoformat()]
+    )
+    counters = {
+        "requests": requests,
+        "input_tokens": max(input_tokens, 0),
+        "output_tokens": max(output_tokens, 0),
+        "items": items,
+    }
+    try:
+        pipeline = get_redis_client().pipeline(transaction=False)
+        for counter, value in counters.items():
+            if value:
+                pipeline.hincrby(BUFFER_KEY, f"{field_prefix}|{counter}", value)
+        pipeline.execute()
+    except RedisError as e:
+        logger.warning(f"Unable to record the usage of {model_code}: {e}")
+
+
+def record_response_usage(user, kind: UsageKind, model_code: str, response):
+    """
+    Record the usage of a LangChain model response, using the token counts of its usage metadata if available.
+    """
+    from common.utils import get_input_tokens, get_output_tokens
+
+    if getattr(response, "usage_metadata", None):
+        input_tokens, output_tokens = get_input_tokens(response), get_output_tokens(response)
+    else:
+        input_tokens = output_tokens = 0
+    record_usage(user, kind, model_code, input_tokens=input_tokens, output_tokens=output_tokens)
+
+
+def flush_usage() -> int:
+    """
+    Move the buffered usage to the database and return the number of upserted rows.
+
+    The buffer is atomically renamed before being read, so the usage recorded while flushing goes to
+    a new buffer. If the database write fails the renamed buffer is kept and flushed the next time.
+    """
+    redis_client = get_redis_client()
+    # only one flush at a time, otherwise the same buffer could be counted twice
+    lock = redis_client.lock(FLUSH_LOCK_KEY, timeout=300, blocking_timeout=0)
+    if not lock.acquire():
+        logger.debug("Usage flush already running")
+        return 0
+
+    try:
+        flushing_key = f"{FLUSHING_KEY_PREFIX}{uuid.uuid4().hex}"
+        try:
+            redis_client.rename(BUFFER_KEY, flushing_key)
+        except ResponseError:
+            # no usage recorded since the last flush
+            pass
+
+        upserted = 0
+        for key in list(redis_client.scan_iter(match=f"{FLUSHING_KEY_PREFIX}*")):
+            rows = aggregate(redis_client.hgetall(key))
+            upsert(rows)
+            redis_client.delete(key)
+            upserted += len(rows)
+    finally:
+        lock.release()
+    logger.debug(f"Flushed {upserted} usage rows")
+    return upserted
+
+
+def aggregate(buffer: dict) -> dict:
+    """
+    Group the buffered counters by (user_id, kind, model_code, day).
+    """
+    rows = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for field, value in buffer.items():
+        field = field.decode() if isinstance(field, bytes) else field
+        user_id, kind, rest = field.split("|", 2)
+        model_code, day, counter = rest.rsplit("|", 2)
+        if counter not in COUNTERS:
+            continue
+        rows[(int(user_id) if user_id else None, kind, model_code, day)][counter] += int(value)
+    return rows
+
+
+def upsert(rows: dict):
+    if not rows:
+        return
+    table = UsageRecord._meta.db_table
+    now = timezone.now()
+    values = [
+        (user_id, kind, model_code, day, *[counters[c] for c in COUNTERS], now)
+        for (user_id, kind, model_code, day), counters in rows.items()
+    ]
+    updates = ", ".join(f"{c} = {table}.{c} + EXCLUDED.{c}" for c in COUNTERS)
+    with transaction.atomic(), connection.cursor() as cursor:
+        execute_values(
+            cursor.cursor,
+            f"INSERT INTO {table} (user_id, kind, model_code, day, {', '.join(COUNTERS)}, updated_at) "
+            f"VALUES %s ON CONFLICT (user_id, kind, model_code, day) "
+            f"DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at",
+            values,
+        )
+
+
+def merge_user_usage(user_id: int):
+    """
+    Move the usage of a user to the anonymous usage (user NULL), adding it to the rows with the same key.
+
+    Called before the user is deleted: the unique key treats NULL users as equal, so setting the user
+    to NULL would conflict with the anonymous rows, or the ones of a user deleted before.
+    """
+    table = UsageRecord._meta.db_table
+    updates = ", ".join(f"{c} = {table}.{c} + EXCLUDED.{c}" for c in COUNTERS)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, kind, model_code, day, {', '.join(COUNTERS)}, updated_at) "
+            f"SELECT NULL, kind, model_code, day, {', '.join(COUNTERS)}, %s FROM {table} WHERE user_id = %s "
+            f"ON CONFLICT (user_id, kind, model_code, day) "
+            f"DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at",
+            [timezone.now(), user_id],
+        )
+        cursor.execute(f"DELETE FROM {table} WHERE user_id = %s", [user_id])
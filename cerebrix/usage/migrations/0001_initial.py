@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-17 11:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('chat', 'Chat'), ('summary', 'Summary'), ('embedding', 'Embedding')], max_length=20)),
+                ('model_code', models.CharField(max_length=255)),
+                ('day', models.DateField()),
+                ('requests', models.BigIntegerField(default=0)),
+                ('input_tokens', models.BigIntegerField(default=0)),
+                ('output_tokens', models.BigIntegerField(default=0)),
+                ('items', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day'], name='usage_usage_day_5e0712_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'kind', 'model_code', 'day'), name='usage_record_unique_key', nulls_distinct=False)],
+            },
+        ),
+    ]
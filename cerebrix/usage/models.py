@@ -0,0 +1,46 @@
+from django.db import models
+
+from .types import UsageKind
+
+
+class UsageRecord(models.Model):
+    """
+    Daily usage of a model by a user.
+
+    Rows are never written directly by the code calling the models: usage is first buffered
+    in redis and then periodically flushed, pre-aggregated, with a single upsert.
+    See `usage.ledger`.
+    """
+
+    # the usage of a deleted user is merged in the rows without user, see usage.signals
+    user = models.ForeignKey(
+        "users.User", on_delete=models.SET_NULL, null=True, blank=True, related_name="usage"
+    )
+    kind = models.CharField(max_length=20, choices=UsageKind.choices)
+    # code of the LanguageModel or EmbeddingModel, kept as a string so that the usage
+    # survives the deletion of the model
+    model_code = models.CharField(max_length=255)
+    day = models.DateField()
+
+    # number of calls to the model
+    requests = models.BigIntegerField(default=0)
+    input_tokens = models.BigIntegerField(default=0)
+    output_tokens = models.BigIntegerField(default=0)
+    # number of embedded texts
+    items = models.BigIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-day"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "kind", "model_code", "day"],
+                name="usage_record_unique_key",
+                nulls_distinct=False,
+            )
+        ]
+        indexes = [models.Index(fields=["day"])]
+
+    def __str__(self):
+        return f"{self.user} - {self.model_code} - {self.day}"
@@ -0,0 +1,13 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from users.models import User
+from .ledger import merge_user_usage
+
+
+@receiver(pre_delete, sender=User)
+def merge_deleted_user_usage(sender, instance, **kwargs):
+    """
+    Keep the usage of a deleted user as anonymous usage, see `usage.ledger.merge_user_usage`.
+    """
+    merge_user_usage(instance.pk)
@@ -0,0 +1,15 @@
+import logging
+
+from celery import shared_task
+
+from .ledger import flush_usage
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_usage_buffer():
+    """
+    Flush the usage buffered in redis to the UsageRecord table.
+    """
+    return flush_usage()
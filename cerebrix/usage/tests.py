@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.test import SimpleTestCase, TestCase
+
+from usage.ledger import aggregate
+from usage.models import UsageRecord
+from usage.types import UsageKind
+from users.models import User
+
+
+class UsageLedgerTests(SimpleTestCase):
+    def test_aggregate_groups_counters_by_key(self):
+        buffer = {
+            b"1|chat|mistral|2026-10-17|requests": b"3",
+            b"1|chat|mistral|2026-10-17|input_tokens": b"120",
+            b"1|chat|mistral|2026-10-17|output_tokens": b"40",
+            b"|embedding|mistral-embed|2026-10-17|items": b"10",
+        }
+
+        rows = aggregate(buffer)
+
+        self.assertEqual(
+            rows[(1, "chat", "mistral", "2026-10-17")],
+            {"requests": 3, "input_tokens": 120, "output_tokens": 40, "items": 0},
+        )
+        self.assertEqual(rows[(None, "embedding", "mistral-embed", "2026-10-17")]["items"], 10)
+
+
+class UsageRecordTests(TestCase):
+    def test_deleted_user_usage_is_merged_in_anonymous_usage(self):
+        user = User.objects.create_user("usage@example.com")
+        key = dict(kind=UsageKind.CHAT, model_code="mistral", day=date(2026, 10, 17))
+        UsageRecord.objects.create(user=None, requests=2, input_tokens=10, **key)
+        UsageRecord.objects.create(user=user, requests=3, input_tokens=20, **key)
+
+        user.delete()
+
+        record = UsageRecord.objects.get(**key)
+        self.assertIsNone(record.user_id)
+        self.assertEqual((record.requests, record.input_tokens), (5, 30))
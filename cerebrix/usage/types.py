@@ -0,0 +1,10 @@
+from django.db import models
+
+
+class UsageKind(models.TextChoices):
+    """
+    The kinds of model usage tracked by the ledger.
+    """
+    CHAT = "chat", "Chat"
+    SUMMARY = "summary", "Summary"
+    EMBEDDING = "embedding", "Embedding"
@@ -2,7 +2,15 @@ from django.contrib import admin
 
 # Register your models here.
 from django.contrib import admin
-from vector_stores.models import VectorStoreBackend, VectorStore, Document, VectorDocument
+from vector_stores.models import (
+    VectorStoreBackend,
+    VectorStore,
+    Document,
+    VectorDocument,
+    VectorStoreReindex,
+    Chunk,
+    VectorStoreOperation,
+)
 
 
 @admin.register(VectorStoreBackend)
@@ -29,3 +37,26 @@ class DocumentAdmin(admin.ModelAdmin):
 class VectorDocumentAdmin(admin.ModelAdmin):
     list_display = ('__str__', 'store',)
     list_filter = ('store',)
+
+
+@admin.register(VectorStoreReindex)
+class VectorStoreReindexAdmin(admin.ModelAdmin):
+    list_display = ('store', 'collection_name', 'status', 'reindexed_documents', 'created_at', 'completed_at')
+    list_filter = ('status', 'store')
+    readonly_fields = ('last_vector_document_id', 'reindexed_documents', 'reindexed_vectors', 'error')
+
+
+@admin.register(Chunk)
+class ChunkAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'vector_document', 'page_number', 'token_count')
+    search_fields = ('text',)
+    raw_id_fields = ('vector_document',)
+    readonly_fields = ('point_id', 'hash')
+
+
+@admin.register(VectorStoreOperation)
+class VectorStoreOperationAdmin(admin.ModelAdmin):
+    list_display = ('operation', 'store_code', 'status', 'attempts', 'created_at', 'processed_at')
+    list_filter = ('status', 'operation')
+    search_fields = ('store_code',)
+    readonly_fields = ('attempts', 'error', 'processed_at')
@@ -0,0 +1,114 @@
+import logging
+import uuid
+
+import xxhash
+from django.conf import settings
+from langchain_core.documents import Document as LangchainDocument
+
+from vector_stores.models import Chunk, VectorDocument, VectorStore
+
+logger = logging.getLogger(__name__)
+
+# metadata kept in the payload of the vectors, used to filter the searches
+PAYLOAD_METADATA = ("vector_document_id", "tenant_id", "user_id")
+# metadata saved in the Chunk columns
+CHUNK_METADATA = ("page_number",)
+
+
+def get_payload_metadata(metadata: dict) -> dict:
+    return {key: metadata[key] for key in PAYLOAD_METADATA if metadata.get(key) is not None}
+
+
+def count_tokens(texts: list[str]) -> list[int | None]:
+    """
+    Count the tokens of the texts with the LanguageModel `settings.CHUNK_TOKEN_COUNT_MODEL`.
+    Without it, or if the model can't count them, the counts are None.
+    """
+    if not settings.CHUNK_TOKEN_COUNT_MODEL:
+        return [None] * len(texts)
+    from aimodels.models import LanguageModel
+
+    try:
+        model = LanguageModel.objects.get(code=settings.CHUNK_TOKEN_COUNT_MODEL)
+        return model.count_tokens_batch(texts)
+    except Exception as e:
+        logger.warning(f"Unable to count the tokens of the chunks with {settings.CHUNK_TOKEN_COUNT_MODEL}: {e}")
+        return [None] * len(texts)
+
+
+def build_chunks(
+    vector_document: VectorDocument,
+    documents: list[LangchainDocument],
+    point_ids: list[str],
+    texts: list[str] = None,
+) -> list[Chunk]:
+    """
+    Build the Chunks of the documents stored in the vector database with the given point ids.
+
+    Args:
+        texts: The texts returned by the retrieval instead of the documents page_content, see `store_documents`.
+    """
+    texts = texts or [document.page_content for document in documents]
+    token_counts = count_tokens(texts)
+    chunks = []
+    for position, (document, point_id, text, token_count) in enumerate(
+        zip(documents, point_ids, texts, token_counts)
+    ):
+        metadata = {
+            key: value
+            for key, value in document.metadata.items()
+            if key not in PAYLOAD_METADATA and key not in CHUNK_METADATA
+        }
+        chunks.append(
+            Chunk(
+                vector_document=vector_document,
+                position=position,
+                text=text,
+                embedding_text=document.page_content if document.page_content != text else None,
+                token_count=token_count,
+                page_number=document.metadata.get("page_number"),
+                metadata=metadata,
+                hash=xxhash.xxh64(text.encode()).hexdigest(),
+                point_id=point_id,
+            )
+        )
+    return chunks
+
+
+def get_chunks(store: "VectorStore", point_ids: list) -> dict[uuid.UUID, Chunk]:
+    """
+    Return the Chunks of the given vector ids of the store, read with a single query.
+    The vector ids are unique in a store: a restored copy of the store has the same ones.
+    """
+    point_ids = {uuid.UUID(str(point_id)) for point_id in point_ids}
+    if not point_ids:
+        return {}
+    return {
+        chunk.point_id: chunk
+        for chunk in Chunk.objects.filter(point_id__in=point_ids, vector_document__store_id=store.pk)
+    }
+
+
+def hydrate_documents(store: "VectorStore", documents: list[LangchainDocument]) -> list[LangchainDocument]:
+    """
+    Fill the text and the metadata of the documents retrieved from the store with their Chunks.
+    The documents without a Chunk, loaded before the chunks were saved in the database,
+    keep the text read from the vector database payload.
+    """
+    chunks = get_chunks(
+        store, [document.metadata["_id"] for document in documents if document.metadata.get("_id")]
+    )
+    if not chunks:
+        return documents
+    for document in documents:
+        chunk = chunks.get(uuid.UUID(str(document.metadata["_id"]))) if document.metadata.get("_id") else None
+        if chunk is None:
+            continue
+        document.page_content = chunk.text
+        document.metadata = {
+            **chunk.metadata,
+            "page_number": chunk.page_number,
+            "chunk_id": chunk.pk,
+            **document.metadata,
+        }
+    return documents
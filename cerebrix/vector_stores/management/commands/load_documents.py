@@ -0,0 +1,66 @@
+from contextlib import nullcontext
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import User
+from vector_stores.models import VectorStore
+from vector_stores.outbox import ensure_store
+from vector_stores.utils.document_loaders import PDFDocumentLoader
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the PDF files, or the PDF files in the directories, in a vector store. "
+        "With --bulk the index of the store is built once at the end instead of at every write."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("code", help="The code of the vector store")
+        parser.add_argument("paths", nargs="+", help="PDF files or directories with PDF files")
+        parser.add_argument("--user", help="Email of the owner of the documents")
+        parser.add_argument("--public", action="store_true", help="Make the documents public")
+        parser.add_argument(
+            "--bulk", action="store_true", help="Disable the indexing of the store until all the files are loaded"
+        )
+        parser.add_argument(
+            "--wait-index", action="store_true", help="With --bulk, wait until the index is built"
+        )
+
+    def get_files(self, paths: list[str]) -> list[Path]:
+        files = []
+        for path in map(Path, paths):
+            if path.is_dir():
+                files.extend(sorted(file for file in path.rglob("*") if file.suffix.lower() == ".pdf"))
+            elif path.is_file():
+                files.append(path)
+            else:
+                raise CommandError(f"{path} not found")
+        return files
+
+    def handle(self, *args, **options):
+        store = VectorStore.objects.filter(code=options["code"]).select_related("backend").first()
+        if store is None:
+            raise CommandError(f"Vector store {options['code']} not found")
+        user = None
+        if options["user"]:
+            user = User.objects.filter(email=options["user"]).first()
+            if user is None:
+                raise CommandError(f"User {options['user']} not found")
+
+        files = self.get_files(options["paths"])
+        self.stdout.write(f"Loading {len(files)} files in {store.code}")
+        ensure_store(store)
+        client = store.backend.db_client
+        loaded = failed = 0
+        context = client.bulk_load(store, wait_index=options["wait_index"]) if options["bulk"] else nullcontext()
+        with context:
+            for file in files:
+                try:
+                    PDFDocumentLoader(str(file), store, user=user, public=options["public"]).load()
+                    loaded += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"Unable to load {file}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Loaded {loaded} files, {failed} failed"))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vector_stores.models import VectorStore
+from vector_stores.reindex import start_reindex, run_reindex
+from vector_stores.tasks import reindex_vector_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Embed again all the documents of a vector store, with its current embedding model and settings, "
+        "in a new collection that replaces the current one when completed. An unfinished reindex is continued."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("code", help="The code of the vector store")
+        parser.add_argument(
+            "--restart", action="store_true", help="Discard the unfinished reindex and start from scratch"
+        )
+        parser.add_argument(
+            "--sync", action="store_true", help="Run the reindex in this process instead of a celery worker"
+        )
+        parser.add_argument("--batch-size", type=int, default=100, help="Number of documents for each checkpoint")
+
+    def handle(self, *args, **options):
+        store = VectorStore.objects.filter(code=options["code"]).select_related("backend").first()
+        if store is None:
+            raise CommandError(f"Vector store {options['code']} not found")
+
+        reindex = start_reindex(store, restart=options["restart"])
+        self.stdout.write(
+            f"Reindexing {store.code} in {reindex.collection_name} from document {reindex.last_vector_document_id}"
+        )
+        if options["sync"]:
+            run_reindex(reindex, batch_size=options["batch_size"])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Reindexed {reindex.reindexed_documents} documents, {reindex.reindexed_vectors} vectors"
+                )
+            )
+        else:
+            reindex_vector_store.delay(reindex.pk)
+            self.stdout.write(f"Reindex {reindex.pk} queued")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vector_stores.models import VectorStoreBackend
+from vector_stores.snapshots import restore_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Restore a snapshot saved by snapshot_vector_store as a new vector store of a backend, "
+        "without loading and embedding the documents again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The snapshot directory")
+        parser.add_argument("backend", type=int, help="The id of the VectorStoreBackend")
+        parser.add_argument("--code", help="The code of the new store, by default the code of the snapshot")
+        parser.add_argument("--name", help="The name of the new store, by default the name of the snapshot")
+
+    def handle(self, *args, **options):
+        backend = VectorStoreBackend.objects.filter(pk=options["backend"]).first()
+        if backend is None:
+            raise CommandError(f"Vector store backend {options['backend']} not found")
+
+        store = restore_snapshot(options["path"], backend, code=options["code"], name=options["name"])
+        self.stdout.write(self.style.SUCCESS(f"Snapshot restored in vector store {store.code}"))
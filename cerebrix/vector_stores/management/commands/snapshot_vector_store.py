@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vector_stores.models import VectorStore
+from vector_stores.snapshots import create_snapshot
+from vector_stores.tasks import snapshot_vector_store
+
+
+class Command(BaseCommand):
+    help = (
+        "Save a snapshot of a vector store in a local directory: the collection snapshot streamed from the "
+        "vector database and its documents, VectorDocuments and chunks as JSONL. See restore_vector_store."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("code", help="The code of the vector store")
+        parser.add_argument("path", help="The directory where the snapshot directory is created")
+        parser.add_argument(
+            "--async", action="store_true", dest="run_async", help="Run the snapshot in a celery worker"
+        )
+
+    def handle(self, *args, **options):
+        store = VectorStore.objects.filter(code=options["code"]).select_related("backend").first()
+        if store is None:
+            raise CommandError(f"Vector store {options['code']} not found")
+
+        if options["run_async"]:
+            snapshot_vector_store.delay(store.pk, options["path"])
+            self.stdout.write(f"Snapshot of {store.code} queued")
+            return
+        directory = create_snapshot(store, options["path"])
+        self.stdout.write(self.style.SUCCESS(f"Snapshot of {store.code} saved in {directory}"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vector_stores', '0005_vectordocument_embedding_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vectorstorebackend',
+            name='prewarm',
+            field=models.BooleanField(default=False),
+        ),
+    ]
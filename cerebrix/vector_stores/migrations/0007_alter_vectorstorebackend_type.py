@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vector_stores', '0006_vectorstorebackend_prewarm'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vectorstorebackend',
+            name='type',
+            field=models.IntegerField(choices=[(1, 'Qdrant'), (2, 'NumPy')]),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-17 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vector_stores', '0007_alter_vectorstorebackend_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vectorstore',
+            name='hnsw_ef_construct',
+            field=models.PositiveIntegerField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='vectorstore',
+            name='hnsw_m',
+            field=models.PositiveIntegerField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='vectorstore',
+            name='on_disk_payload',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='vectorstore',
+            name='on_disk_vectors',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='vectorstore',
+            name='quantization',
+            field=models.IntegerField(choices=[(0, 'None'), (1, 'Scalar'), (2, 'Product'), (3, 'Binary')], default=0),
+        ),
+        migrations.AddField(
+            model_name='vectorstore',
+            name='quantization_always_ram',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vector_stores', '0008_vectorstore_index_settings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vectorstore',
+            name='hybrid_search',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-17 12:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def set_indexed_embedding_model(apps, schema_editor):
+    VectorStore = apps.get_model('vector_stores', 'VectorStore')
+    for store in VectorStore.objects.select_related('backend'):
+        store.indexed_embedding_model_id = store.embedding_model_id or store.backend.embedding_model_id
+        store.save(update_fields=['indexed_embedding_model'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aimodels', '0014_embeddingmodel_prewarm_languagemodel_prewarm'),
+        ('vector_stores', '0009_vectorstore_hybrid_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vectorstore',
+            name='indexed_embedding_model',
+            field=models.ForeignKey(blank=True, default=None, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='indexed_vector_stores', to='aimodels.embeddingmodel'),
+        ),
+        migrations.RunPython(set_indexed_embedding_model, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='VectorStoreReindex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('collection_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('last_vector_document_id', models.BigIntegerField(default=0)),
+                ('reindexed_documents', models.IntegerField(default=0)),
+                ('reindexed_vectors', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('embedding_model', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='aimodels.embeddingmodel')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reindexes', to='vector_stores.vectorstore')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vector_stores', '0010_vectorstore_indexed_embedding_model_vectorstorereindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vectorstore',
+            name='multitenant',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='vectorstore',
+            name='shard_by_tenant',
+            field=models.BooleanField(default=False),
+        ),
+    ]
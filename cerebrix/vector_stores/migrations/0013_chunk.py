@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-17 14:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vector_stores', '0012_alter_vectorstorebackend_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Chunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('text', models.TextField()),
+                ('embedding_text', models.TextField(blank=True, default=None, null=True)),
+                ('token_count', models.PositiveIntegerField(blank=True, default=None, null=True)),
+                ('page_number', models.PositiveIntegerField(blank=True, default=None, null=True)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('hash', models.CharField(max_length=16)),
+                ('point_id', models.UUIDField(unique=True)),
+                ('vector_document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='vector_stores.vectordocument')),
+            ],
+            options={
+                'ordering': ('vector_document', 'position'),
+                'constraints': [models.UniqueConstraint(fields=('vector_document', 'position'), name='unique_chunk_position')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-17 14:45
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vector_stores', '0013_chunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VectorStoreOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('store_code', models.CharField(max_length=255)),
+                ('operation', models.CharField(choices=[('save_store', 'Save store'), ('delete_store', 'Delete store'), ('delete_vector_documents', 'Delete vector documents')], max_length=32)),
+                ('vector_document_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=None, null=True, size=None)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('backend', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='vector_stores.vectorstorebackend')),
+                ('store', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='vector_stores.vectorstore')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='vectorstoreoperation_status')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vector_stores', '0014_vectorstoreoperation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chunk',
+            name='point_id',
+            field=models.UUIDField(db_index=True),
+        ),
+    ]
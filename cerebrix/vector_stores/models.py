@@ -1,12 +1,18 @@
-from django.db import models
+from django.db import models, transaction
 from common.models.mixins import TimestampUserModel, TimestampModel
 from encrypted_json_fields.fields import EncryptedJSONField
 from django.contrib.postgres.fields import ArrayField
 
 
-from .types import VectorStoreTypes, VectorStoreMetrics
+from .types import (
+    VectorStoreTypes,
+    VectorStoreMetrics,
+    VectorStoreQuantization,
+    ReindexStatus,
+    VectorStoreOperationType,
+    OperationStatus,
+)
 from aimodels.models import EmbeddingModel
-from vector_stores.exceptions import VectorStoreStoreError
 
 
 class VectorStoreBackend(TimestampUserModel):
@@ -27,10 +33,13 @@ class VectorStoreBackend(TimestampUserModel):
         "aimodels.EmbeddingModel", on_delete=models.SET_NULL, null=True
     )
 
+    # If True, the connection to the Vector Database is opened when a worker process starts
+    prewarm = models.BooleanField(default=False)
+
     @property
     def db_client(self):
-        from vector_stores.utils.db_clients import STORE_CLIENT_MAP
-        return STORE_CLIENT_MAP[self.type](self)
+        from vector_stores.utils.db_clients import get_db_client
+        return get_db_client(self)
 
     def __str__(self):
         return self.name
@@ -45,7 +54,8 @@ class VectorStore(TimestampUserModel):
 
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
-    # this will be used as collection/index name in the vector database
+    # this will be used as collection/index name in the vector database.
+    # In Qdrant it's an alias of the collection, so the collection can be swapped by a reindex
     code = models.CharField(max_length=255)
 
     backend = models.ForeignKey(
@@ -59,6 +69,17 @@ class VectorStore(TimestampUserModel):
         blank=True,
         default=None,
     )
+    # the embedding model of the vectors in the vector database. When the embedding model changes
+    # it's used until the store is reindexed, see vector_stores.reindex
+    indexed_embedding_model = models.ForeignKey(
+        "aimodels.EmbeddingModel",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        default=None,
+        editable=False,
+        related_name="indexed_vector_stores",
+    )
 
     metric = models.IntegerField(
         choices=VectorStoreMetrics.choices,
@@ -68,41 +89,56 @@ class VectorStore(TimestampUserModel):
         editable=False,
     )
 
+    # Index settings applied by the vector database, if None the defaults of the database are used.
+    # Higher values improve the recall of the searches but use more memory and slow down the indexing
+    hnsw_m = models.PositiveIntegerField(null=True, blank=True, default=None)
+    hnsw_ef_construct = models.PositiveIntegerField(null=True, blank=True, default=None)
+
+    # Quantized vectors use less memory, the original vectors are used to rescore the results
+    quantization = models.IntegerField(
+        choices=VectorStoreQuantization.choices, default=VectorStoreQuantization.NONE
+    )
+    # keep the quantized vectors in RAM even when the original vectors are on disk
+    quantization_always_ram = models.BooleanField(default=False)
+
+    # store the vectors and the payloads on disk instead of RAM
+    on_disk_vectors = models.BooleanField(default=False)
+    on_disk_payload = models.BooleanField(default=False)
+
+    # Fuse the dense search with a BM25 keyword search, it improves the retrieval of exact terms like codes.
+    # It's applied when the collection is created: existing stores keep searching and loading
+    # only the dense vectors until they are reindexed
+    hybrid_search = models.BooleanField(default=False)
+
+    # Index the tenant of the points with `is_tenant` and scope the user searches to the shared tenant and theirs.
+    # Used when the users upload their own documents in the store (see RAGBackend.allow_upload_documents)
+    multitenant = models.BooleanField(default=False)
+    # Give each tenant its own shard key, so the user searches only read their shards.
+    # It's applied when the collection is created: existing stores keep the sharding of their
+    # collection until they are reindexed
+    shard_by_tenant = models.BooleanField(default=False)
+
     def __str__(self):
         return self.name
 
     def get_embedding_model(self) -> EmbeddingModel:
         return self.embedding_model or self.backend.embedding_model
 
-    def save(self, *args, **kwargs):
+    def get_indexed_embedding_model(self) -> EmbeddingModel:
         """
-        Save the store both in the database and in the vector store db.
+        The embedding model to use for the vectors in the vector database, both to store and to search them.
         """
-        client = self.backend.db_client
-        try:
-            if not client.store_exists(self.code):
-                client.create_store(self)
-            else:
-                client.update_store(self)
-        except Exception as e:
-            raise VectorStoreStoreError(f"Vector store {self.code} can't be saved correctly. "
-                "There was an error while interacting with the vector store backend: {e}"
-            )
-        super().save(*args, **kwargs)
+        return self.indexed_embedding_model or self.get_embedding_model()
 
-    def delete(self, *args, **kwargs):
+    def save(self, *args, **kwargs):
         """
-        Delete the store both in the database and in the vector store db.
+        Save the store in the database. The creation, or the update, of the store in the vector database
+        is queued in the outbox in the same transaction and applied by a worker, see vector_stores.outbox.
         """
-        client = self.backend.db_client
-        if client.store_exists(self.code):
-            try:
-                client.delete_store(self)
-            except Exception as e:
-                raise VectorStoreStoreError(f"Vector store {self.code} can't be deleted correctly. "
-                    "There was an error while interacting with the vector store backend: {e}"
-                )
-        super().delete(*args, **kwargs)
+        if self.indexed_embedding_model_id is None:
+            self.indexed_embedding_model = self.get_embedding_model()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
 
 class Document(TimestampModel):
@@ -145,21 +181,126 @@ class VectorDocument(TimestampModel):
     
     hash = models.CharField(max_length=16, null=True, blank=True, default=None)
     
+    # ids of the vectors of the documents loaded before the chunks were saved in the database,
+    # the vectors of the new documents are tracked by their Chunks
     embedding_ids = ArrayField(models.CharField(max_length=32), null=True, blank=True, default=None)
     
+    # NOTE: the vectors are deleted from the vector database by the post_delete signal,
+    # so queryset deletes and cascades delete them too. See vector_stores.signals
+
     def __str__(self):
         return f"{self.store.name} - {self.hash}"
-    
-    def delete(self, *args, **kwargs):
-        try:
-            if self.embedding_ids:
-                self.store.backend.db_client.delete_documents(self.store, self.embedding_ids)
-        except Exception as e:
-            message = f"Vector store {self.store.code} can't be deleted correctly. "
-            
-            raise VectorStoreStoreError( f"VectorDocument with hash {self.hash} in vector store {self.store.code} can't be deleted correctly. "
-                f"There was an error while interacting with the vector store backend: {str(e)}"
-            )
-        super().delete(*args, **kwargs)
-        
-    
\ No newline at end of file
+
+
+class Chunk(models.Model):
+    """
+    This model represents a chunk of a VectorDocument, embedded as a single vector.
+
+    The text of the chunks is kept here and not in the vector database, which only stores the vector,
+    the `point_id` and the fields used to filter the searches. The retrieved vectors are joined
+    with their chunks by `point_id`, see vector_stores.chunks.
+    The chunks are written once, after their vectors, and never updated: they don't have timestamps.
+    """
+
+    vector_document = models.ForeignKey(
+        "vector_stores.VectorDocument", on_delete=models.CASCADE, related_name="chunks"
+    )
+    # position of the chunk in the document
+    position = models.PositiveIntegerField()
+
+    # the text returned by the retrieval
+    text = models.TextField()
+    # the text of the vector, if different from `text`. It's embedded again when the store is reindexed
+    embedding_text = models.TextField(blank=True, null=True, default=None)
+    # number of tokens of the text, counted with settings.CHUNK_TOKEN_COUNT_MODEL
+    token_count = models.PositiveIntegerField(null=True, blank=True, default=None)
+    page_number = models.PositiveIntegerField(null=True, blank=True, default=None)
+    # the other metadata set by the document loader
+    metadata = models.JSONField(default=dict, blank=True)
+    # hash of the text (XXH64)
+    hash = models.CharField(max_length=16)
+
+    # id of the vector in the vector database, unique in the store
+    point_id = models.UUIDField(db_index=True)
+
+    class Meta:
+        ordering = ("vector_document", "position")
+        constraints = [
+            models.UniqueConstraint(fields=("vector_document", "position"), name="unique_chunk_position"),
+        ]
+
+    def __str__(self):
+        return f"{self.vector_document_id} - {self.position}"
+
+
+class VectorStoreReindex(TimestampModel):
+    """
+    This model tracks the reindex of a Vector Store in a new collection, with a new embedding model
+    or new collection settings.
+
+    The documents are reindexed in order of id, `last_vector_document_id` is the checkpoint
+    used to continue an interrupted reindex.
+    """
+
+    store = models.ForeignKey(
+        "vector_stores.VectorStore", on_delete=models.CASCADE, related_name="reindexes"
+    )
+    embedding_model = models.ForeignKey(
+        "aimodels.EmbeddingModel", on_delete=models.SET_NULL, null=True
+    )
+    # the name of the new collection
+    collection_name = models.CharField(max_length=255)
+
+    status = models.CharField(
+        max_length=20, choices=ReindexStatus.choices, default=ReindexStatus.RUNNING
+    )
+    last_vector_document_id = models.BigIntegerField(default=0)
+    reindexed_documents = models.IntegerField(default=0)
+    reindexed_vectors = models.IntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.store.code} -> {self.collection_name} ({self.status})"
+
+
+class VectorStoreOperation(TimestampModel):
+    """
+    This model is the outbox of the operations on the vector database.
+
+    The operations are written by the signals of the stores and the documents, in the same transaction
+    of the change, and applied in order by a Celery worker, see vector_stores.outbox.
+    The references are kept without foreign key constraints: the operations outlive the deleted
+    stores and backends.
+    """
+
+    backend = models.ForeignKey(
+        "vector_stores.VectorStoreBackend",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    store = models.ForeignKey(
+        "vector_stores.VectorStore",
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="+",
+    )
+    store_code = models.CharField(max_length=255)
+
+    operation = models.CharField(max_length=32, choices=VectorStoreOperationType.choices)
+    vector_document_ids = ArrayField(models.BigIntegerField(), null=True, blank=True, default=None)
+
+    status = models.CharField(
+        max_length=20, choices=OperationStatus.choices, default=OperationStatus.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "id"], name="vectorstoreoperation_status")]
+
+    def __str__(self):
+        return f"{self.operation} {self.store_code} ({self.status})"
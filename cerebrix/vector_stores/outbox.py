@@ -0,0 +1,222 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from common.utils.redis import get_redis_client
+from vector_stores.exceptions import VectorStoreBackendError
+from vector_stores.models import VectorStore, VectorStoreBackend, VectorStoreOperation
+from vector_stores.retrieval_cache import retrieval_cache
+from vector_stores.types import VectorStoreOperationType, OperationStatus
+
+logger = logging.getLogger(__name__)
+
+# commit hooks of the transaction where the processing of the outbox has been scheduled, for each thread
+_scheduled = threading.local()
+
+# seconds ensure_store waits for the worker applying the outbox
+ENSURE_STORE_LOCK_TIMEOUT = 60
+
+
+def queue_operation(operation: str, backend_id: int, store_code: str, store_id: int = None, vector_document_ids: list[int] = None) -> VectorStoreOperation:
+    """
+    Write the operation in the outbox, in the current transaction, and process it after the commit.
+    """
+    queued = VectorStoreOperation.objects.create(
+        operation=operation,
+        backend_id=backend_id,
+        store_id=store_id,
+        store_code=store_code,
+        vector_document_ids=vector_document_ids,
+    )
+    schedule_processing()
+    return queued
+
+
+def schedule_processing():
+    """
+    Process the outbox after the commit of the current transaction, with a single task for all
+    the operations of the transaction.
+    """
+    connection = transaction.get_connection()
+    # the commit hooks are a new list in every transaction, and after a savepoint rollback
+    if connection.in_atomic_block and getattr(_scheduled, "hooks", None) is connection.run_on_commit:
+        return
+    transaction.on_commit(process_after_commit)
+    _scheduled.hooks = connection.run_on_commit
+
+
+def process_after_commit():
+    from vector_stores.tasks import process_vector_store_operations
+
+    process_vector_store_operations.delay()
+
+
+def get_store(operation: VectorStoreOperation, backend: VectorStoreBackend) -> VectorStore:
+    """ The store of the operation, an unsaved instance with its code if it has been deleted """
+    store = VectorStore.objects.filter(pk=operation.store_id).select_related("backend").first()
+    if store is None or store.code != operation.store_code:
+        return VectorStore(code=operation.store_code, backend=backend)
+    return store
+
+
+def apply_operation(operation: VectorStoreOperation, vector_document_ids: list[int] = None):
+    """
+    Apply the operation to the vector database. The operations are idempotent: applying
+    them again, e.g. after a worker crash, has the same result.
+    """
+    backend = VectorStoreBackend.objects.filter(pk=operation.backend_id).first()
+    if backend is None:
+        logger.warning(f"The backend of {operation} has been deleted, the operation is skipped")
+        return
+    client = backend.db_client
+
+    if operation.operation == VectorStoreOperationType.SAVE_STORE:
+        store = VectorStore.objects.filter(pk=operation.store_id).select_related("backend").first()
+        if store is None:
+            # deleted after the save, its delete operation follows
+            return
+        if client.store_exists(store.code):
+            client.update_store(store)
+        else:
+            client.create_store(store)
+    elif operation.operation == VectorStoreOperationType.DELETE_STORE:
+        if client.store_exists(operation.store_code):
+            client.delete_store(get_store(operation, backend))
+    elif operation.operation == VectorStoreOperationType.DELETE_VECTOR_DOCUMENTS:
+        if client.store_exists(operation.store_code):
+            client.delete_vector_documents(get_store(operation, backend), vector_document_ids)
+
+    # the results cached between the commit of the delete and now may still hold the deleted vectors
+    if operation.operation != VectorStoreOperationType.SAVE_STORE and operation.store_id is not None:
+        retrieval_cache.bump_version(operation.store_id)
+
+
+def get_batches(operations: list[VectorStoreOperation]) -> list[list[VectorStoreOperation]]:
+    """
+    Group the consecutive operations of a store that can be applied together:
+    the deletes of documents are merged and the repeated saves applied once.
+    """
+    batches = []
+    for operation in operations:
+        previous = batches[-1][-1] if batches else None
+        if (
+            previous is not None
+            and previous.operation == operation.operation
+            and (previous.backend_id, previous.store_code) == (operation.backend_id, operation.store_code)
+            and operation.operation != VectorStoreOperationType.DELETE_STORE
+        ):
+            batches[-1].append(operation)
+        else:
+            batches.append([operation])
+    return batches
+
+
+def apply_operations(operations: list[VectorStoreOperation]):
+    """
+    Apply the operations in order and save their status.
+
+    When an operation fails, the following operations of the same store are left pending,
+    so they are never applied out of order. The failed operation is retried up to
+    `max_attempts` times, then it's marked as failed.
+    """
+    max_attempts = settings.VECTOR_STORE_OUTBOX["max_attempts"]
+    deleted_stores = {
+        (operation.backend_id, operation.store_code)
+        for operation in operations
+        if operation.operation == VectorStoreOperationType.DELETE_STORE
+    }
+    # and the stores deleted by the operations queued after the batch
+    document_stores = {
+        (operation.backend_id, operation.store_code)
+        for operation in operations
+        if operation.operation == VectorStoreOperationType.DELETE_VECTOR_DOCUMENTS
+    } - deleted_stores
+    if document_stores:
+        deleted_stores.update(
+            key
+            for key in VectorStoreOperation.objects.filter(
+                status=OperationStatus.PENDING,
+                operation=VectorStoreOperationType.DELETE_STORE,
+                store_code__in={store_code for _, store_code in document_stores},
+                pk__gt=operations[-1].pk,
+            ).values_list("backend_id", "store_code")
+            if key in document_stores
+        )
+    failed_stores = set()
+    for batch in get_batches(operations):
+        operation = batch[0]
+        key = (operation.backend_id, operation.store_code)
+        if key in failed_stores:
+            continue
+        now = timezone.now()
+        try:
+            # the vectors of a store deleted later are deleted with it
+            if not (operation.operation == VectorStoreOperationType.DELETE_VECTOR_DOCUMENTS and key in deleted_stores):
+                vector_document_ids = sorted({pk for item in batch for pk in item.vector_document_ids or []})
+                apply_operation(operation, vector_document_ids)
+        except Exception as e:
+            logger.error(f"Unable to apply {operation} to the vector database: {e}")
+            failed_stores.add(key)
+            for item in batch:
+                item.attempts += 1
+                item.error = str(e)
+                item.status = OperationStatus.FAILED if item.attempts >= max_attempts else OperationStatus.PENDING
+                item.processed_at = now
+                item.save(update_fields=["attempts", "error", "status", "processed_at", "updated_at"])
+            continue
+
+        for item in batch:
+            item.attempts += 1
+            item.status = OperationStatus.DONE
+            item.error = None
+            item.processed_at = now
+            item.save(update_fields=["attempts", "error", "status", "processed_at", "updated_at"])
+
+
+def process_operations(batch_size: int = None, store: VectorStore = None) -> int:
+    """
+    Apply the pending operations of the outbox in batches, in order of id, and return their number.
+
+    The operations are locked with `SKIP LOCKED` while they are applied, so a concurrent call
+    skips them instead of waiting. With `store`, only the operations of that store are applied.
+    """
+    batch_size = batch_size or settings.VECTOR_STORE_OUTBOX["batch_size"]
+    processed = 0
+    while True:
+        with transaction.atomic():
+            queryset = VectorStoreOperation.objects.filter(status=OperationStatus.PENDING)
+            if store is not None:
+                queryset = queryset.filter(backend_id=store.backend_id, store_code=store.code)
+            operations = list(queryset.order_by("pk").select_for_update(skip_locked=True)[:batch_size])
+            if not operations:
+                return processed
+            apply_operations(operations)
+        processed += len(operations)
+        # the operations that failed are retried by the next run
+        if any(operation.status == OperationStatus.PENDING for operation in operations):
+            return processed
+
+
+def ensure_store(store: VectorStore):
+    """
+    Make sure the store exists in the vector database, e.g. before loading documents in a store
+    just created: its pending operations are applied now, without waiting for the worker.
+
+    The operations are applied under the lock of the worker, so they are never applied out of order
+    and the store is not created twice. Call it once before loading the documents, not for each one.
+    """
+    from vector_stores.tasks import OUTBOX_LOCK_KEY
+
+    lock = get_redis_client().lock(OUTBOX_LOCK_KEY, timeout=60 * 60, blocking_timeout=ENSURE_STORE_LOCK_TIMEOUT)
+    if not lock.acquire():
+        raise VectorStoreBackendError(message=f"Timed out waiting for the pending operations of {store.code}")
+    try:
+        process_operations(store=store)
+        client = store.backend.db_client
+        if not client.store_exists(store.code):
+            client.create_store(store)
+    finally:
+        lock.release()
@@ -0,0 +1,158 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from common.utils.redis import get_redis_client
+from vector_stores.exceptions import VectorStoreBackendError
+from vector_stores.models import VectorStore, VectorDocument, VectorStoreReindex, Chunk
+from vector_stores.types import ReindexStatus
+
+logger = logging.getLogger(__name__)
+
+REINDEX_LOCK_KEY = "vector_stores:reindex:{store_id}:lock"
+
+# documents without chunks created in this period may still be loading
+LOADING_GRACE_PERIOD = timedelta(hours=1)
+# seconds between the copies of the documents still loading in the previous collection after the swap
+LOADING_POLL_INTERVAL = 10
+
+
+def start_reindex(store: VectorStore, restart: bool = False) -> VectorStoreReindex:
+    """
+    Return the reindex of the store with its current embedding model.
+
+    An unfinished reindex (interrupted or failed) with the same embedding model is continued from its
+    checkpoint, unless `restart` is True: in that case its collection is deleted and a new reindex is created.
+    """
+    client = store.backend.db_client
+    if not client.supports_reindex:
+        raise VectorStoreBackendError(message=f"The backend of the vector store {store.code} doesn't support reindex")
+
+    embedding_model = store.get_embedding_model()
+    unfinished = (
+        store.reindexes.exclude(status=ReindexStatus.COMPLETED)
+        .filter(embedding_model=embedding_model)
+        .order_by("-created_at")
+        .first()
+    )
+    if unfinished and not restart:
+        unfinished.status = ReindexStatus.RUNNING
+        unfinished.error = None
+        unfinished.save()
+        return unfinished
+    if unfinished:
+        client.delete_collection(unfinished.collection_name)
+        unfinished.status = ReindexStatus.FAILED
+        unfinished.error = "Restarted"
+        unfinished.save()
+
+    return VectorStoreReindex.objects.create(
+        store=store,
+        embedding_model=embedding_model,
+        collection_name=client.get_next_collection_name(store),
+    )
+
+
+def reindex_pending_documents(reindex: VectorStoreReindex, source: str, batch_size: int, last_id: int = None) -> bool:
+    """
+    Reindex, in order of id, the documents after the checkpoint, saving the checkpoint after each batch.
+    It stops at the first document that is still loading and returns True in that case.
+
+    Args:
+        last_id: If provided, the documents after it are not reindexed.
+    """
+    store = reindex.store
+    client = store.backend.db_client
+    loading_since = timezone.now() - LOADING_GRACE_PERIOD
+    while True:
+        queryset = VectorDocument.objects.filter(store=store, pk__gt=reindex.last_vector_document_id)
+        if last_id is not None:
+            queryset = queryset.filter(pk__lte=last_id)
+        documents = list(
+            queryset.order_by("pk")
+            .annotate(has_chunks=Exists(Chunk.objects.filter(vector_document=OuterRef("pk"))))
+            .values_list("pk", "has_chunks", "embedding_ids", "created_at")[:batch_size]
+        )
+        ids = []
+        for pk, has_chunks, embedding_ids, created_at in documents:
+            # the chunks, or the embedding ids of the older documents, are saved once all the vectors are stored
+            if not has_chunks and embedding_ids is None and created_at > loading_since:
+                break
+            ids.append(pk)
+        if not ids:
+            return bool(documents)
+
+        vectors = client.reindex_documents(store, source, reindex.collection_name, reindex.embedding_model, ids)
+        reindex.last_vector_document_id = ids[-1]
+        reindex.reindexed_documents += len(ids)
+        reindex.reindexed_vectors += vectors
+        reindex.save()
+        logger.debug(f"Reindexed {reindex.reindexed_documents} documents of {store.code}")
+        if len(ids) < len(documents):
+            return True
+
+
+def run_reindex(reindex: VectorStoreReindex, batch_size: int = 100):
+    """
+    Reindex the store in a new collection and swap it with the current one.
+
+    The documents are embedded again with the embedding model of the reindex and copied in the new
+    collection, while the searches and the new documents keep using the current collection.
+    Then the store is moved to the new collection and the documents loaded in the meantime are copied
+    from the previous collection, which is deleted once the documents still loading are copied too.
+
+    The swap of the stores created before the aliases deletes their collection, so nothing can be
+    copied after it: the swap is refused while a document is still loading and the reindex fails,
+    to be continued from its checkpoint by the next run.
+    """
+    store = reindex.store
+    client = store.backend.db_client
+    lock = get_redis_client().lock(
+        REINDEX_LOCK_KEY.format(store_id=store.pk), timeout=24 * 60 * 60, blocking_timeout=0
+    )
+    if not lock.acquire():
+        logger.info(f"A reindex of {store.code} is already running")
+        return reindex
+
+    try:
+        logger.info(f"Reindexing {store.code} in {reindex.collection_name}")
+        client.create_reindex_store(store, reindex.collection_name, reindex.embedding_model)
+        loading = reindex_pending_documents(reindex, store.code, batch_size)
+        if client.swap_deletes_store(store):
+            # copy the documents loaded during the first pass, right before the collection is deleted
+            if loading or reindex_pending_documents(reindex, store.code, batch_size):
+                raise VectorStoreBackendError(
+                    message=f"Documents of {store.code} are still loading, run the reindex again to continue it"
+                )
+
+        previous = client.swap_store(store, reindex.collection_name)
+        # the documents created from now on are loaded in the new collection
+        last_id = VectorDocument.objects.filter(store=store).aggregate(last_id=Max("pk"))["last_id"] or 0
+        # the queries are embedded with the new model from now on, the save invalidates the cached results
+        store.indexed_embedding_model = reindex.embedding_model
+        store.save()
+
+        if previous:
+            # the documents loading during the swap end up partly in the previous collection
+            while reindex_pending_documents(reindex, previous, batch_size, last_id=last_id):
+                time.sleep(LOADING_POLL_INTERVAL)
+            client.delete_collection(previous)
+
+        reindex.status = ReindexStatus.COMPLETED
+        reindex.completed_at = timezone.now()
+        reindex.save()
+        logger.info(
+            f"Reindexed {store.code}: {reindex.reindexed_documents} documents, {reindex.reindexed_vectors} vectors"
+        )
+        return reindex
+    except Exception as e:
+        logger.error(f"Reindex of {store.code} failed: {e}")
+        reindex.status = ReindexStatus.FAILED
+        reindex.error = str(e)
+        reindex.save()
+        raise
+    finally:
+        lock.release()
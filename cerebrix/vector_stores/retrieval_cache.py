@@ -0,0 +1,88 @@
+import json
+import logging
+
+import xxhash
+from django.conf import settings
+from langchain_core.documents import Document as LangchainDocument
+from redis.exceptions import RedisError
+
+from common.utils.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalCache:
+    """
+    Redis cache of the documents retrieved from a vector store.
+
+    Results are keyed by the store, its version, the XXH64 hash of the query, the hash of the
+    search filters and k. The version of a store is a counter bumped every time its documents change,
+    so the results cached with a previous version are never read again and expire with their TTL.
+    If Redis is not reachable, the vector store is always searched.
+
+    Args:
+        ttl: The time to live, in seconds, of the cached results.
+    """
+
+    prefix = "retrieval"
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def version_key(self, store_id: int) -> str:
+        return f"{self.prefix}:version:{store_id}"
+
+    def get_version(self, store_id: int) -> int:
+        return int(get_redis_client().get(self.version_key(store_id)) or 0)
+
+    def bump_version(self, store_id: int):
+        try:
+            get_redis_client().incr(self.version_key(store_id))
+        except RedisError as e:
+            logger.warning(f"Unable to bump the retrieval cache version of store {store_id}: {e}")
+
+    def make_key(self, store_id: int, version: int, query: str, k: int, search_kwargs: dict) -> str:
+        query_hash = xxhash.xxh64(query.encode()).hexdigest()
+        filter_hash = xxhash.xxh64(json.dumps(search_kwargs, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{self.prefix}:{store_id}:{version}:{query_hash}:{filter_hash}:{k}"
+
+    def get(self, store_id: int, query: str, k: int, search_kwargs: dict):
+        """
+        Return the cached documents and the key to store them if they are not cached.
+        The key is None if Redis is not reachable.
+        """
+        try:
+            key = self.make_key(store_id, self.get_version(store_id), query, k, search_kwargs)
+            value = get_redis_client().get(key)
+        except RedisError as e:
+            logger.warning(f"Unable to read retrieved documents from redis: {e}")
+            return None, None
+        if value is None:
+            self.misses += 1
+            return None, key
+        self.hits += 1
+        documents = [LangchainDocument(**document) for document in json.loads(value)]
+        return documents, key
+
+    def set(self, key: str, documents: list[LangchainDocument]):
+        value = json.dumps(
+            [{"page_content": document.page_content, "metadata": document.metadata} for document in documents],
+            default=str,
+        )
+        try:
+            get_redis_client().set(key, value, ex=self.ttl)
+        except RedisError as e:
+            logger.warning(f"Unable to store retrieved documents in redis: {e}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+retrieval_cache = RetrievalCache(ttl=settings.RETRIEVAL_CACHE_TTL)
@@ -0,0 +1,162 @@
+import logging
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from vector_stores.models import VectorStoreBackend, VectorStore, VectorDocument, VectorStoreOperation
+from vector_stores.outbox import queue_operation
+from vector_stores.retrieval_cache import retrieval_cache
+from vector_stores.types import VectorStoreOperationType
+from vector_stores.utils.db_clients import invalidate_db_clients
+
+logger = logging.getLogger(__name__)
+
+# VectorDocuments deleted in the current transaction, for each thread, see get_deletions
+_deletions = threading.local()
+
+
+@receiver(post_save, sender=VectorStoreBackend)
+@receiver(post_delete, sender=VectorStoreBackend)
+def invalidate_pooled_clients(sender, instance, **kwargs):
+    """
+    Close the pooled clients of a backend when its configuration changes or it's deleted.
+    """
+    invalidate_db_clients(instance)
+
+
+@receiver(post_save, sender=VectorDocument)
+@receiver(post_delete, sender=VectorDocument)
+def bump_store_version(sender, instance, **kwargs):
+    """
+    Invalidate the retrieval cache of the store when one of its documents is added, changed or deleted.
+    """
+    # bumped after the commit, otherwise a concurrent search could cache the results of the old version
+    store_id = instance.store_id
+    transaction.on_commit(lambda: retrieval_cache.bump_version(store_id))
+
+
+@receiver(post_save, sender=VectorStore)
+def bump_store_settings_version(sender, instance, **kwargs):
+    """
+    Invalidate the retrieval cache of the store when its settings change, e.g. its embedding model.
+    """
+    store_id = instance.pk
+    transaction.on_commit(lambda: retrieval_cache.bump_version(store_id))
+
+
+@receiver(post_save, sender=VectorStore)
+def save_store(sender, instance, raw=False, **kwargs):
+    """
+    Queue the creation, or the update of the settings, of the store in the vector database.
+    """
+    if raw:
+        return
+    queue_operation(
+        VectorStoreOperationType.SAVE_STORE, instance.backend_id, instance.code, store_id=instance.pk
+    )
+
+
+@receiver(post_delete, sender=VectorStore)
+def delete_store(sender, instance, **kwargs):
+    """
+    Queue the deletion of the store from the vector database.
+    """
+    queue_operation(
+        VectorStoreOperationType.DELETE_STORE, instance.backend_id, instance.code, store_id=instance.pk
+    )
+
+
+def get_deletions() -> dict:
+    """
+    Return the VectorDocument deletions of the current transaction:
+        - pending: the ids of the documents, by store, collected by pre_delete and not queued yet
+        - operations: the outbox operation of each store, with the ids already queued
+        - stores: the backend id and the code of the stores, read once
+        - deleted_stores: the stores deleted in the transaction
+    A new state is used in each transaction, and after a savepoint rollback, see outbox.schedule_processing.
+    """
+    connection = transaction.get_connection()
+    state = getattr(_deletions, "state", None)
+    if state is None or state["hooks"] is not connection.run_on_commit:
+        state = {
+            "hooks": connection.run_on_commit,
+            "pending": defaultdict(set),
+            "operations": {},
+            "stores": {},
+            "deleted_stores": set(),
+        }
+        _deletions.state = state
+    return state
+
+
+@receiver(pre_delete, sender=VectorStore)
+def skip_store_vectors(sender, instance, **kwargs):
+    """
+    Don't delete the vectors of the documents of a store deleted in the same transaction, they are
+    deleted together with the store. The cascade deletes the documents after this signal.
+    """
+    deletions = get_deletions()
+    deletions["deleted_stores"].add(instance.pk)
+    deletions["pending"].pop(instance.pk, None)
+    queued = deletions["operations"].pop(instance.pk, None)
+    if queued is not None:
+        VectorStoreOperation.objects.filter(pk=queued[0]).delete()
+
+
+@receiver(pre_delete, sender=VectorDocument)
+def collect_vectors(sender, instance, **kwargs):
+    """
+    Collect the documents about to be deleted: the pre_delete signals of a delete are sent for
+    all the objects before any post_delete, so they are queued together by the first post_delete.
+    """
+    deletions = get_deletions()
+    if instance.store_id in deletions["deleted_stores"]:
+        return
+    deletions["pending"][instance.store_id].add(instance.pk)
+    if VectorDocument.store.is_cached(instance):
+        deletions["stores"][instance.store_id] = (instance.store.backend_id, instance.store.code)
+
+
+@receiver(post_delete, sender=VectorDocument)
+def delete_vectors(sender, instance, **kwargs):
+    """
+    Queue the deletion of the vectors of the VectorDocument from the vector database.
+
+    The signal is sent also by queryset deletes and cascades, in the transaction of the deletion:
+    the documents of a store deleted in the same transaction are queued in a single operation
+    and their vectors deleted together, with filters on `vector_document_id`.
+    """
+    deletions = get_deletions()
+    store_id = instance.store_id
+    if store_id in deletions["deleted_stores"]:
+        return
+    ids = deletions["pending"].pop(store_id, set()) | {instance.pk}
+    queued = deletions["operations"].get(store_id)
+    if queued is not None:
+        ids -= set(queued[1])
+    if not ids:
+        # queued with the other documents of the same delete
+        return
+
+    if queued is not None:
+        queued[1].extend(sorted(ids))
+        VectorStoreOperation.objects.filter(pk=queued[0]).update(vector_document_ids=queued[1])
+        return
+    if store_id not in deletions["stores"]:
+        deletions["stores"][store_id] = (
+            VectorStore.objects.filter(pk=store_id).values_list("backend_id", "code").first()
+        )
+    if deletions["stores"][store_id] is None:
+        return
+    backend_id, code = deletions["stores"][store_id]
+    operation = queue_operation(
+        VectorStoreOperationType.DELETE_VECTOR_DOCUMENTS,
+        backend_id,
+        code,
+        store_id=store_id,
+        vector_document_ids=sorted(ids),
+    )
+    deletions["operations"][store_id] = (operation.pk, list(operation.vector_document_ids))
@@ -0,0 +1,256 @@
+import json
+import logging
+from pathlib import Path
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from aimodels.models import EmbeddingModel
+from users.models import User
+from vector_stores.exceptions import VectorStoreValidationError
+from vector_stores.models import VectorStore, VectorStoreBackend, Document, VectorDocument, Chunk
+from vector_stores.utils.tenants import get_vector_document_tenants
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_FILE = "collection.snapshot"
+
+# settings of the store saved in the manifest and applied to the restored store
+STORE_FIELDS = (
+    "name",
+    "description",
+    "code",
+    "metric",
+    "hnsw_m",
+    "hnsw_ef_construct",
+    "quantization",
+    "quantization_always_ram",
+    "on_disk_vectors",
+    "on_disk_payload",
+    "hybrid_search",
+    "multitenant",
+    "shard_by_tenant",
+)
+# the owners are saved by email: the ids of the users differ across databases
+DOCUMENT_FIELDS = ("id", "name", "description", "file", "public", "hash")
+VECTOR_DOCUMENT_FIELDS = ("id", "hash", "embedding_ids", "created_at")
+CHUNK_FIELDS = (
+    "vector_document_id",
+    "position",
+    "text",
+    "embedding_text",
+    "token_count",
+    "page_number",
+    "metadata",
+    "hash",
+    "point_id",
+)
+
+
+def write_jsonl(path: Path, rows, batch_size: int = 1000) -> int:
+    """ Write the rows, read in chunks of `batch_size`, one json per line. Return the number of rows """
+    count = 0
+    with open(path, "w") as file:
+        for row in rows.iterator(chunk_size=batch_size):
+            file.write(json.dumps(row, default=str) + "\n")
+            count += 1
+    return count
+
+
+def read_jsonl(path: Path):
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def get_client(backend: VectorStoreBackend):
+    client = backend.db_client
+    if not client.supports_snapshots:
+        raise VectorStoreValidationError(message=f"The backend {backend.name} doesn't support snapshots")
+    return client
+
+
+def create_snapshot(store: VectorStore, path: str) -> Path:
+    """
+    Save a snapshot of the store in a new directory inside `path`, with:
+        - manifest.json: the settings of the store and the embedding model of its vectors
+        - collection.snapshot: the snapshot of the collection, streamed from the vector database
+        - documents.jsonl, vector_documents.jsonl, vector_document_documents.jsonl and chunks.jsonl:
+          the rows of the store documents, read and written in chunks
+
+    The collection is snapshotted before reading the rows: the documents loaded in the meantime are saved
+    without their vectors and are reported as missing by the reconciliation of the restored store.
+    """
+    client = get_client(store.backend)
+    directory = Path(path) / f"{store.code}-{timezone.now():%Y%m%d%H%M%S}"
+    directory.mkdir(parents=True)
+
+    logger.info(f"Snapshotting {store.code} in {directory}")
+    client.create_snapshot(store, str(directory / SNAPSHOT_FILE))
+
+    vector_documents = VectorDocument.objects.filter(store=store).order_by("pk")
+    counts = {
+        "vector_documents": write_jsonl(
+            directory / "vector_documents.jsonl", vector_documents.values(*VECTOR_DOCUMENT_FIELDS)
+        ),
+        # the documents of each vector document, as rows of the many to many table
+        "vector_document_documents": write_jsonl(
+            directory / "vector_document_documents.jsonl",
+            VectorDocument.documents.through.objects.filter(vectordocument__store=store)
+            .order_by("pk")
+            .values("vectordocument_id", "document_id"),
+        ),
+        "documents": write_jsonl(
+            directory / "documents.jsonl",
+            Document.objects.filter(vector_documents__store=store)
+            .distinct()
+            .order_by("pk")
+            .values(*DOCUMENT_FIELDS, user_email=F("user__email")),
+        ),
+        "chunks": write_jsonl(
+            directory / "chunks.jsonl",
+            Chunk.objects.filter(vector_document__store=store).order_by("pk").values(*CHUNK_FIELDS),
+        ),
+    }
+
+    embedding_model = store.get_indexed_embedding_model()
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "created_at": timezone.now().isoformat(),
+        "backend_type": store.backend.type,
+        "store": {field: getattr(store, field) for field in STORE_FIELDS},
+        "embedding_model": embedding_model.code if embedding_model else None,
+        "counts": counts,
+    }
+    with open(directory / "manifest.json", "w") as file:
+        json.dump(manifest, file, indent=2)
+    logger.info(f"Snapshot of {store.code} saved in {directory}: {counts}")
+    return directory
+
+
+def restore_documents(store: VectorStore, directory: Path) -> dict[int, VectorDocument]:
+    """
+    Create the rows of the snapshot for the restored store, return the new VectorDocuments by previous id.
+
+    The documents are reused when the same file of the same user already exists, e.g. when the store
+    is cloned in the same database. The owners are matched by email, those missing in this database
+    are left empty.
+    """
+    emails = {row["user_email"] for row in read_jsonl(directory / "documents.jsonl") if row["user_email"]}
+    user_ids = dict(User.objects.filter(email__in=emails).values_list("email", "pk"))
+    documents = {}
+    for row in read_jsonl(directory / "documents.jsonl"):
+        user_id = user_ids.get(row["user_email"])
+        document = Document.objects.filter(hash=row["hash"], user_id=user_id).first() if row["hash"] else None
+        if document is None:
+            document = Document.objects.create(
+                name=row["name"],
+                description=row["description"],
+                file=row["file"],
+                user_id=user_id,
+                public=row["public"],
+                hash=row["hash"],
+            )
+        documents[row["id"]] = document
+
+    vector_documents = {}
+    rows = list(read_jsonl(directory / "vector_documents.jsonl"))
+    created = VectorDocument.objects.bulk_create(
+        [
+            VectorDocument(
+                store=store, hash=row["hash"], embedding_ids=row["embedding_ids"], created_at=row["created_at"]
+            )
+            for row in rows
+        ]
+    )
+    for row, vector_document in zip(rows, created):
+        vector_documents[row["id"]] = vector_document
+
+    VectorDocument.documents.through.objects.bulk_create(
+        [
+            VectorDocument.documents.through(
+                vectordocument_id=vector_documents[row["vectordocument_id"]].pk,
+                document_id=documents[row["document_id"]].pk,
+            )
+            for row in read_jsonl(directory / "vector_document_documents.jsonl")
+            if row["vectordocument_id"] in vector_documents and row["document_id"] in documents
+        ],
+        ignore_conflicts=True,
+    )
+
+    batch = []
+    for row in read_jsonl(directory / "chunks.jsonl"):
+        if row["vector_document_id"] not in vector_documents:
+            continue
+        row["vector_document_id"] = vector_documents[row["vector_document_id"]].pk
+        batch.append(Chunk(**row))
+        if len(batch) >= 1000:
+            Chunk.objects.bulk_create(batch)
+            batch = []
+    Chunk.objects.bulk_create(batch)
+    return vector_documents
+
+
+def get_remapped_payloads(store: VectorStore, vector_documents: dict[int, VectorDocument]) -> dict[int, dict]:
+    """ Return the new payload metadata of the points of each previous `vector_document_id` """
+    previous_ids = {vector_document.pk: previous_id for previous_id, vector_document in vector_documents.items()}
+    payloads = {}
+    for vector_document in VectorDocument.objects.filter(store=store).prefetch_related("documents"):
+        user_ids = [document.user_id for document in vector_document.documents.all() if document.user_id]
+        payloads[previous_ids[vector_document.pk]] = {
+            "vector_document_id": vector_document.pk,
+            "tenant_id": get_vector_document_tenants(vector_document),
+            "user_id": user_ids[0] if user_ids else None,
+        }
+    return payloads
+
+
+def restore_snapshot(path: str, backend: VectorStoreBackend, code: str = None, name: str = None) -> VectorStore:
+    """
+    Restore a snapshot created by `create_snapshot` in the backend, as a new store.
+
+    The collection is restored first, then the rows are created in a single transaction where
+    the `vector_document_id`, `tenant_id` and `user_id` of the points are updated to the new rows.
+    If any step fails the rows are rolled back and the restored collection is deleted.
+    The embedding model of the vectors must exist, with the same code, in this database.
+    """
+    directory = Path(path)
+    with open(directory / "manifest.json") as file:
+        manifest = json.load(file)
+    if manifest["version"] != SNAPSHOT_VERSION:
+        raise VectorStoreValidationError(message=f"Unsupported snapshot version {manifest['version']}")
+    if manifest["backend_type"] != backend.type:
+        raise VectorStoreValidationError(message="The snapshot was created with a different type of backend")
+    embedding_model = EmbeddingModel.objects.filter(code=manifest["embedding_model"]).first()
+    if embedding_model is None:
+        raise VectorStoreValidationError(message=f"Embedding model {manifest['embedding_model']} not found")
+
+    fields = {
+        **manifest["store"],
+        "code": code or manifest["store"]["code"],
+        "name": name or manifest["store"]["name"],
+    }
+    if VectorStore.objects.filter(backend=backend, code=fields["code"]).exists():
+        raise VectorStoreValidationError(message=f"Vector store {fields['code']} already exists")
+    store = VectorStore(
+        backend=backend, embedding_model=embedding_model, indexed_embedding_model=embedding_model, **fields
+    )
+
+    client = get_client(backend)
+    logger.info(f"Restoring {directory} in {store.code}")
+    client.restore_snapshot(store, str(directory / SNAPSHOT_FILE))
+    try:
+        with transaction.atomic():
+            # the collection exists, so the outbox only applies the settings of the store
+            store.save()
+            vector_documents = restore_documents(store, directory)
+            # remapped before the commit: if it fails the rows are rolled back and the collection deleted
+            client.remap_vector_documents(store, get_remapped_payloads(store, vector_documents))
+    except Exception:
+        client.delete_store(store)
+        raise
+    logger.info(f"Restored {len(vector_documents)} documents in {store.code}")
+    return store
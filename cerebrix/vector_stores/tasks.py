@@ -0,0 +1,134 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.utils import timezone
+
+from common.utils.redis import get_redis_client
+from vector_stores.models import VectorStore, VectorDocument, VectorStoreReindex
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_LOCK_KEY = "vector_stores:reconcile:lock"
+OUTBOX_LOCK_KEY = "vector_stores:outbox:lock"
+
+
+def reconcile_store(store: VectorStore, grace_period: timedelta = timedelta(hours=1)) -> dict:
+    """
+    Compare the vectors of the store with its VectorDocuments and delete the orphan vectors.
+
+    The orphan vectors are the ones without a VectorDocument, or without `vector_document_id`,
+    left by failed loads and deletions.
+    The VectorDocuments without vectors are only reported, ignoring the ones created in the last
+    `grace_period` that may still be loading.
+    """
+    client = store.backend.db_client
+    if not client.store_exists(store.code):
+        logger.warning(f"Vector store {store.code} has no collection in the vector database")
+        return {"store": store.code, "missing_store": True}
+
+    vector_documents = set(VectorDocument.objects.filter(store=store).values_list("pk", flat=True))
+    indexed_documents = set()
+    orphan_documents = set()
+    orphan_points = []
+    points = 0
+    for point_id, vector_document_id in client.scroll_vector_document_ids(store):
+        points += 1
+        if vector_document_id is None:
+            orphan_points.append(point_id)
+        elif vector_document_id in vector_documents:
+            indexed_documents.add(vector_document_id)
+        else:
+            orphan_documents.add(vector_document_id)
+
+    if orphan_documents:
+        # documents created while scrolling are not orphans
+        orphan_documents -= set(
+            VectorDocument.objects.filter(pk__in=orphan_documents).values_list("pk", flat=True)
+        )
+        client.delete_vector_documents(store, sorted(orphan_documents))
+    if orphan_points:
+        client.delete_documents(store, orphan_points)
+
+    missing_documents = list(
+        VectorDocument.objects.filter(
+            store=store, created_at__lt=timezone.now() - grace_period
+        )
+        .exclude(pk__in=indexed_documents)
+        .values_list("pk", flat=True)
+    )
+
+    report = {
+        "store": store.code,
+        "points": points,
+        "orphan_documents": len(orphan_documents),
+        "orphan_points": len(orphan_points),
+        "missing_documents": missing_documents,
+    }
+    if orphan_documents or orphan_points or missing_documents:
+        logger.warning(f"Vector store {store.code} drifted from the database: {report}")
+    return report
+
+
+@shared_task
+def reconcile_vector_stores():
+    """
+    Reconcile all the vector stores with the database, see `reconcile_store`.
+    """
+    lock = get_redis_client().lock(RECONCILE_LOCK_KEY, timeout=6 * 60 * 60, blocking_timeout=0)
+    if not lock.acquire():
+        logger.debug("Vector stores reconciliation already running")
+        return []
+
+    try:
+        reports = []
+        for store in VectorStore.objects.select_related("backend"):
+            try:
+                reports.append(reconcile_store(store))
+            except Exception as e:
+                logger.error(f"Unable to reconcile vector store {store.code}: {e}")
+        return reports
+    finally:
+        lock.release()
+
+
+@shared_task
+def reindex_vector_store(reindex_id: int):
+    """
+    Run, or continue, a reindex created with `vector_stores.reindex.start_reindex`.
+    """
+    from vector_stores.reindex import run_reindex
+
+    reindex = VectorStoreReindex.objects.select_related("store__backend", "embedding_model").get(pk=reindex_id)
+    run_reindex(reindex)
+    return reindex.status
+
+
+@shared_task
+def process_vector_store_operations():
+    """
+    Apply the pending operations of the outbox to the vector databases, see `vector_stores.outbox`.
+    A single worker applies them at a time, so the operations of a store are applied in order.
+    """
+    from vector_stores.outbox import process_operations
+
+    lock = get_redis_client().lock(OUTBOX_LOCK_KEY, timeout=60 * 60, blocking_timeout=0)
+    if not lock.acquire():
+        logger.debug("Vector store operations already being processed")
+        return 0
+
+    try:
+        return process_operations()
+    finally:
+        lock.release()
+
+
+@shared_task
+def snapshot_vector_store(store_id: int, path: str) -> str:
+    """
+    Save a snapshot of the store and its documents in `path`, see `vector_stores.snapshots.create_snapshot`.
+    """
+    from vector_stores.snapshots import create_snapshot
+
+    store = VectorStore.objects.select_related("backend").get(pk=store_id)
+    return str(create_snapshot(store, path))
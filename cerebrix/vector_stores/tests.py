@@ -1,9 +1,16 @@
-from django.test import TestCase
+import tempfile
+from types import SimpleNamespace
 
+from django.test import SimpleTestCase, TestCase
+from langchain_core.documents import Document as LangchainDocument
 
-from vector_stores.models import VectorStoreBackend, VectorStore
-from vector_stores.types import VectorStoreTypes, VectorStoreMetrics
-from vector_stores.utils.db_clients import CerebrixQdrantClient
+
+from vector_stores.models import VectorStoreBackend, VectorStore, VectorDocument, VectorStoreOperation
+from vector_stores.outbox import apply_operations, get_batches, process_operations, queue_operation
+from vector_stores.types import VectorStoreTypes, VectorStoreMetrics, VectorStoreOperationType, OperationStatus
+from vector_stores.utils.db_clients import CerebrixQdrantClient, CerebrixNumpyClient
+from vector_stores.utils.sparse import BM25Encoder, tokenize, term_index
+from vector_stores.utils.tenants import SHARED_TENANT, get_vector_document_tenants, get_shard_tenants
 from aimodels.models import EmbeddingModel
 from aimodels.types import EmbeddingModelTypes
 
@@ -34,6 +41,8 @@ class QdrantVectorStoreTests(TestCase):
             backend=self.backend,
             metric=VectorStoreMetrics.COSINE,
         )
+        # the store is created in Qdrant by the outbox worker
+        process_operations()
 
         # Verify store exists in Qdrant
         self.assertTrue(
@@ -43,9 +52,189 @@ class QdrantVectorStoreTests(TestCase):
 
         # Delete store
         store.delete()
+        process_operations()
 
         # Verify store was deleted from Qdrant
         self.assertFalse(
             self.client.store_exists(store.code),
             "Store should not exist in Qdrant after deletion",
         )
+
+
+class FakeEmbeddings:
+    """
+    Embeds "x,y" as the vector [x, y].
+    """
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(value) for value in text.split(",")]
+
+
+class NumpyVectorStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        backend = SimpleNamespace(config={"path": directory.name, "search_block_size": 2})
+        self.client = CerebrixNumpyClient(backend)
+        self.embedding_model = SimpleNamespace(size=2, model=FakeEmbeddings())
+
+    def create_store(self, metric):
+        store = SimpleNamespace(
+            code=f"store_{metric}", metric=metric, get_indexed_embedding_model=lambda: self.embedding_model
+        )
+        self.client.create_store(store)
+        self.client.store_documents(
+            store, [LangchainDocument(page_content=text) for text in ["1,0", "0,1", "3,3", "-1,0", "2,0.5"]]
+        )
+        return store
+
+    def test_search_all_metrics(self):
+        expected = {
+            VectorStoreMetrics.COSINE: ["1,0", "2,0.5"],
+            VectorStoreMetrics.DOT_PRODUCT: ["3,3", "2,0.5"],
+            VectorStoreMetrics.EUCLIDEAN: ["2,0.5", "1,0"],
+            VectorStoreMetrics.MANHATTAN: ["2,0.5", "1,0"],
+        }
+        for metric, texts in expected.items():
+            with self.subTest(metric=metric):
+                store = self.create_store(metric)
+                documents = self.client.search(store, "3,0", k=2)
+                self.assertEqual([document.page_content for document in documents], texts)
+
+    def test_deleted_documents_are_not_returned(self):
+        store = self.create_store(VectorStoreMetrics.COSINE)
+        first = self.client.search(store, "1,0", k=1)[0]
+
+        self.client.delete_documents(store, [first.metadata["_id"]])
+
+        documents = self.client.search(store, "1,0", k=5)
+        self.assertEqual(len(documents), 4)
+        self.assertNotIn(first.metadata["_id"], [document.metadata["_id"] for document in documents])
+
+
+    def test_interrupted_append_is_discarded(self):
+        store = self.create_store(VectorStoreMetrics.COSINE)
+        path = self.client.get_store_path(store.code)
+        # an append interrupted after writing the payloads, the offsets and the vectors, before the ids
+        partial = {"payloads.jsonl": b'{"page_content": "lost"}\n', "offsets.u64": bytes(8), "vectors.f32": bytes(8)}
+        for name, data in partial.items():
+            with open(path / name, "ab") as file:
+                file.write(data)
+
+        self.client.store_documents(store, [LangchainDocument(page_content="1,-1")])
+
+        documents = self.client.search(store, "1,-1", k=6)
+        self.assertEqual(len(documents), 6)
+        self.assertEqual(documents[0].page_content, "1,-1")
+        self.assertNotIn("lost", [document.page_content for document in documents])
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.backend = VectorStoreBackend.objects.create(
+            name="Test NumPy Backend",
+            type=VectorStoreTypes.NUMPY,
+            config={"path": directory.name},
+            embedding_model=EmbeddingModel.objects.create(
+                name="Test Embedding Model",
+                code="test_embedding_model",
+                type=EmbeddingModelTypes.OLLAMA,
+                size=2,
+            ),
+        )
+        self.client = self.backend.db_client
+        self.store = VectorStore.objects.create(
+            name="Test Store", code="test_store", backend=self.backend, metric=VectorStoreMetrics.COSINE
+        )
+        process_operations()
+        # the vectors are written with the fake embeddings, the store in the database only names them
+        self.fake_store = SimpleNamespace(
+            code=self.store.code,
+            get_indexed_embedding_model=lambda: SimpleNamespace(size=2, model=FakeEmbeddings()),
+        )
+
+    def get_pending_operations(self):
+        return list(VectorStoreOperation.objects.filter(status=OperationStatus.PENDING).order_by("pk"))
+
+    def test_deletes_of_a_transaction_are_merged(self):
+        first, second, third, kept = [VectorDocument.objects.create(store=self.store) for _ in range(4)]
+        self.client.store_documents(
+            self.fake_store,
+            [
+                LangchainDocument(page_content=text, metadata={"vector_document_id": document.pk})
+                for text, document in [("1,0", first), ("0,1", third), ("1,1", kept)]
+            ],
+        )
+
+        VectorDocument.objects.filter(pk__in=[first.pk, second.pk]).delete()
+        third.delete()
+
+        operations = self.get_pending_operations()
+        self.assertEqual(
+            [operation.operation for operation in operations], [VectorStoreOperationType.DELETE_VECTOR_DOCUMENTS]
+        )
+        self.assertEqual(operations[0].vector_document_ids, [first.pk, second.pk, third.pk])
+
+        process_operations()
+        documents = self.client.search(self.fake_store, "1,0", k=3)
+        self.assertEqual([document.metadata["vector_document_id"] for document in documents], [kept.pk])
+
+    def test_documents_of_a_store_deleted_in_the_transaction_are_not_queued(self):
+        document = VectorDocument.objects.create(store=self.store)
+        document.delete()
+
+        self.store.delete()
+
+        operations = self.get_pending_operations()
+        self.assertEqual([operation.operation for operation in operations], [VectorStoreOperationType.DELETE_STORE])
+        process_operations()
+        self.assertFalse(self.client.store_exists(self.store.code))
+
+    def test_document_deletes_are_applied_together(self):
+        for ids in ([1, 2], [3]):
+            queue_operation(
+                VectorStoreOperationType.DELETE_VECTOR_DOCUMENTS,
+                self.backend.pk,
+                self.store.code,
+                store_id=self.store.pk,
+                vector_document_ids=ids,
+            )
+        queue_operation(VectorStoreOperationType.DELETE_STORE, self.backend.pk, self.store.code, store_id=self.store.pk)
+        operations = self.get_pending_operations()
+
+        self.assertEqual([len(batch) for batch in get_batches(operations)], [2, 1])
+        apply_operations(operations)
+
+        self.assertEqual({operation.status for operation in operations}, {OperationStatus.DONE})
+        self.assertFalse(self.client.store_exists(self.store.code))
+
+
+class BM25EncoderTests(SimpleTestCase):
+    def test_codes_are_kept_as_terms(self):
+        self.assertEqual(tokenize("Part XJ-2045 fits"), ["part", "xj-2045", "xj", "2045", "fits"])
+
+    def test_document_weights_saturate(self):
+        encoder = BM25Encoder(k1=1.2, b=0.75, avg_length=4)
+        indices, values = encoder.encode_document("valve valve valve pump")
+        weights = dict(zip(indices, values))
+
+        self.assertGreater(weights[term_index("valve")], weights[term_index("pump")])
+        self.assertLess(weights[term_index("valve")], 3 * weights[term_index("pump")])
+        self.assertEqual(encoder.encode_query("pump valve pump")[0], [term_index("pump"), term_index("valve")])
+
+
+class TenantsTests(SimpleTestCase):
+    def test_file_of_two_users_stays_private(self):
+        documents = [SimpleNamespace(public=False, user_id=2), SimpleNamespace(public=False, user_id=1)]
+        vector_document = SimpleNamespace(documents=SimpleNamespace(all=lambda: documents))
+
+        tenants = get_vector_document_tenants(vector_document)
+
+        self.assertEqual(tenants, ["user:1", "user:2"])
+        self.assertEqual(get_shard_tenants(tenants), ["user:1", "user:2"])
+        self.assertEqual(get_shard_tenants([SHARED_TENANT, "user:1"]), [SHARED_TENANT])
@@ -6,6 +6,8 @@ class VectorStoreTypes(models.IntegerChoices):
     """
 
     QDRANT = 1, "Qdrant"
+    NUMPY = 2, "NumPy"
+    PGVECTOR = 3, "pgvector"
     
 
 class VectorStoreMetrics(models.IntegerChoices):
@@ -17,3 +19,36 @@ class VectorStoreMetrics(models.IntegerChoices):
     EUCLIDEAN = 2, "Euclidean"
     DOT_PRODUCT = 3, "Dot Product"
     MANHATTAN = 4, "Manhattan"
+
+
+class VectorStoreOperationType(models.TextChoices):
+    """
+    The operations on the vector database queued in the outbox, see vector_stores.outbox.
+    """
+
+    SAVE_STORE = "save_store", "Save store"
+    DELETE_STORE = "delete_store", "Delete store"
+    DELETE_VECTOR_DOCUMENTS = "delete_vector_documents", "Delete vector documents"
+
+
+class OperationStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    DONE = "done", "Done"
+    FAILED = "failed", "Failed"
+
+
+class ReindexStatus(models.TextChoices):
+    RUNNING = "running", "Running"
+    COMPLETED = "completed", "Completed"
+    FAILED = "failed", "Failed"
+
+
+class VectorStoreQuantization(models.IntegerChoices):
+    """
+    The quantizations that can be applied to the vectors of a store to reduce the memory they use.
+    """
+
+    NONE = 0, "None"
+    SCALAR = 1, "Scalar"
+    PRODUCT = 2, "Product"
+    BINARY = 3, "Binary"
@@ -1,9 +1,14 @@
 from .base import BaseVectorDbClient
 from .qdrant import CerebrixQdrantClient
+from .numpy_store import CerebrixNumpyClient
+from .pgvector import CerebrixPgvectorClient
+from .pool import get_db_client, invalidate_db_clients
 
 
 from vector_stores.types import VectorStoreTypes
 
 STORE_CLIENT_MAP = {
     VectorStoreTypes.QDRANT: CerebrixQdrantClient,
+    VectorStoreTypes.NUMPY: CerebrixNumpyClient,
+    VectorStoreTypes.PGVECTOR: CerebrixPgvectorClient,
 }
@@ -1,5 +1,8 @@
+import asyncio
 import logging
+from contextlib import contextmanager
 
+from asgiref.sync import sync_to_async
 from langchain_core.documents import Document as LangchainDocument
 
 from vector_stores.exceptions import VectorStoreValidationError
@@ -13,14 +16,36 @@ class BaseVectorDbClient:
     """
     Base class for all vector database clients.
     This class is used to abstract the main logics needed by Cerebrix to interact with a vector database.
+
+    Every operation has an async variant (prefixed with `a`). By default they run the sync
+    implementation in a thread, clients with a native async driver should override them.
     """
     config_schema = None
+    # whether the client implements the methods used by vector_stores.reindex
+    supports_reindex = False
+    # whether the client implements the methods used by vector_stores.snapshots
+    supports_snapshots = False
+    # whether `search` accepts a QuerySet of VectorDocuments as `vector_document_ids`, applied in the same query
+    supports_sql_filters = False
     
     def __init__(self, backend):
         self.backend = backend
         self.config = backend.config
         self.validate_config(self.config)
 
+    @classmethod
+    def is_reusable(cls, config: dict) -> bool:
+        """ Whether the client can be shared, through the client pool, by all the users of the backend in the process """
+        return True
+
+    def close(self):
+        """ Release the connections of the client """
+        pass
+
+    def warm_up(self):
+        """ Open the connection to the vector database, so the first request doesn't pay for it """
+        pass
+
     def create_store(self, store: "VectorStore"):
         pass
  
@@ -33,7 +58,7 @@ class BaseVectorDbClient:
     def store_exists(self, store: "VectorStore"):
         pass
     
-    def store_documents(self, store: "VectorStore", documents: list[LangchainDocument], payloads: list[str] = None) -> list[str]:
+    def store_documents(self, store: "VectorStore", documents: list[LangchainDocument], payloads: list[str] = None, ids: list[str] = None, store_text: bool = True) -> list[str]:
         """
         Store a list of documents in the vector database and return the ids of the created vectors.
 
@@ -41,11 +66,104 @@ class BaseVectorDbClient:
             store: The vector store to store the documents in
             documents: A list of LangchainDocument objects to store in the vector database
             payloads: A list of strings to associate with the embeddings instead of the document page_content.
+            ids: The ids of the vectors, UUID hex strings. If None, they are generated.
+            store_text: If False, the text is not stored with the vector, only the metadata used to filter
+                the searches: the text is saved in the Chunks (see vector_stores.chunks).
         """
         pass
     
     def delete_documents(self, store: "VectorStore", ids: list[str]):
         pass
+
+    @contextmanager
+    def bulk_load(self, store: "VectorStore", wait_index: bool = False):
+        """
+        Context manager to load many documents in the store, e.g. an initial load. Clients can
+        defer the index maintenance until the end of the load. By default it does nothing.
+        """
+        yield
+
+    def delete_vector_documents(self, store: "VectorStore", vector_document_ids: list[int]):
+        """
+        Delete all the vectors of the given VectorDocuments, selected by their `vector_document_id` metadata.
+        """
+        pass
+
+    def set_vector_documents_tenants(self, store: "VectorStore", vector_document_ids: list[int], tenant_ids: list[str]):
+        """
+        Set the tenants of the vectors of the given VectorDocuments, the tenants whose users can search them.
+        Clients that don't scope the searches by tenant can ignore it.
+        """
+        pass
+
+    def scroll_vector_document_ids(self, store: "VectorStore"):
+        """
+        Iterate over all the vectors of the store, yielding the tuples (vector id, vector_document_id).
+        The vector_document_id is None for the vectors without it.
+        """
+        return iter(())
+
+    def search(self, store: "VectorStore", query: str, k: int = 4, vector_document_ids: list[int] = None, **kwargs) -> list[LangchainDocument]:
+        """
+        Return the `k` documents of the store most similar to the query.
+
+        Args:
+            vector_document_ids: If provided, only the chunks of these VectorDocuments are searched.
+                None means all the documents of the store, an empty list means none.
+        """
+        raise NotImplementedError()
+
+    async def acreate_store(self, store: "VectorStore"):
+        return await asyncio.to_thread(self.create_store, store)
+
+    async def aupdate_store(self, store: "VectorStore"):
+        return await asyncio.to_thread(self.update_store, store)
+
+    async def adelete_store(self, store: "VectorStore"):
+        return await asyncio.to_thread(self.delete_store, store)
+
+    async def astore_exists(self, store_name: str):
+        return await asyncio.to_thread(self.store_exists, store_name)
+
+    async def astore_documents(self, store: "VectorStore", documents: list[LangchainDocument], payloads: list[str] = None, ids: list[str] = None, store_text: bool = True) -> list[str]:
+        return await asyncio.to_thread(self.store_documents, store, documents, payloads, ids, store_text)
+
+    def get_next_collection_name(self, store: "VectorStore") -> str:
+        """ Return the name of the collection built by the next reindex of the store """
+        raise NotImplementedError()
+
+    def create_reindex_store(self, store: "VectorStore", collection_name: str, embedding_model):
+        """ Create, if it doesn't exist, the collection where the store is reindexed """
+        raise NotImplementedError()
+
+    def reindex_documents(self, store: "VectorStore", source: str, target: str, embedding_model, vector_document_ids: list[int]) -> int:
+        """ Embed again the vectors of the VectorDocuments from `source` into `target`, return the number of vectors """
+        raise NotImplementedError()
+
+    def swap_store(self, store: "VectorStore", collection_name: str) -> str | None:
+        """ Make the store use the collection, return the previous one if it still exists """
+        raise NotImplementedError()
+
+    def swap_deletes_store(self, store: "VectorStore") -> bool:
+        """ Return True if `swap_store` deletes the current collection of the store instead of returning it """
+        return False
+
+    def delete_collection(self, collection_name: str):
+        raise NotImplementedError()
+
+    async def adelete_documents(self, store: "VectorStore", ids: list[str]):
+        return await asyncio.to_thread(self.delete_documents, store, ids)
+
+    async def adelete_vector_documents(self, store: "VectorStore", vector_document_ids: list[int]):
+        return await asyncio.to_thread(self.delete_vector_documents, store, vector_document_ids)
+
+    async def asearch(self, store: "VectorStore", query: str, k: int = 4, vector_document_ids: list[int] = None, **kwargs) -> list[LangchainDocument]:
+        return await asyncio.to_thread(self.search, store, query, k, vector_document_ids, **kwargs)
+
+    @staticmethod
+    async def aget_embedding_model(store: "VectorStore"):
+        """ Get the indexed embedding model of the store without running database queries in the event loop """
+        return await sync_to_async(store.get_indexed_embedding_model)()
     
     @classmethod
     def validate_config(cls, config: dict):
@@ -59,6 +177,17 @@ class BaseVectorDbClient:
             raise VectorStoreValidationError(message=str(e))
         
     def get_retriever(self, store: VectorStore, **kwargs):
-        """ This method should return a retriever for the vector store """
-        pass
+        """
+        Return a LangChain retriever for the vector store. It supports both `invoke` and `ainvoke`.
+
+        Args:
+            k: The number of documents to retrieve
+            use_cache: Whether the results are kept in the retrieval cache
+            kwargs: Extra arguments passed to `search`/`asearch`
+        """
+        from .retrievers import VectorDbClientRetriever
+
+        k = kwargs.pop("k", 4)
+        use_cache = kwargs.pop("use_cache", True)
+        return VectorDbClientRetriever(client=self, store=store, k=k, use_cache=use_cache, search_kwargs=kwargs)
 
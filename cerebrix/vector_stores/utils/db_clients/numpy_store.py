@@ -0,0 +1,315 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from pydantic import BaseModel, Field
+from langchain_core.documents import Document as LangchainDocument
+
+from vector_stores.exceptions import VectorStoreValidationError
+from vector_stores.models import VectorStore, VectorStoreBackend
+from vector_stores.types import VectorStoreMetrics
+from vector_stores.chunks import get_payload_metadata
+from .base import BaseVectorDbClient
+
+logger = logging.getLogger(__name__)
+
+ID_DTYPE = np.dtype("S32")
+
+
+class NumpyConfig(BaseModel):
+    # directory where the stores are saved, one sub directory for each store
+    path: str = Field(..., min_length=1)
+    # number of vectors scored at a time, it bounds the memory used by a search
+    search_block_size: int = Field(65536, gt=0)
+
+
+class NumpyStoreFiles:
+    """
+    Memory mapped view of the files of a store.
+
+    The files are only appended to, so a view stays valid until new vectors are added:
+    `count` is compared with the size of the ids file to know when the view must be reloaded.
+    Deletions flip a byte of the `deleted` mask in place and are visible without reloading.
+    """
+
+    def __init__(self, path: Path, dim: int):
+        self.path = path
+        self.dim = dim
+        self.count = os.path.getsize(path / "ids.bin") // ID_DTYPE.itemsize
+        self._id_to_row = None
+        if not self.count:
+            self.vectors = np.empty((0, dim), dtype=np.float32)
+            self.ids = np.empty(0, dtype=ID_DTYPE)
+            self.deleted = np.empty(0, dtype=np.uint8)
+            self.vector_documents = np.empty(0, dtype=np.int64)
+            self.offsets = np.empty(0, dtype=np.uint64)
+            return
+        # np.memmap doesn't read the files: the pages are loaded by the OS when the search touches them
+        self.vectors = np.memmap(path / "vectors.f32", dtype=np.float32, mode="r", shape=(self.count, dim))
+        self.ids = np.memmap(path / "ids.bin", dtype=ID_DTYPE, mode="r", shape=(self.count,))
+        self.deleted = np.memmap(path / "deleted.bin", dtype=np.uint8, mode="r", shape=(self.count,))
+        self.vector_documents = np.memmap(path / "documents.i64", dtype=np.int64, mode="r", shape=(self.count,))
+        self.offsets = np.memmap(path / "offsets.u64", dtype=np.uint64, mode="r", shape=(self.count,))
+
+    def is_stale(self) -> bool:
+        return os.path.getsize(self.path / "ids.bin") // ID_DTYPE.itemsize != self.count
+
+    @property
+    def id_to_row(self) -> dict:
+        if self._id_to_row is None:
+            self._id_to_row = {id.decode(): row for row, id in enumerate(self.ids.tolist())}
+        return self._id_to_row
+
+    def read_payloads(self, rows) -> list[dict]:
+        payloads = []
+        with open(self.path / "payloads.jsonl", "rb") as file:
+            for row in rows:
+                file.seek(int(self.offsets[row]))
+                payloads.append(json.loads(file.readline()))
+        return payloads
+
+
+class CerebrixNumpyClient(BaseVectorDbClient):
+    """
+    In-process vector store saved on the local disk, for small stores and tests.
+
+    Each store is a directory with:
+        - meta.json: the dimension and the metric of the vectors
+        - vectors.f32: the float32 matrix of the vectors, one row for each vector
+        - ids.bin: the ids of the vectors, 32 bytes each
+        - deleted.bin: one byte for each vector, 1 if the vector has been deleted
+        - documents.i64: the `vector_document_id` of each vector, -1 if missing, used to filter the search
+        - payloads.jsonl and offsets.u64: the payloads, one json per line, and the offset of each line
+
+    The files are memory mapped, so opening a store doesn't copy the vectors in memory.
+    ids.bin is written last and marks the rows of the completed appends, see `truncate_to_ids`.
+    The search is exact: the query is scored against all the vectors with vectorized numpy
+    operations, in blocks of `search_block_size` rows, and the top k rows are selected with `argpartition`.
+    Cosine vectors are normalized when stored, as Qdrant does, so their score is a dot product.
+    Tenants are not supported: the `tenant_id` is kept in the payload but the searches are not scoped by it.
+    """
+    config_schema = NumpyConfig
+
+    def __init__(self, backend: "VectorStoreBackend"):
+        super().__init__(backend)
+        self.numpy_config = NumpyConfig.model_validate(self.config)
+        self.root = Path(self.numpy_config.path)
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._files.clear()
+
+    def get_store_path(self, store_name: str) -> Path:
+        if not store_name or Path(store_name).name != store_name or store_name in (".", ".."):
+            raise VectorStoreValidationError(message=f"Invalid store code {store_name}")
+        return self.root / store_name
+
+    @contextmanager
+    def write_lock(self, path: Path):
+        """ Lock the store for writing, across threads and processes """
+        with open(path / ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_meta(self, path: Path) -> dict:
+        with open(path / "meta.json") as file:
+            return json.load(file)
+
+    def truncate_to_ids(self, path: Path, dim: int):
+        """
+        Truncate the files to the rows of ids.bin. The ids are written last, so they count the rows of
+        the completed appends: an append interrupted before them leaves extra rows in the other files,
+        removed here, under the write lock, before the next append.
+        """
+        count = os.path.getsize(path / "ids.bin") // ID_DTYPE.itemsize
+        sizes = {
+            "ids.bin": count * ID_DTYPE.itemsize,
+            "vectors.f32": count * dim * np.dtype(np.float32).itemsize,
+            "deleted.bin": count,
+            "documents.i64": count * np.dtype(np.int64).itemsize,
+            "offsets.u64": count * np.dtype(np.uint64).itemsize,
+        }
+        payloads_size = 0
+        if count:
+            # the payloads end after the line of the last row
+            last_offset = np.fromfile(path / "offsets.u64", dtype=np.uint64, count=count)[-1]
+            with open(path / "payloads.jsonl", "rb") as file:
+                file.seek(int(last_offset))
+                file.readline()
+                payloads_size = file.tell()
+        sizes["payloads.jsonl"] = payloads_size
+        for name, size in sizes.items():
+            if os.path.getsize(path / name) > size:
+                logger.warning(f"Removing the rows of an interrupted append from {path / name}")
+                os.truncate(path / name, size)
+
+    def get_files(self, store: "VectorStore") -> NumpyStoreFiles:
+        path = self.get_store_path(store.code)
+        with self._lock:
+            files = self._files.get(store.code)
+            if files is None or files.is_stale():
+                files = NumpyStoreFiles(path, self.read_meta(path)["dim"])
+                self._files[store.code] = files
+            return files
+
+    def create_store(self, store: "VectorStore"):
+        path = self.get_store_path(store.code)
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / "meta.json", "w") as file:
+            json.dump({"dim": store.get_indexed_embedding_model().size, "metric": store.metric}, file)
+        for name in ("vectors.f32", "ids.bin", "deleted.bin", "documents.i64", "payloads.jsonl", "offsets.u64"):
+            (path / name).touch()
+
+    def delete_store(self, store: "VectorStore"):
+        with self._lock:
+            self._files.pop(store.code, None)
+        shutil.rmtree(self.get_store_path(store.code), ignore_errors=True)
+
+    def store_exists(self, store_name: str):
+        return (self.get_store_path(store_name) / "meta.json").exists()
+
+    def prepare_vectors(self, vectors, metric: int) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if metric == VectorStoreMetrics.COSINE:
+            norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+        return vectors
+
+    def store_documents(self, store: "VectorStore", documents: list[LangchainDocument], payloads: list[str] = None, ids: list[str] = None, store_text: bool = True) -> list[str]:
+        if not documents:
+            return []
+        path = self.get_store_path(store.code)
+        meta = self.read_meta(path)
+        embeddings = store.get_indexed_embedding_model().model.embed_documents(
+            [document.page_content for document in documents]
+        )
+        vectors = self.prepare_vectors(embeddings, meta["metric"])
+        if vectors.shape[1] != meta["dim"]:
+            raise VectorStoreValidationError(
+                message=f"Expected vectors of size {meta['dim']}, got {vectors.shape[1]}"
+            )
+        ids = ids or [uuid.uuid4().hex for _ in documents]
+        vector_documents = np.array(
+            [document.metadata.get("vector_document_id", -1) for document in documents], dtype=np.int64
+        )
+        lines = [
+            json.dumps(
+                {
+                    "page_content": payloads[index] if payloads else document.page_content,
+                    "metadata": document.metadata,
+                }
+                if store_text
+                else {"metadata": get_payload_metadata(document.metadata)}
+            ).encode() + b"\n"
+            for index, document in enumerate(documents)
+        ]
+
+        with self.write_lock(path):
+            self.truncate_to_ids(path, meta["dim"])
+            with open(path / "payloads.jsonl", "ab") as file:
+                start = file.tell()
+                file.writelines(lines)
+            offsets = start + np.cumsum([0] + [len(line) for line in lines[:-1]], dtype=np.uint64)
+            with open(path / "offsets.u64", "ab") as file:
+                file.write(offsets.astype(np.uint64).tobytes())
+            with open(path / "vectors.f32", "ab") as file:
+                file.write(vectors.tobytes())
+            with open(path / "deleted.bin", "ab") as file:
+                file.write(bytes(len(ids)))
+            with open(path / "documents.i64", "ab") as file:
+                file.write(vector_documents.tobytes())
+            # the ids are written last: their size is the number of complete rows
+            with open(path / "ids.bin", "ab") as file:
+                file.write(np.array(ids, dtype=ID_DTYPE).tobytes())
+        return ids
+
+    def delete_documents(self, store: "VectorStore", ids: list[str]):
+        files = self.get_files(store)
+        rows = [files.id_to_row[id] for id in ids if id in files.id_to_row]
+        if not rows:
+            return
+        with self.write_lock(files.path):
+            deleted = np.memmap(files.path / "deleted.bin", dtype=np.uint8, mode="r+", shape=(files.count,))
+            deleted[rows] = 1
+            deleted.flush()
+
+    def delete_vector_documents(self, store: "VectorStore", vector_document_ids: list[int]):
+        files = self.get_files(store)
+        if not files.count:
+            return
+        rows = np.isin(files.vector_documents, np.array(list(vector_document_ids), dtype=np.int64))
+        if not rows.any():
+            return
+        with self.write_lock(files.path):
+            deleted = np.memmap(files.path / "deleted.bin", dtype=np.uint8, mode="r+", shape=(files.count,))
+            deleted[rows] = 1
+            deleted.flush()
+
+    def scroll_vector_document_ids(self, store: "VectorStore"):
+        files = self.get_files(store)
+        for row in np.flatnonzero(files.deleted == 0):
+            vector_document_id = int(files.vector_documents[row])
+            yield files.ids[row].decode(), vector_document_id if vector_document_id >= 0 else None
+
+    def score(self, vectors: np.ndarray, query: np.ndarray, metric: int) -> np.ndarray:
+        """
+        Score the vectors against the query, higher is better.
+        Distances are negated, the documents returned by `search` report them as positive values.
+        """
+        if metric in (VectorStoreMetrics.COSINE, VectorStoreMetrics.DOT_PRODUCT):
+            return vectors @ query
+        if metric == VectorStoreMetrics.EUCLIDEAN:
+            # |v - q|^2 = |v|^2 - 2 v.q + |q|^2, without materializing v - q
+            squared = np.einsum("ij,ij->i", vectors, vectors) - 2 * (vectors @ query) + query @ query
+            return -np.sqrt(np.maximum(squared, 0))
+        return -np.abs(vectors - query).sum(axis=1)
+
+    def search(self, store: "VectorStore", query: str, k: int = 4, vector_document_ids: list[int] = None, **kwargs) -> list[LangchainDocument]:
+        files = self.get_files(store)
+        if not files.count or k <= 0 or (vector_document_ids is not None and not vector_document_ids):
+            return []
+        allowed = np.array(vector_document_ids, dtype=np.int64) if vector_document_ids is not None else None
+        metric = self.read_meta(files.path)["metric"]
+        query_vector = self.prepare_vectors(store.get_indexed_embedding_model().model.embed_query(query), metric)
+
+        block_size = self.numpy_config.search_block_size
+        candidates = []
+        candidate_scores = []
+        for start in range(0, files.count, block_size):
+            scores = self.score(files.vectors[start : start + block_size], query_vector, metric)
+            excluded = files.deleted[start : start + block_size] == 1
+            if allowed is not None:
+                excluded |= ~np.isin(files.vector_documents[start : start + block_size], allowed)
+            scores[excluded] = -np.inf
+            top = min(k, len(scores))
+            rows = np.argpartition(-scores, top - 1)[:top]
+            candidates.append(rows + start)
+            candidate_scores.append(scores[rows])
+
+        rows = np.concatenate(candidates)
+        scores = np.concatenate(candidate_scores)
+        order = np.argsort(-scores, kind="stable")[:k]
+        rows, scores = rows[order], scores[order]
+        valid = np.isfinite(scores)
+        rows, scores = rows[valid], scores[valid]
+
+        distance = metric in (VectorStoreMetrics.EUCLIDEAN, VectorStoreMetrics.MANHATTAN)
+        documents = []
+        for row, score, payload in zip(rows, scores, files.read_payloads(rows)):
+            metadata = dict(payload.get("metadata") or {})
+            metadata["_id"] = files.ids[row].decode()
+            metadata["_score"] = float(-score if distance else score)
+            documents.append(LangchainDocument(page_content=payload.get("page_content", ""), metadata=metadata))
+        return documents
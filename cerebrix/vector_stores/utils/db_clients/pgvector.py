@@ -0,0 +1,307 @@
+import json
+import logging
+import re
+import time
+import uuid
+from typing import Literal
+
+from django.db import connections, router, transaction
+from django.db.models import QuerySet
+from pydantic import BaseModel, Field
+from langchain_core.documents import Document as LangchainDocument
+
+from vector_stores.exceptions import VectorStoreValidationError
+from vector_stores.models import VectorStore, VectorStoreBackend, VectorDocument
+from vector_stores.types import VectorStoreMetrics
+from vector_stores.utils.tenants import get_tenants
+from vector_stores.chunks import get_payload_metadata
+from .base import BaseVectorDbClient
+
+logger = logging.getLogger(__name__)
+
+TABLE_NAME_RE = re.compile(r"^[a-z0-9_]+$")
+
+# distance operator and operator class of each metric
+METRIC_OPERATORS = {
+    VectorStoreMetrics.COSINE: ("<=>", "vector_cosine_ops"),
+    VectorStoreMetrics.EUCLIDEAN: ("<->", "vector_l2_ops"),
+    VectorStoreMetrics.DOT_PRODUCT: ("<#>", "vector_ip_ops"),
+    VectorStoreMetrics.MANHATTAN: ("<+>", "vector_l1_ops"),
+}
+
+
+class PgvectorConfig(BaseModel):
+    # the Django database where the vectors are saved, by default the database of Cerebrix
+    database: str = "default"
+    # prefix of the tables, one table for each store
+    table_prefix: str = Field("vectors_", pattern=r"^[a-z0-9_]*$")
+    index_type: Literal["hnsw", "ivfflat"] = "hnsw"
+    # number of lists of the IVFFlat index, about rows / 1000 up to 1M rows
+    ivfflat_lists: int = Field(100, gt=0)
+    # search settings, if None the defaults of pgvector are used
+    hnsw_ef_search: int | None = Field(None, gt=0)
+    ivfflat_probes: int | None = Field(None, gt=0)
+    # "relaxed_order" or "strict_order" to keep scanning the index until the filtered search has k results.
+    # It needs pgvector >= 0.8
+    iterative_scan: Literal["relaxed_order", "strict_order"] | None = None
+    insert_batch_size: int = Field(500, gt=0)
+    scroll_batch_size: int = Field(1000, gt=0)
+
+
+def to_vector_literal(vector: list[float]) -> str:
+    """ Format a vector as a pgvector literal, cast with `::vector` in the queries """
+    return "[" + ",".join(repr(float(value)) for value in vector) + "]"
+
+
+class CerebrixPgvectorClient(BaseVectorDbClient):
+    """
+    Vector store saved in Postgres with the pgvector extension, usually the same database of Cerebrix.
+
+    Each store is a table with the vectors, their payload and the `vector_document_id` and `tenant_id`
+    columns used to filter the searches. `tenant_id` is the array of the tenants of the vector, matched
+    by the searches with `&&` on a GIN index. The vectors are indexed with HNSW or IVFFlat.
+    When the table lives in the database of the VectorDocuments, the `vector_document_id` is a foreign key:
+    the vectors are deleted together with their VectorDocument, in the same transaction.
+
+    The searches accept a QuerySet of VectorDocuments as `vector_document_ids`: it's joined,
+    as a subquery, in the same query of the similarity search (see RAGBackend.get_retriever).
+
+    Quantization, on disk storage and hybrid search are not supported and the store settings are ignored.
+    """
+    config_schema = PgvectorConfig
+    supports_sql_filters = True
+
+    def __init__(self, backend: "VectorStoreBackend"):
+        super().__init__(backend)
+        self.pg_config = PgvectorConfig.model_validate(self.config)
+
+    @property
+    def connection(self):
+        return connections[self.pg_config.database]
+
+    def get_table_name(self, store_name: str) -> str:
+        table_name = f"{self.pg_config.table_prefix}{store_name}".lower()
+        if not TABLE_NAME_RE.match(table_name) or len(table_name) > 63:
+            raise VectorStoreValidationError(message=f"Invalid store code {store_name} for a pgvector table")
+        return table_name
+
+    def get_operator(self, store: "VectorStore") -> tuple[str, str]:
+        operator, ops = METRIC_OPERATORS[store.metric or VectorStoreMetrics.COSINE]
+        if self.pg_config.index_type == "ivfflat" and store.metric == VectorStoreMetrics.MANHATTAN:
+            raise VectorStoreValidationError(message="IVFFlat indexes don't support the Manhattan distance")
+        return operator, ops
+
+    def get_index_sql(self, store: "VectorStore", table_name: str) -> str:
+        _, ops = self.get_operator(store)
+        quote = self.connection.ops.quote_name
+        if self.pg_config.index_type == "ivfflat":
+            options = f"lists = {self.pg_config.ivfflat_lists}"
+        else:
+            options = ", ".join(
+                f"{name} = {int(value)}"
+                for name, value in (("m", store.hnsw_m), ("ef_construction", store.hnsw_ef_construct))
+                if value
+            )
+        return (
+            f"CREATE INDEX IF NOT EXISTS {quote(table_name + '_embedding')} ON {quote(table_name)} "
+            f"USING {self.pg_config.index_type} (embedding {ops})" + (f" WITH ({options})" if options else "")
+        )
+
+    def create_store(self, store: "VectorStore"):
+        table_name = self.get_table_name(store.code)
+        quote = self.connection.ops.quote_name
+        dim = int(store.get_indexed_embedding_model().size)
+        references = ""
+        if router.db_for_write(VectorDocument) == self.pg_config.database:
+            references = f" REFERENCES {quote(VectorDocument._meta.db_table)} (id) ON DELETE CASCADE"
+        with transaction.atomic(using=self.pg_config.database), self.connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(table_name)} ("
+                "id uuid PRIMARY KEY, "
+                f"vector_document_id bigint{references}, "
+                "tenant_id text[], "
+                f"embedding vector({dim}) NOT NULL, "
+                "page_content text NOT NULL, "
+                "metadata jsonb NOT NULL DEFAULT '{}'::jsonb)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote(table_name + '_vector_document_id')} "
+                f"ON {quote(table_name)} (vector_document_id)"
+            )
+            cursor.execute(
+                "SELECT data_type FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'tenant_id'",
+                [table_name],
+            )
+            if cursor.fetchone()[0] != "ARRAY":
+                # tables created when a vector had a single tenant
+                cursor.execute(f"DROP INDEX IF EXISTS {quote(table_name + '_tenant_id')}")
+                cursor.execute(
+                    f"ALTER TABLE {quote(table_name)} ALTER COLUMN tenant_id TYPE text[] USING ARRAY[tenant_id]"
+                )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote(table_name + '_tenants')} "
+                f"ON {quote(table_name)} USING gin (tenant_id)"
+            )
+            cursor.execute(self.get_index_sql(store, table_name))
+
+    def update_store(self, store: "VectorStore"):
+        # the indexes are not rebuilt: to change the index settings, drop the embedding index or reindex the store
+        self.create_store(store)
+
+    def delete_store(self, store: "VectorStore"):
+        quote = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {quote(self.get_table_name(store.code))}")
+
+    def store_exists(self, store_name: str):
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [self.get_table_name(store_name)])
+            return cursor.fetchone()[0]
+
+    def store_documents(self, store: "VectorStore", documents: list[LangchainDocument], payloads: list[str] = None, ids: list[str] = None, store_text: bool = True) -> list[str]:
+        if not documents:
+            return []
+        embeddings = store.get_indexed_embedding_model().model.embed_documents(
+            [document.page_content for document in documents]
+        )
+        ids = ids or [uuid.uuid4().hex for _ in documents]
+        rows = [
+            (
+                id,
+                document.metadata.get("vector_document_id"),
+                get_tenants(document.metadata.get("tenant_id")),
+                to_vector_literal(embedding),
+                (payloads[index] if payloads else document.page_content) if store_text else "",
+                json.dumps(document.metadata if store_text else get_payload_metadata(document.metadata)),
+            )
+            for index, (id, document, embedding) in enumerate(zip(ids, documents, embeddings))
+        ]
+        quote = self.connection.ops.quote_name
+        sql = (
+            f"INSERT INTO {quote(self.get_table_name(store.code))} "
+            "(id, vector_document_id, tenant_id, embedding, page_content, metadata) "
+            "VALUES (%s, %s, %s::text[], %s::vector, %s, %s::jsonb)"
+        )
+        batch_size = self.pg_config.insert_batch_size
+        with transaction.atomic(using=self.pg_config.database), self.connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(sql, rows[start : start + batch_size])
+        return ids
+
+    def delete_documents(self, store: "VectorStore", ids: list[str]):
+        if not ids:
+            return
+        quote = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {quote(self.get_table_name(store.code))} WHERE id = ANY(%s::uuid[])", [list(ids)]
+            )
+
+    def delete_vector_documents(self, store: "VectorStore", vector_document_ids: list[int]):
+        if not vector_document_ids:
+            return
+        quote = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {quote(self.get_table_name(store.code))} WHERE vector_document_id = ANY(%s)",
+                [list(vector_document_ids)],
+            )
+
+    def set_vector_documents_tenants(self, store: "VectorStore", vector_document_ids: list[int], tenant_ids: list[str]):
+        quote = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {quote(self.get_table_name(store.code))} "
+                "SET tenant_id = %s::text[], metadata = jsonb_set(metadata, '{tenant_id}', to_jsonb(%s::text[])) "
+                "WHERE vector_document_id = ANY(%s)",
+                [list(tenant_ids), list(tenant_ids), list(vector_document_ids)],
+            )
+
+    def scroll_vector_document_ids(self, store: "VectorStore"):
+        quote = self.connection.ops.quote_name
+        sql = (
+            f"SELECT id, vector_document_id FROM {quote(self.get_table_name(store.code))} "
+            "WHERE id > %s::uuid ORDER BY id LIMIT %s"
+        )
+        last_id = str(uuid.UUID(int=0))
+        while True:
+            with self.connection.cursor() as cursor:
+                cursor.execute(sql, [last_id, self.pg_config.scroll_batch_size])
+                rows = cursor.fetchall()
+            for id, vector_document_id in rows:
+                yield uuid.UUID(str(id)).hex, vector_document_id
+            if len(rows) < self.pg_config.scroll_batch_size:
+                return
+            last_id = str(rows[-1][0])
+
+    def get_filter_sql(self, store: "VectorStore", vector_document_ids=None, tenant_ids: list[str] = None) -> tuple[str, list]:
+        """
+        Build the WHERE clause of the search. A QuerySet of VectorDocuments is joined as a subquery.
+        """
+        conditions, params = [], []
+        if isinstance(vector_document_ids, QuerySet):
+            subquery, subquery_params = (
+                vector_document_ids.values("id").query.get_compiler(using=self.pg_config.database).as_sql()
+            )
+            conditions.append(f"vector_document_id IN ({subquery})")
+            params.extend(subquery_params)
+        elif vector_document_ids is not None:
+            conditions.append("vector_document_id = ANY(%s)")
+            params.append(list(vector_document_ids))
+        if store.multitenant and tenant_ids is not None:
+            conditions.append("tenant_id && %s::text[]")
+            params.append(list(tenant_ids))
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+    def set_search_settings(self, cursor):
+        # SET LOCAL lasts until the end of the transaction of the search
+        if self.pg_config.hnsw_ef_search and self.pg_config.index_type == "hnsw":
+            cursor.execute(f"SET LOCAL hnsw.ef_search = {int(self.pg_config.hnsw_ef_search)}")
+        if self.pg_config.ivfflat_probes and self.pg_config.index_type == "ivfflat":
+            cursor.execute(f"SET LOCAL ivfflat.probes = {int(self.pg_config.ivfflat_probes)}")
+        if self.pg_config.iterative_scan:
+            cursor.execute(f"SET LOCAL {self.pg_config.index_type}.iterative_scan = {self.pg_config.iterative_scan}")
+
+    def to_score(self, store: "VectorStore", distance: float) -> float:
+        """ Convert the pgvector distance to the score of Qdrant, so the clients return comparable scores """
+        if store.metric in (None, VectorStoreMetrics.COSINE):
+            return 1 - distance
+        if store.metric == VectorStoreMetrics.DOT_PRODUCT:
+            # <#> returns the negative inner product
+            return -distance
+        return distance
+
+    def search(self, store: "VectorStore", query: str, k: int = 4, vector_document_ids=None, tenant_ids: list[str] = None, **kwargs) -> list[LangchainDocument]:
+        """
+        Search the store, filtering by the VectorDocuments (a list of ids or a QuerySet) and the tenants.
+        """
+        if k <= 0 or (isinstance(vector_document_ids, (list, tuple, set)) and not vector_document_ids):
+            return []
+        vector = to_vector_literal(store.get_indexed_embedding_model().model.embed_query(query))
+        operator, _ = self.get_operator(store)
+        where, params = self.get_filter_sql(store, vector_document_ids, tenant_ids)
+        quote = self.connection.ops.quote_name
+        sql = (
+            f"SELECT id, page_content, metadata, embedding {operator} %s::vector AS distance "
+            f"FROM {quote(self.get_table_name(store.code))}{where} "
+            f"ORDER BY embedding {operator} %s::vector LIMIT %s"
+        )
+        start = time.perf_counter()
+        with transaction.atomic(using=self.pg_config.database), self.connection.cursor() as cursor:
+            self.set_search_settings(cursor)
+            cursor.execute(sql, [vector, *params, vector, k])
+            rows = cursor.fetchall()
+        logger.debug(
+            f"pgvector search on {store.code} took {(time.perf_counter() - start) * 1000:.1f}ms "
+            f"({len(rows)} results)"
+        )
+
+        documents = []
+        for id, page_content, metadata, distance in rows:
+            metadata = dict(json.loads(metadata) if isinstance(metadata, str) else metadata or {})
+            metadata["_id"] = uuid.UUID(str(id)).hex
+            metadata["_score"] = self.to_score(store, distance)
+            documents.append(LangchainDocument(page_content=page_content, metadata=metadata))
+        return documents
@@ -0,0 +1,32 @@
+from django.conf import settings
+
+from common.utils.instance_cache import InstanceCache
+
+# Per-process pool of the vector database clients, one for each backend configuration
+db_client_pool = InstanceCache(
+    max_size=settings.VECTOR_DB_CLIENT_POOL_MAX_SIZE,
+    on_evict=lambda client: client.close(),
+)
+
+
+def get_db_client(backend):
+    """
+    Return the client of the given VectorStoreBackend.
+
+    Clients are reused, together with their connections, until the backend is saved again:
+    the pool is keyed by the backend pk and its `updated_at`, used as config version.
+    """
+    from . import STORE_CLIENT_MAP
+
+    client_class = STORE_CLIENT_MAP[backend.type]
+    if backend.pk is None or not client_class.is_reusable(backend.config):
+        return client_class(backend)
+    key = (backend.pk, backend.updated_at, backend.type)
+    return db_client_pool.get_or_create(key, lambda: client_class(backend))
+
+
+def invalidate_db_clients(backend) -> int:
+    """
+    Close and remove all the pooled clients of the given backend.
+    """
+    return db_client_pool.invalidate(lambda key: key[0] == backend.pk)
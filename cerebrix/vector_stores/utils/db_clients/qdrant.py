@@ -1,22 +1,74 @@
+import asyncio
 import logging
+import os
+import re
+import threading
+import time
+import uuid
+import weakref
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
+import httpx
 from pydantic import BaseModel, Field, field_validator, ValidationError
-from qdrant_client import QdrantClient, models
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
 from qdrant_client.http.models import Distance
 from langchain_core.documents import Document as LangchainDocument
-from langchain_qdrant import QdrantVectorStore
 
-from vector_stores.exceptions import VectorStoreValidationError
+from vector_stores.exceptions import VectorStoreValidationError, VectorStoreBackendError
 from vector_stores.models import VectorStore, VectorStoreBackend
-from vector_stores.types import VectorStoreMetrics
+from vector_stores.types import VectorStoreMetrics, VectorStoreQuantization
+from vector_stores.utils.sparse import bm25_encoder
+from vector_stores.utils.tenants import SHARED_TENANT, get_tenants, get_shard_tenants
+from vector_stores.chunks import get_chunks, get_payload_metadata
 from .base import BaseVectorDbClient
 
 logger = logging.getLogger(__name__)
 
+# payload fields indexed in every collection, used to filter the searches
+PAYLOAD_INDEXES = {
+    "metadata.vector_document_id": models.PayloadSchemaType.INTEGER,
+    "metadata.user_id": models.PayloadSchemaType.INTEGER,
+}
+TENANT_FIELD = "metadata.tenant_id"
+# default indexing threshold of Qdrant, in KB, restored after a bulk load if the collection had none
+DEFAULT_INDEXING_THRESHOLD = 10000
+# id of no point, deleted to confirm the writes of a bulk load: the point ids are random UUIDs
+CONFIRM_POINT_ID = str(uuid.UUID(int=0))
+
+# name of the BM25 sparse vector of the stores with hybrid search
+SPARSE_VECTOR_NAME = "bm25"
+
 
 class QdrantConfig(BaseModel):
     host: str = Field(..., min_length=1)
     port: int = Field(..., gt=0, lt=65536)    
+    # gRPC is faster than REST for upserts and searches
+    grpc_port: int = Field(6334, gt=0, lt=65536)
+    prefer_grpc: bool = False
+    https: bool = False
+    api_key: str | None = None
+    # timeout, in seconds, of the requests to Qdrant
+    timeout: int | None = Field(None, gt=0)
+    # if True, the client (and its connections) is shared by all the users of the backend in the process
+    reuse_client: bool = True
+    # number of points sent in each upsert request and number of concurrent upsert requests
+    upload_batch_size: int = Field(256, gt=0)
+    upload_parallel: int = Field(4, gt=0)
+    # number of VectorDocuments deleted by each delete request and number of points read by each scroll request
+    delete_batch_size: int = Field(1000, gt=0)
+    scroll_batch_size: int = Field(1000, gt=0)
+    # number of candidates retrieved by each of the dense and sparse searches before the fusion
+    hybrid_prefetch_limit: int = Field(50, gt=0)
+    # seconds between the checks of the collection status while the index is rebuilt after a bulk load
+    bulk_load_poll_interval: float = Field(5, gt=0)
+    # seconds the layout of the collection behind a store is cached: a reindex made by another process
+    # moves the store to a new collection, seen by this process after at most this time
+    layout_cache_ttl: float = Field(60, ge=0)
+    # minimum seconds between two reads of the shard keys of a collection, made when a search
+    # selects a tenant without a known shard key, that may have been created by another process
+    shard_keys_refresh_interval: float = Field(1, ge=0)
     
     @field_validator('host')
     def validate_host(cls, v):
@@ -33,14 +85,106 @@ class CerebrixQdrantClient(BaseVectorDbClient):
     Qdrant client for Cerebrix.
     
     In Qdrant, the store is called a collection.
+
+    The points have the tenants of their documents in `tenant_id`, a keyword array: the same file uploaded
+    by different users is embedded once and searchable by each of them (see vector_stores.utils.tenants).
+    In `multitenant` stores it's indexed with `is_tenant`, so Qdrant keeps the points of each tenant
+    together, and the searches are filtered by the tenants of the user. With `shard_by_tenant`,
+    each tenant also has its own shard key, the points of more than one tenant are stored in the shard
+    of each, and the searches only read the shards of the user tenants.
+
+    The store code is an alias of a versioned collection (`<code>__v<n>`), so a reindex can build a new
+    collection while the searches keep using the old one, and then atomically move the alias.
+    Stores created before the aliases have a collection named as the store, replaced by the first reindex.
+
+    Stores with `hybrid_search` also have a BM25 sparse vector, computed locally, next to the dense one.
+    Their searches run a dense and a sparse search and fuse the two result lists on the server
+    with Reciprocal Rank Fusion.
+
+    The async methods use an AsyncQdrantClient. Async connections are bound to the event loop
+    that opened them, so one AsyncQdrantClient is kept for each running loop.
     """
     config_schema = QdrantConfig
+    supports_reindex = True
+    supports_snapshots = True
+
     def __init__(self, backend: "VectorStoreBackend"):
         super().__init__(backend)
-        self.client = QdrantClient(host=self.config["host"], port=self.config["port"])
+        config = QdrantConfig.model_validate(self.config)
+        self.qdrant_config = config
+        self._connection_kwargs = dict(
+            host=config.host,
+            port=config.port,
+            grpc_port=config.grpc_port,
+            prefer_grpc=config.prefer_grpc,
+            https=config.https,
+            api_key=config.api_key,
+            timeout=config.timeout,
+        )
+        self.client = QdrantClient(**self._connection_kwargs)
+        self._async_clients = weakref.WeakKeyDictionary()
+        # known shard keys of each collection and when they have been read from Qdrant
+        self._shard_keys = defaultdict(set)
+        self._shard_keys_read_at = {}
+        # features each collection, or store alias, has been created with and their expiration,
+        # see get_collection_layout
+        self._layouts = {}
+        # collections in bulk load mode, with the shard keys written and the points upserted
+        self._bulk_loads = {}
+        self._bulk_lock = threading.Lock()
+
+    @property
+    def async_client(self) -> AsyncQdrantClient:
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            self._async_clients[loop] = AsyncQdrantClient(**self._connection_kwargs)
+        return self._async_clients[loop]
+
+    @classmethod
+    def is_reusable(cls, config: dict) -> bool:
+        return config.get("reuse_client", True)
+
+    def close(self):
+        self.client.close()
+        # async clients can't be awaited here, they are closed with their event loop
+        self._async_clients.clear()
+
+    async def aclose(self):
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
     
+    def warm_up(self):
+        self.client.get_collections()
+
+    def get_versioned_name(self, store_name: str, version: int) -> str:
+        return f"{store_name}__v{version}"
+
+    def get_collection_name(self, store_name: str) -> str | None:
+        """
+        Return the name of the collection behind the store alias, None if the store doesn't exist.
+        """
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == store_name:
+                return alias.collection_name
+        if self.client.collection_exists(store_name):
+            return store_name
+        return None
+
+    def get_store_collections(self, store_name: str) -> list[str]:
+        """
+        Return all the collections of the store: the current one and the ones of the reindexes.
+        """
+        pattern = re.compile(rf"^{re.escape(store_name)}__v\d+$")
+        names = [
+            collection.name
+            for collection in self.client.get_collections().collections
+            if collection.name == store_name or pattern.match(collection.name)
+        ]
+        return names
+
     def store_exists(self, store_name: str):
-        return self.client.collection_exists(store_name)
+        return self.get_collection_name(store_name) is not None
     
     def get_distance(self, metric: VectorStoreMetrics):
         mapping = {
@@ -51,52 +195,787 @@ class CerebrixQdrantClient(BaseVectorDbClient):
         }
         return mapping[metric]
     
+    def get_quantization_config(self, store: "VectorStore"):
+        always_ram = store.quantization_always_ram
+        if store.quantization == VectorStoreQuantization.SCALAR:
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, always_ram=always_ram)
+            )
+        if store.quantization == VectorStoreQuantization.PRODUCT:
+            return models.ProductQuantization(
+                product=models.ProductQuantizationConfig(
+                    compression=models.CompressionRatio.X16, always_ram=always_ram
+                )
+            )
+        if store.quantization == VectorStoreQuantization.BINARY:
+            return models.BinaryQuantization(
+                binary=models.BinaryQuantizationConfig(always_ram=always_ram)
+            )
+        return None
+
+    def get_hnsw_config(self, store: "VectorStore") -> models.HnswConfigDiff:
+        # the parameters left to None keep the Qdrant defaults
+        return models.HnswConfigDiff(m=store.hnsw_m, ef_construct=store.hnsw_ef_construct)
+
+    def get_collection_params(self, store: "VectorStore", collection_name: str, embedding_model) -> dict:
+        return dict(
+            collection_name=collection_name,
+            vectors_config=models.VectorParams(
+                size=embedding_model.size,
+                distance=self.get_distance(store.metric),
+                on_disk=store.on_disk_vectors,
+            ),
+            hnsw_config=self.get_hnsw_config(store),
+            quantization_config=self.get_quantization_config(store),
+            on_disk_payload=store.on_disk_payload,
+            sparse_vectors_config=self.get_sparse_vectors_config(store),
+            sharding_method=models.ShardingMethod.CUSTOM if store.shard_by_tenant else None,
+        )
+
+    def get_sparse_vectors_config(self, store: "VectorStore") -> dict | None:
+        if not store.hybrid_search:
+            return None
+        return {
+            SPARSE_VECTOR_NAME: models.SparseVectorParams(
+                index=models.SparseIndexParams(on_disk=store.on_disk_vectors),
+                # the IDF is computed by Qdrant from the statistics of the collection
+                modifier=models.Modifier.IDF,
+            )
+        }
+
+    def get_update_params(self, store: "VectorStore", collection_name: str) -> dict:
+        return dict(
+            collection_name=collection_name,
+            # "" is the name of the default, unnamed, vector
+            vectors_config={"": models.VectorParamsDiff(on_disk=store.on_disk_vectors)},
+            hnsw_config=self.get_hnsw_config(store),
+            quantization_config=self.get_quantization_config(store) or models.Disabled.DISABLED,
+            collection_params=models.CollectionParamsDiff(on_disk_payload=store.on_disk_payload),
+        )
+
+    def get_create_alias_operation(self, store_name: str, collection_name: str):
+        return models.CreateAliasOperation(
+            create_alias=models.CreateAlias(collection_name=collection_name, alias_name=store_name)
+        )
+
     def create_store(self, store: "VectorStore"):
-        self.client.create_collection(
-            collection_name=store.code,
-            vectors_config={
-                "size": store.get_embedding_model().size,
-                "distance": self.get_distance(store.metric)
-            }
+        collection_name = self.get_versioned_name(store.code, 1)
+        self.create_collection(store, collection_name, store.get_indexed_embedding_model())
+        self.client.update_collection_aliases(
+            change_aliases_operations=[self.get_create_alias_operation(store.code, collection_name)]
         )
+        self._layouts.pop(store.code, None)
+
+    def create_collection(self, store: "VectorStore", collection_name: str, embedding_model):
+        self._layouts.pop(collection_name, None)
+        self.client.create_collection(**self.get_collection_params(store, collection_name, embedding_model))
+        self.create_payload_indexes(store, collection_name)
+        if store.shard_by_tenant:
+            self.ensure_shard_key(collection_name, SHARED_TENANT)
+
+    def get_collection_layout(self, collection_name: str) -> dict:
+        """
+        Return the features the collection has been created with: the BM25 sparse vector and the custom sharding.
+        The `hybrid_search` and `shard_by_tenant` settings are only applied when a collection is created,
+        so a store changed afterwards keeps the layout of its collection until it's reindexed.
+
+        The layouts are cached for `layout_cache_ttl` seconds: the alias of a store can be moved
+        to another collection by a reindex running in another process.
+        """
+        layout, expires_at = self._layouts.get(collection_name, (None, 0))
+        if layout is None or expires_at < time.monotonic():
+            params = self.client.get_collection(collection_name).config.params
+            layout = {
+                "hybrid": SPARSE_VECTOR_NAME in (params.sparse_vectors or {}),
+                "sharded": params.sharding_method == models.ShardingMethod.CUSTOM,
+            }
+            self._layouts[collection_name] = (layout, time.monotonic() + self.qdrant_config.layout_cache_ttl)
+        return layout
+
+    def is_hybrid(self, store: "VectorStore", collection_name: str = None) -> bool:
+        # the sparse vector is optional: a collection that has it can be written and searched without it
+        return store.hybrid_search and self.get_collection_layout(collection_name or store.code)["hybrid"]
+
+    def is_sharded(self, store: "VectorStore", collection_name: str = None) -> bool:
+        # the writes to a collection with custom sharding need a shard key, whatever the current setting is
+        return self.get_collection_layout(collection_name or store.code)["sharded"]
+
+    def update_store(self, store: "VectorStore"):
+        """
+        Apply the index settings of the store, Qdrant rebuilds the index in background if they changed.
+        """
+        collection_name = self.get_collection_name(store.code)
+        self.client.update_collection(**self.get_update_params(store, collection_name))
+        # collections created before an index was added get it when the store is saved again
+        self.create_payload_indexes(store, collection_name)
+
+    def get_payload_indexes(self, store: "VectorStore") -> dict:
+        return {
+            **PAYLOAD_INDEXES,
+            TENANT_FIELD: models.KeywordIndexParams(
+                type=models.KeywordIndexType.KEYWORD, is_tenant=store.multitenant
+            ),
+        }
+
+    def create_payload_indexes(self, store: "VectorStore", collection_name: str):
+        for field_name, field_schema in self.get_payload_indexes(store).items():
+            self.client.create_payload_index(
+                collection_name=collection_name, field_name=field_name, field_schema=field_schema
+            )
+
+    def get_shard_keys(self, collection_name: str, refresh: bool = False) -> set:
+        """
+        Return the shard keys of the collection, read from Qdrant the first time and on refresh.
+        The refreshes are skipped for `shard_keys_refresh_interval` seconds after a read.
+        """
+        read_at = self._shard_keys_read_at.get(collection_name)
+        if refresh and read_at is not None:
+            refresh = time.monotonic() - read_at >= self.qdrant_config.shard_keys_refresh_interval
+        if refresh or read_at is None or not self._shard_keys[collection_name]:
+            self._shard_keys_read_at[collection_name] = time.monotonic()
+            info = self.client.collection_cluster_info(self.get_collection_name(collection_name) or collection_name)
+            self._shard_keys[collection_name] = {
+                shard.shard_key for shard in [*info.local_shards, *info.remote_shards] if shard.shard_key
+            }
+        return self._shard_keys[collection_name]
+
+    def ensure_shard_key(self, collection_name: str, shard_key: str):
+        """
+        Create the shard key, of a collection with custom sharding, if it doesn't exist.
+        """
+        if shard_key in self._shard_keys[collection_name]:
+            return
+        try:
+            self.client.create_shard_key(self.get_collection_name(collection_name) or collection_name, shard_key)
+        except Exception as e:
+            if "already exists" not in str(e):
+                raise
+        self._shard_keys[collection_name].add(shard_key)
     
     def delete_store(self, store: "VectorStore"):
-        self.client.delete_collection(store.code)
+        # the alias is deleted together with its collection
+        for collection_name in self.get_store_collections(store.code):
+            self.client.delete_collection(collection_name)
+            self._layouts.pop(collection_name, None)
+        self._layouts.pop(store.code, None)
 
-    def store_documents(self, store: "VectorStore", documents: list[LangchainDocument], payloads: list[str] = None) -> list[str]:
-        qdrant_store = QdrantVectorStore(
-            client=self.client,
-            collection_name=store.code,
-            embedding=store.get_embedding_model().model
-        )
-      
-        ids = qdrant_store.add_documents(documents)
-        if payloads:
-            update_operations = [
-                models.PointStruct(
-                    id=id,
-                    payload={"page_content": payloads[index]},
-                    update_operations=models.UpdateOperations(
-                        set_payload={"page_content": payloads[index]}
-                    )
+    async def acreate_store(self, store: "VectorStore"):
+        collection_name = self.get_versioned_name(store.code, 1)
+        embedding_model = await self.aget_embedding_model(store)
+        await self.async_client.create_collection(
+            **self.get_collection_params(store, collection_name, embedding_model)
+        )
+        for field_name, field_schema in self.get_payload_indexes(store).items():
+            await self.async_client.create_payload_index(
+                collection_name=collection_name, field_name=field_name, field_schema=field_schema
+            )
+        if store.shard_by_tenant:
+            await self.async_client.create_shard_key(collection_name, SHARED_TENANT)
+        await self.async_client.update_collection_aliases(
+            change_aliases_operations=[self.get_create_alias_operation(store.code, collection_name)]
+        )
+        self._layouts.pop(store.code, None)
+
+    def get_next_collection_name(self, store: "VectorStore") -> str:
+        match = re.match(
+            rf"^{re.escape(store.code)}__v(\d+)$", self.get_collection_name(store.code) or ""
+        )
+        return self.get_versioned_name(store.code, int(match.group(1)) + 1 if match else 1)
+
+    def create_reindex_store(self, store: "VectorStore", collection_name: str, embedding_model):
+        if not self.client.collection_exists(collection_name):
+            self.create_collection(store, collection_name, embedding_model)
+
+    def reindex_documents(self, store: "VectorStore", source: str, target: str, embedding_model, vector_document_ids: list[int]) -> int:
+        """
+        Copy the points of the VectorDocuments from the `source` to the `target` collection,
+        embedding again their texts. The points keep their ids and payloads.
+        """
+        copied = 0
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=source,
+                scroll_filter=self.get_filter(vector_document_ids),
+                limit=self.qdrant_config.upload_batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            if points:
+                # the points without text have it in their Chunk
+                chunks = get_chunks(store, [point.id for point in points if "page_content" not in point.payload])
+                texts = []
+                for point in points:
+                    chunk = chunks.get(uuid.UUID(str(point.id)))
+                    if chunk is not None:
+                        texts.append(chunk.embedding_text or chunk.text)
+                    else:
+                        # the embedded text differs from the page content when the loader stored a different payload
+                        texts.append(point.payload.get("embedding_text") or point.payload.get("page_content", ""))
+                embeddings = embedding_model.model.embed_documents(texts)
+                if self.is_hybrid(store, target):
+                    embeddings = [
+                        {"": vector, SPARSE_VECTOR_NAME: self.get_sparse_vector(text, query=False)}
+                        for vector, text in zip(embeddings, texts)
+                    ]
+                self.upsert_store_points(
+                    store,
+                    target,
+                    [
+                        models.PointStruct(id=point.id, vector=vector, payload=point.payload)
+                        for point, vector in zip(points, embeddings)
+                    ],
                 )
-                for index, id in enumerate(ids)
-            ]
-            self.client.batch_update_points(
-                collection_name=store.code,
-                update_operations=update_operations
+                copied += len(points)
+            if offset is None:
+                return copied
+
+    def swap_deletes_store(self, store: "VectorStore") -> bool:
+        # the stores created before the aliases have a collection with their name, it's deleted by the swap
+        return self.get_collection_name(store.code) == store.code
+
+    def swap_store(self, store: "VectorStore", collection_name: str) -> str | None:
+        """
+        Point the store alias to the collection, in a single atomic operation.
+        Return the previous collection, or None if it has been deleted to free the alias name.
+        """
+        previous = self.get_collection_name(store.code)
+        operations = []
+        if previous == store.code:
+            # stores created before the aliases: the collection name must be freed for the alias
+            logger.warning(f"Deleting the collection {store.code} to replace it with an alias")
+            self.client.delete_collection(store.code)
+            previous = None
+        elif previous:
+            operations.append(
+                models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=store.code))
             )
+        operations.append(self.get_create_alias_operation(store.code, collection_name))
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        # the shard keys and the layout known for the alias belong to the previous collection
+        self._shard_keys.pop(store.code, None)
+        self._shard_keys_read_at.pop(store.code, None)
+        self._layouts.pop(store.code, None)
+        return previous
+
+    def delete_collection(self, collection_name: str):
+        self.client.delete_collection(collection_name)
+
+    def store_documents(self, store: "VectorStore", documents: list[LangchainDocument], payloads: list[str] = None, ids: list[str] = None, store_text: bool = True) -> list[str]:
+        """
+        Embed the documents and upsert them, with their final payload, in a single pass.
+
+        The payload layout is the same used by the LangChain QdrantVectorStore. Without `store_text`
+        the payload only has the metadata used by the filters.
+        """
+        if not documents:
+            return []
+        embeddings = store.get_indexed_embedding_model().model.embed_documents(
+            [document.page_content for document in documents]
+        )
+        ids, points = self.build_points(
+            documents, embeddings, payloads, hybrid=self.is_hybrid(store), ids=ids, store_text=store_text
+        )
+        self.upsert_store_points(store, store.code, points)
+        return ids
+
+    async def astore_documents(self, store: "VectorStore", documents: list[LangchainDocument], payloads: list[str] = None, ids: list[str] = None, store_text: bool = True) -> list[str]:
+        if not documents:
+            return []
+        embedding_model = await self.aget_embedding_model(store)
+        embeddings = await embedding_model.model.aembed_documents(
+            [document.page_content for document in documents]
+        )
+        layout = await asyncio.to_thread(self.get_collection_layout, store.code)
+        ids, points = self.build_points(
+            documents,
+            embeddings,
+            payloads,
+            hybrid=store.hybrid_search and layout["hybrid"],
+            ids=ids,
+            store_text=store_text,
+        )
+        if layout["sharded"]:
+            # the shard keys are created on demand with the sync client
+            await asyncio.to_thread(self.upsert_store_points, store, store.code, points)
+            return ids
+
+        batch_size = self.qdrant_config.upload_batch_size
+        semaphore = asyncio.Semaphore(self.qdrant_config.upload_parallel)
+
+        async def upsert(batch):
+            async with semaphore:
+                await self.async_client.upsert(collection_name=store.code, points=batch, wait=True)
+
+        await asyncio.gather(
+            *[upsert(points[start : start + batch_size]) for start in range(0, len(points), batch_size)]
+        )
         return ids
+
+    def build_points(self, documents: list[LangchainDocument], embeddings: list[list[float]], payloads: list[str] = None, hybrid: bool = False, ids: list[str] = None, store_text: bool = True):
+        """
+        Build the points to upsert and return them together with their ids.
+        With `hybrid`, the points also have the BM25 sparse vector of the embedded text.
+        Without `store_text`, the payload only has the metadata used by the filters.
+        """
+        ids = ids or [uuid.uuid4().hex for _ in documents]
+        if hybrid:
+            embeddings = [
+                {"": vector, SPARSE_VECTOR_NAME: self.get_sparse_vector(document.page_content, query=False)}
+                for vector, document in zip(embeddings, documents)
+            ]
+        points = []
+        for index, (id, vector, document) in enumerate(zip(ids, embeddings, documents)):
+            if not store_text:
+                payload = {"metadata": get_payload_metadata(document.metadata)}
+                points.append(models.PointStruct(id=id, vector=vector, payload=payload))
+                continue
+            payload = {
+                "page_content": payloads[index] if payloads else document.page_content,
+                "metadata": document.metadata,
+            }
+            if payload["page_content"] != document.page_content:
+                # kept to embed the same text again when the store is reindexed
+                payload["embedding_text"] = document.page_content
+            points.append(models.PointStruct(id=id, vector=vector, payload=payload))
+        return ids, points
+
+    def upsert_store_points(self, store: "VectorStore", collection_name: str, points: list[models.PointStruct]):
+        """
+        Upsert the points in the collection of the store, in the shards of their tenants if the store is sharded.
+        """
+        if not self.is_sharded(store, collection_name):
+            self.upsert_points(collection_name, points)
+            return
+        shards = defaultdict(list)
+        for point in points:
+            shards[tuple(get_shard_tenants(get_tenants(point.payload["metadata"].get("tenant_id"))))].append(point)
+        for shard_keys, shard_points in shards.items():
+            for shard_key in shard_keys:
+                self.ensure_shard_key(collection_name, shard_key)
+            self.upsert_points(collection_name, shard_points, shard_keys=list(shard_keys))
+
+    def upsert_points(self, collection_name: str, points: list[models.PointStruct], shard_keys: list[str] = None):
+        """
+        Upsert the points in chunks of `upload_batch_size`, sending up to `upload_parallel` chunks concurrently.
+        """
+        batch_size = self.qdrant_config.upload_batch_size
+        batches = [points[start : start + batch_size] for start in range(0, len(points), batch_size)]
+
+        bulk_load = self._bulk_loads.get(collection_name)
+
+        def upsert(batch):
+            # in bulk load mode the writes are only queued, they are confirmed when the bulk load ends
+            self.client.upsert(
+                collection_name=collection_name,
+                points=batch,
+                wait=bulk_load is None,
+                shard_key_selector=shard_keys,
+            )
+            if bulk_load is not None:
+                with self._bulk_lock:
+                    bulk_load["shard_keys"].update(shard_keys or [])
+                    bulk_load["points"] += len(batch)
+
+        if len(batches) == 1:
+            upsert(batches[0])
+            return
+        # threads instead of the multiprocessing used by QdrantClient.upload_points:
+        # celery workers are daemonic processes and can't start child processes
+        with ThreadPoolExecutor(max_workers=self.qdrant_config.upload_parallel) as pool:
+            # consume the results to raise the errors of the failed batches
+            list(pool.map(upsert, batches))
             
+    def get_rest_url(self, path: str) -> str:
+        scheme = "https" if self.qdrant_config.https else "http"
+        return f"{scheme}://{self.qdrant_config.host}:{self.qdrant_config.port}{path}"
+
+    def get_rest_headers(self) -> dict:
+        return {"api-key": self.qdrant_config.api_key} if self.qdrant_config.api_key else {}
+
+    def create_snapshot(self, store: "VectorStore", path: str):
+        """
+        Create a snapshot of the collection of the store and stream it to the file `path`.
+        The snapshot is deleted from Qdrant once downloaded.
+        """
+        collection_name = self.get_collection_name(store.code)
+        if collection_name is None:
+            raise VectorStoreBackendError(message=f"Vector store {store.code} doesn't exist")
+        if self.is_sharded(store, collection_name):
+            raise VectorStoreValidationError(message="Snapshots of stores sharded by tenant are not supported")
+        snapshot = self.client.create_snapshot(collection_name=collection_name, wait=True)
+        try:
+            with httpx.stream(
+                "GET",
+                self.get_rest_url(f"/collections/{collection_name}/snapshots/{snapshot.name}"),
+                headers=self.get_rest_headers(),
+                timeout=None,
+            ) as response:
+                response.raise_for_status()
+                with open(path, "wb") as file:
+                    for data in response.iter_bytes(chunk_size=1024 * 1024):
+                        file.write(data)
+        finally:
+            self.client.delete_snapshot(collection_name=collection_name, snapshot_name=snapshot.name, wait=True)
+
+    def restore_snapshot(self, store: "VectorStore", path: str):
+        """
+        Upload the snapshot file `path` in a new collection and point the alias of the store to it.
+        The store must not exist in this backend.
+        """
+        if self.store_exists(store.code):
+            raise VectorStoreValidationError(message=f"Vector store {store.code} already exists")
+        collection_name = self.get_versioned_name(store.code, 1)
+        with open(path, "rb") as file:
+            # the snapshot is streamed from the file, it's not loaded in memory
+            response = httpx.post(
+                self.get_rest_url(f"/collections/{collection_name}/snapshots/upload"),
+                params={"priority": "snapshot", "wait": "true"},
+                headers=self.get_rest_headers(),
+                files={"snapshot": (os.path.basename(path), file)},
+                timeout=None,
+            )
+        response.raise_for_status()
+        self.client.update_collection_aliases(
+            change_aliases_operations=[self.get_create_alias_operation(store.code, collection_name)]
+        )
+        self._layouts.pop(store.code, None)
+
+    def remap_vector_documents(self, store: "VectorStore", payloads: dict[int, dict]):
+        """
+        Replace the metadata of the points of the restored VectorDocuments, e.g. their ids,
+        given the new metadata of each previous `vector_document_id`.
+        The points are selected by id, so the new ids can overlap the previous ones.
+        The points of the VectorDocuments not restored are deleted, their `vector_document_id`
+        could be one of the new ids.
+        """
+        points = defaultdict(list)
+        unmapped = []
+        offset = None
+        while True:
+            page, offset = self.client.scroll(
+                collection_name=store.code,
+                limit=self.qdrant_config.scroll_batch_size,
+                offset=offset,
+                with_payload=["metadata.vector_document_id"],
+                with_vectors=False,
+            )
+            for point in page:
+                vector_document_id = (point.payload.get("metadata") or {}).get("vector_document_id")
+                if vector_document_id in payloads:
+                    points[vector_document_id].append(point.id)
+                else:
+                    unmapped.append(point.id)
+            if offset is None:
+                break
+
+        operations = [
+            models.SetPayloadOperation(
+                set_payload=models.SetPayload(
+                    payload=payloads[vector_document_id], points=ids[start : start + 1000], key="metadata"
+                )
+            )
+            for vector_document_id, ids in points.items()
+            for start in range(0, len(ids), 1000)
+        ]
+        operations += [
+            models.DeleteOperation(delete=models.PointIdsList(points=unmapped[start : start + 1000]))
+            for start in range(0, len(unmapped), 1000)
+        ]
+        batch_size = self.qdrant_config.delete_batch_size
+        for start in range(0, len(operations), batch_size):
+            self.client.batch_update_points(
+                collection_name=store.code, update_operations=operations[start : start + batch_size], wait=True
+            )
+
+    @contextmanager
+    def bulk_load(self, store: "VectorStore", wait_index: bool = False):
+        """
+        Load many documents in the store without maintaining the index at every write.
+
+        The indexing of the collection is disabled (`indexing_threshold` 0) and the upserts don't wait
+        for the points to be applied. When the bulk load ends the writes are confirmed, the indexing
+        threshold is restored and Qdrant builds the index of the new segments in background.
+
+        Args:
+            wait_index: If True, wait until the index is built before returning.
+        """
+        collection_name = self.get_collection_name(store.code)
+        if collection_name is None:
+            raise VectorStoreBackendError(message=f"Vector store {store.code} doesn't exist")
+        if store.code in self._bulk_loads:
+            raise VectorStoreBackendError(message=f"Vector store {store.code} is already in bulk load mode")
+        info = self.client.get_collection(collection_name)
+        indexing_threshold = info.config.optimizer_config.indexing_threshold
+        points_before = self.client.count(collection_name, exact=True).count
+
+        logger.info(f"Bulk load of {store.code} started, indexing disabled (threshold was {indexing_threshold})")
+        self.client.update_collection(
+            collection_name=collection_name,
+            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=0),
+        )
+        bulk_load = {"shard_keys": set(), "points": 0}
+        self._bulk_loads[store.code] = bulk_load
+        try:
+            yield
+        finally:
+            del self._bulk_loads[store.code]
+            try:
+                self.confirm_bulk_load(store, bulk_load, points_before)
+            finally:
+                self.client.update_collection(
+                    collection_name=collection_name,
+                    optimizers_config=models.OptimizersConfigDiff(
+                        indexing_threshold=indexing_threshold or DEFAULT_INDEXING_THRESHOLD
+                    ),
+                )
+                logger.info(f"Bulk load of {store.code} completed, indexing threshold restored")
+        if wait_index:
+            self.wait_index(collection_name)
+
+    def confirm_bulk_load(self, store: "VectorStore", bulk_load: dict, points_before: int):
+        """
+        Wait for the writes of the bulk load: the updates of a shard are applied in order, so waiting
+        for a write that changes nothing confirms all the previous ones. The write is the delete of
+        a point that doesn't exist, by filter so that it is sent to every shard of the shard keys.
+        Upserting again the points instead would restore those deleted during the bulk load.
+        """
+        if not bulk_load["points"]:
+            return
+        self.client.delete(
+            collection_name=store.code,
+            points_selector=models.FilterSelector(
+                filter=models.Filter(must=[models.HasIdCondition(has_id=[CONFIRM_POINT_ID])])
+            ),
+            wait=True,
+            shard_key_selector=list(bulk_load["shard_keys"]) or None,
+        )
+        points = self.client.count(store.code, exact=True).count
+        # the points may be less if some were updated instead of created or deleted during the load
+        if points < points_before + bulk_load["points"]:
+            logger.warning(
+                f"Bulk load of {store.code}: {bulk_load['points']} points upserted, "
+                f"the collection has {points - points_before} new points"
+            )
+
+    def wait_index(self, collection_name: str):
+        """ Wait until Qdrant has applied the pending optimizations, building the index of the collection """
+        while self.client.get_collection(collection_name).status != models.CollectionStatus.GREEN:
+            time.sleep(self.qdrant_config.bulk_load_poll_interval)
+
     def delete_documents(self, store: "VectorStore", ids: list[str]):
         self.client.delete(
             collection_name=store.code,
             points_selector=models.PointIdsList(points=ids)
         )
 
-    def get_retriever(self, store: VectorStore, **kwargs):
-        return QdrantVectorStore(
-            client=self.client,
+    async def adelete_documents(self, store: "VectorStore", ids: list[str]):
+        await self.async_client.delete(
             collection_name=store.code,
-            embedding=store.get_embedding_model().model
-        ).as_retriever()
+            points_selector=models.PointIdsList(points=ids)
+        )
+
+    def delete_vector_documents(self, store: "VectorStore", vector_document_ids: list[int]):
+        """
+        Delete the points of the VectorDocuments with a filter on the indexed `vector_document_id`,
+        `delete_batch_size` documents for each request.
+        """
+        vector_document_ids = list(vector_document_ids)
+        batch_size = self.qdrant_config.delete_batch_size
+        for start in range(0, len(vector_document_ids), batch_size):
+            self.client.delete(
+                collection_name=store.code,
+                points_selector=models.FilterSelector(
+                    filter=self.get_filter(vector_document_ids[start : start + batch_size])
+                ),
+                wait=True,
+            )
+
+    async def adelete_vector_documents(self, store: "VectorStore", vector_document_ids: list[int]):
+        vector_document_ids = list(vector_document_ids)
+        batch_size = self.qdrant_config.delete_batch_size
+        for start in range(0, len(vector_document_ids), batch_size):
+            await self.async_client.delete(
+                collection_name=store.code,
+                points_selector=models.FilterSelector(
+                    filter=self.get_filter(vector_document_ids[start : start + batch_size])
+                ),
+                wait=True,
+            )
+
+    def scroll_vector_document_ids(self, store: "VectorStore"):
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=store.code,
+                limit=self.qdrant_config.scroll_batch_size,
+                offset=offset,
+                with_payload=["metadata.vector_document_id"],
+                with_vectors=False,
+            )
+            for point in points:
+                metadata = (point.payload or {}).get("metadata") or {}
+                yield point.id, metadata.get("vector_document_id")
+            if offset is None:
+                return
+
+    def get_filter(self, vector_document_ids: list[int] = None, tenant_ids: list[str] = None) -> models.Filter | None:
+        """
+        Build the filter on the indexed `vector_document_id` and `tenant_id`,
+        so Qdrant applies it during the HNSW search.
+        """
+        conditions = []
+        if vector_document_ids is not None:
+            conditions.append(
+                models.FieldCondition(
+                    key="metadata.vector_document_id",
+                    match=models.MatchAny(any=list(vector_document_ids)),
+                )
+            )
+        if tenant_ids is not None:
+            conditions.append(
+                models.FieldCondition(key=TENANT_FIELD, match=models.MatchAny(any=list(tenant_ids)))
+            )
+        return models.Filter(must=conditions) if conditions else None
+
+    def set_vector_documents_tenants(self, store: "VectorStore", vector_document_ids: list[int], tenant_ids: list[str]):
+        """
+        Set the tenants of the points of the VectorDocuments, a keyword array matched by the tenant filter.
+        In sharded stores the points are copied in the shards of the new tenants and deleted from the others.
+        """
+        points_filter = self.get_filter(vector_document_ids)
+        if not self.is_sharded(store):
+            self.client.set_payload(
+                collection_name=store.code,
+                payload={"tenant_id": tenant_ids},
+                key="metadata",
+                points=points_filter,
+                wait=True,
+            )
+            return
+
+        points = []
+        offset = None
+        while True:
+            page, offset = self.client.scroll(
+                collection_name=store.code,
+                scroll_filter=points_filter,
+                limit=self.qdrant_config.scroll_batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            points.extend(page)
+            if offset is None:
+                break
+        previous_shards = set()
+        for point in points:
+            previous_shards.update(get_shard_tenants(get_tenants(point.payload["metadata"].get("tenant_id"))))
+            point.payload["metadata"]["tenant_id"] = tenant_ids
+        self.upsert_store_points(
+            store,
+            store.code,
+            [models.PointStruct(id=point.id, vector=point.vector, payload=point.payload) for point in points],
+        )
+        removed_shards = previous_shards - set(get_shard_tenants(tenant_ids))
+        if removed_shards:
+            self.client.delete(
+                collection_name=store.code,
+                points_selector=models.FilterSelector(filter=points_filter),
+                shard_key_selector=sorted(removed_shards),
+                wait=True,
+            )
+
+    @staticmethod
+    def get_sparse_vector(text: str, query: bool = True) -> models.SparseVector:
+        indices, values = bm25_encoder.encode_query(text) if query else bm25_encoder.encode_document(text)
+        return models.SparseVector(indices=indices, values=values)
+
+    def get_query_params(self, store: "VectorStore", query: str, vector: list[float], k: int, vector_document_ids: list[int] = None, tenant_ids: list[str] = None) -> dict:
+        """
+        Build the arguments of `query_points`: a dense search or, for hybrid stores, the fusion
+        of a dense and a sparse search. The filter is applied by both the searches.
+        """
+        if not store.multitenant:
+            tenant_ids = None
+        query_filter = self.get_filter(vector_document_ids, tenant_ids)
+        shard_key_selector = None
+        if tenant_ids is not None and self.is_sharded(store):
+            # only the tenants with documents have a shard key, those created by another process
+            # are missing from the known keys until they are read again
+            shard_keys = self.get_shard_keys(store.code)
+            if not shard_keys.issuperset(tenant_ids):
+                shard_keys = self.get_shard_keys(store.code, refresh=True)
+            shard_key_selector = [tenant for tenant in tenant_ids if tenant in shard_keys]
+
+        sparse_vector = self.get_sparse_vector(query) if self.is_hybrid(store) else None
+        # queries without any term, e.g. only punctuation, fall back to the dense search
+        if sparse_vector is None or not sparse_vector.indices:
+            return dict(
+                collection_name=store.code,
+                query=vector,
+                limit=k,
+                query_filter=query_filter,
+                shard_key_selector=shard_key_selector,
+                with_payload=True,
+            )
+        prefetch_limit = max(k, self.qdrant_config.hybrid_prefetch_limit)
+        return dict(
+            collection_name=store.code,
+            shard_key_selector=shard_key_selector,
+            prefetch=[
+                models.Prefetch(query=vector, limit=prefetch_limit, filter=query_filter),
+                models.Prefetch(
+                    query=sparse_vector, using=SPARSE_VECTOR_NAME, limit=prefetch_limit, filter=query_filter
+                ),
+            ],
+            query=models.FusionQuery(fusion=models.Fusion.RRF),
+            limit=k,
+            with_payload=True,
+        )
+
+    def search(self, store: "VectorStore", query: str, k: int = 4, vector_document_ids: list[int] = None, tenant_ids: list[str] = None, **kwargs) -> list[LangchainDocument]:
+        if vector_document_ids is not None and not vector_document_ids:
+            return []
+        vector = store.get_indexed_embedding_model().model.embed_query(query)
+        params = self.get_query_params(store, query, vector, k, vector_document_ids, tenant_ids)
+        if params["shard_key_selector"] == []:
+            return []
+        start = time.perf_counter()
+        response = self.client.query_points(**params)
+        self.log_search_latency(store, start)
+        return [self.to_document(point) for point in response.points]
+
+    async def asearch(self, store: "VectorStore", query: str, k: int = 4, vector_document_ids: list[int] = None, tenant_ids: list[str] = None, **kwargs) -> list[LangchainDocument]:
+        if vector_document_ids is not None and not vector_document_ids:
+            return []
+        embedding_model = await self.aget_embedding_model(store)
+        vector = await embedding_model.model.aembed_query(query)
+        # the shard keys may be read from the cluster info with the sync client
+        params = await asyncio.to_thread(
+            self.get_query_params, store, query, vector, k, vector_document_ids, tenant_ids
+        )
+        if params["shard_key_selector"] == []:
+            return []
+        start = time.perf_counter()
+        response = await self.async_client.query_points(**params)
+        self.log_search_latency(store, start)
+        return [self.to_document(point) for point in response.points]
+
+    def log_search_latency(self, store: "VectorStore", start: float):
+        # the index settings are logged with the latency to compare the stores
+        logger.debug(
+            f"Search on {store.code} took {(time.perf_counter() - start) * 1000:.1f}ms "
+            f"(hnsw_m={store.hnsw_m}, ef_construct={store.hnsw_ef_construct}, "
+            f"quantization={store.get_quantization_display()}, on_disk_vectors={store.on_disk_vectors}, "
+            f"hybrid={store.hybrid_search})"
+        )
+
+    @staticmethod
+    def to_document(point) -> LangchainDocument:
+        payload = point.payload or {}
+        metadata = dict(payload.get("metadata") or {})
+        metadata["_id"] = point.id
+        metadata["_score"] = point.score
+        return LangchainDocument(page_content=payload.get("page_content", ""), metadata=metadata)
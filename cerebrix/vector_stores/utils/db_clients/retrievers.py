@@ -0,0 +1,70 @@
+import asyncio
+from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document as LangchainDocument
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+from vector_stores.chunks import hydrate_documents
+from vector_stores.retrieval_cache import retrieval_cache
+
+
+class VectorDbClientRetriever(BaseRetriever):
+    """
+    LangChain retriever backed by a Cerebrix vector database client.
+
+    The sync path uses `client.search` and the async path `client.asearch`, so async callers
+    don't block a thread while waiting for the vector database.
+    The texts of the results are read from their Chunks with a single query, then the results are
+    kept in the retrieval cache, so a repeated query doesn't need the query embedding and the search.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    client: Any
+    store: Any
+    k: int = 4
+    # extra arguments passed to the client search, e.g. the filters
+    search_kwargs: dict = {}
+    use_cache: bool = True
+
+    @property
+    def cache_enabled(self) -> bool:
+        return self.use_cache and settings.RETRIEVAL_CACHE_ENABLED and self.store.pk is not None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[LangchainDocument]:
+        key = None
+        if self.cache_enabled:
+            documents, key = retrieval_cache.get(self.store.pk, query, self.k, self.search_kwargs)
+            if documents is not None:
+                return documents
+        documents = hydrate_documents(
+            self.store, self.client.search(self.store, query, k=self.k, **self.search_kwargs)
+        )
+        if key:
+            retrieval_cache.set(key, documents)
+        return documents
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[LangchainDocument]:
+        key = None
+        if self.cache_enabled:
+            documents, key = await asyncio.to_thread(
+                retrieval_cache.get, self.store.pk, query, self.k, self.search_kwargs
+            )
+            if documents is not None:
+                return documents
+        documents = await self.client.asearch(self.store, query, k=self.k, **self.search_kwargs)
+        documents = await sync_to_async(hydrate_documents)(self.store, documents)
+        if key:
+            await asyncio.to_thread(retrieval_cache.set, key, documents)
+        return documents
@@ -1,15 +1,18 @@
 import re
 import os 
 import logging
+import uuid
 
 import xxhash
-from unstructured.partition.pdf import partition_pdf
 from langchain.docstore.document import Document as LangchainDocument
 from markdownify import markdownify as md
 from django.core.files.base import ContentFile
 
-from vector_stores.models import VectorStore, Document, VectorDocument
+from vector_stores.models import VectorStore, Document, VectorDocument, Chunk
+from vector_stores.chunks import build_chunks
+from vector_stores.utils.tenants import get_document_tenant, get_vector_document_tenants
 from users.models import User
+from usage.ledger import usage_user
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +28,9 @@ class DocumentLoader:
     using by hashing the document raw content.
 
     Langchain Document Loaders can be used to inside the concrete class if needed.
+
+    The store must exist in the vector database: it's created by the outbox worker, so the callers
+    of a store just created use `vector_stores.outbox.ensure_store` once before loading the documents.
     """
 
     def __init__(
@@ -36,6 +42,11 @@ class DocumentLoader:
         self.kwargs = kwargs
 
     def load(self):
+        # the embeddings computed while loading are attributed to the user of the document
+        with usage_user(self.user):
+            return self._load()
+
+    def _load(self):
         logger.info(f"Loading document {self.file_path} into vector store {self.vector_store.name}")
         self.preprocess()
 
@@ -68,12 +79,19 @@ class DocumentLoader:
         if qs.exists():
             logger.debug(f"VectorDocument {self.file_path} already exists in vector store {self.vector_store.name}. Skipping embedding.")
             vector_document = qs.first()
+            tenants = get_vector_document_tenants(vector_document)
             vector_document.documents.add(document)
+            # the points of a file uploaded by another tenant are made visible to that tenant too
+            new_tenants = get_vector_document_tenants(vector_document)
+            if new_tenants != tenants:
+                self.vector_store.backend.db_client.set_vector_documents_tenants(
+                    self.vector_store, [vector_document.pk], new_tenants
+                )
             # nothing more to do, document already exists in the vector store
             return True
         else:
             logger.debug(f"VectorDocument {self.file_path} does not exist in vector store {self.vector_store.name}.")
-            vector_document = self.load_on_vector_store()
+            vector_document = self.load_on_vector_store(document)
             vector_document.documents.add(document)
             vector_document.hash = hash
             vector_document.save()
@@ -163,7 +181,7 @@ class DocumentLoader:
         """
         pass
     
-    def embed_chunks(self, chunks: list[LangchainDocument], texts: list[str] = None) -> list[str]:
+    def embed_chunks(self, chunks: list[LangchainDocument], texts: list[str] = None, ids: list[str] = None) -> list[str]:
         """
         Embeds a list of document chunks into vector representations.
 
@@ -175,19 +193,26 @@ class DocumentLoader:
             chunks: A list of LangchainDocument objects to embed into vectors
             texts: Optional list of strings to associate with the embeddings instead of the chunks' content.
                   Must be the same length as chunks if provided.
+            ids: The ids of the vectors, the `point_id` of the Chunks.
+
+        The texts are not stored in the vector database, they are saved in the Chunks.
 
         Returns:
-            A list of LangchainDocument objects with embeddings added
+            The ids of the stored vectors
         """
         logger.info(f"Embedding {len(chunks)} documents into vector store {self.vector_store.name}")
-        return self.vector_store.backend.db_client.store_documents(self.vector_store, chunks, texts)
+        return self.vector_store.backend.db_client.store_documents(
+            self.vector_store, chunks, texts, ids=ids, store_text=False
+        )
 
-    def load_on_vector_store(self) -> VectorDocument:
+    def load_on_vector_store(self, document: Document = None) -> VectorDocument:
         """
         Load the document on the vector store.
 
         This method is responsible to call the steps to get the chunks and embed them and 
         create the VectorDocument.
+        The chunks are stored with the tenants of the document, used to scope the searches of the users.
+        The Chunks are created after their vectors, so a VectorDocument without Chunks is still loading.
         """
         logger.info(f"Loading document {self.file_path} on vector store {self.vector_store.name}")
         vector_document = VectorDocument.objects.create(
@@ -197,11 +222,14 @@ class DocumentLoader:
         extra_metadata = {
             "vector_document_id": vector_document.id,
         }
+        if document is not None:
+            extra_metadata["tenant_id"] = [get_document_tenant(document)]
+            extra_metadata["user_id"] = document.user_id
         try:
             chunks = self.get_chunks(extra_metadata)
-            embedding_ids = self.embed_chunks(chunks)
-            vector_document.embedding_ids = embedding_ids
-            vector_document.save()
+            point_ids = [uuid.uuid4().hex for _ in chunks]
+            self.embed_chunks(chunks, ids=point_ids)
+            Chunk.objects.bulk_create(build_chunks(vector_document, chunks, point_ids))
         except Exception as e:
             logger.error(f"Error embedding document {self.file_path} in vector store {self.vector_store.name}: {e}")
             vector_document.delete()
@@ -220,6 +248,9 @@ class PDFDocumentLoader(DocumentLoader):
         super().__init__(file_path, vector_store, user, **kwargs)
 
     def preprocess(self):
+        # unstructured loads its pdf and OCR models on import, so it's imported only when needed
+        from unstructured.partition.pdf import partition_pdf
+
         self.chunks = partition_pdf(
             self.file_path,
             infer_table_structure=True,
@@ -0,0 +1,64 @@
+import re
+from collections import Counter
+
+import xxhash
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[-_./]\w+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split the text in lowercase terms.
+    Codes like "XJ-2045/B" are kept as a whole term, together with their parts.
+    """
+    terms = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        term = match.group()
+        terms.append(term)
+        parts = re.split(r"[-_./]", term)
+        if len(parts) > 1:
+            terms.extend(part for part in parts if part)
+    return terms
+
+
+def term_index(term: str) -> int:
+    """ Index of the term in the sparse vector, the vocabulary is not stored: terms are hashed """
+    return xxhash.xxh32_intdigest(term.encode()) & 0x7FFFFFFF
+
+
+class BM25Encoder:
+    """
+    Encode texts as BM25 sparse vectors.
+
+    Documents are weighted with the BM25 term frequency saturation and length normalization,
+    queries with 1 for each term. The IDF part of BM25 is computed by the vector database from the
+    statistics of the whole collection (Qdrant `Modifier.IDF`), so it's always up to date with the
+    stored documents without keeping a vocabulary here.
+
+    Args:
+        k1: The term frequency saturation.
+        b: The strength of the document length normalization.
+        avg_length: The average number of terms of the documents.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_length: float = 256):
+        self.k1 = k1
+        self.b = b
+        self.avg_length = avg_length
+
+    def encode_document(self, text: str) -> tuple[list[int], list[float]]:
+        terms = tokenize(text)
+        length_norm = 1 - self.b + self.b * len(terms) / self.avg_length
+        weights = {}
+        for term, frequency in Counter(terms).items():
+            index = term_index(term)
+            weight = frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+            weights[index] = weights.get(index, 0) + weight
+        return list(weights), list(weights.values())
+
+    def encode_query(self, text: str) -> tuple[list[int], list[float]]:
+        indices = list(dict.fromkeys(term_index(term) for term in tokenize(text)))
+        return indices, [1.0] * len(indices)
+
+
+bm25_encoder = BM25Encoder()
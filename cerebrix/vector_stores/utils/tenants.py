@@ -0,0 +1,50 @@
+SHARED_TENANT = "shared"
+
+
+def get_user_tenant(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def get_document_tenant(document) -> str:
+    """
+    Return the tenant of a Document: public documents and documents without a user are shared,
+    the other documents belong to the tenant of their user.
+    """
+    if document.public or document.user_id is None:
+        return SHARED_TENANT
+    return get_user_tenant(document.user_id)
+
+
+def get_vector_document_tenants(vector_document) -> list[str]:
+    """
+    Return the tenants of a VectorDocument. The same file uploaded by different users is embedded
+    once, so its vectors belong to the tenants of all its documents.
+    """
+    return sorted({get_document_tenant(document) for document in vector_document.documents.all()})
+
+
+def get_tenants(tenant_id) -> list[str]:
+    """
+    Return the tenants of the `tenant_id` metadata of a vector: a list of tenants,
+    or a single tenant for the vectors stored before a document could have more than one.
+    """
+    if not tenant_id:
+        return [SHARED_TENANT]
+    return [tenant_id] if isinstance(tenant_id, str) else list(tenant_id)
+
+
+def get_shard_tenants(tenant_ids: list[str]) -> list[str]:
+    """
+    Return the tenants whose shards hold a vector of the given tenants. The shared shard is
+    read by every search, so a shared vector is only stored there.
+    """
+    return [SHARED_TENANT] if SHARED_TENANT in tenant_ids else sorted(tenant_ids)
+
+
+def get_search_tenants(user_id: int = None) -> list[str]:
+    """
+    Return the tenants whose documents can be searched by the user: the shared one and their own.
+    """
+    if user_id is None:
+        return [SHARED_TENANT]
+    return [SHARED_TENANT, get_user_tenant(user_id)]